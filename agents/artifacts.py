@@ -0,0 +1,251 @@
+# agents/artifacts.py (Per-run, content-addressed artifact store)
+#
+# Usage:
+#   store = get_artifact_store()
+#   artifact = store.put_file(run_id, "image_rev_0.png", tmp_path)  # {"id", "path", "bytes"}
+#   store.path_for(artifact["id"])                                   # stable blob path for an ID
+#   python -m agents.artifacts ls | gc
+#
+# Layout under BRANDSYNC_ARTIFACT_DIR (default output/artifacts):
+#   blobs/<id[:2]>/<id><ext>   one file per distinct content; the ID is its SHA-256
+#   runs/<run_id>/<name>       hardlinks to blobs (copies where hardlinks are unsupported)
+#   runs/<run_id>/manifest.json  name -> ID
+# Every file lands via temp file + os.replace, so readers never see a partial image. A blob's hardlink
+# count is its reference count: gc() deletes runs past the age limit (or the oldest ones while the store is
+# over its size cap) and then blobs no run links to any more.
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+ARTIFACT_DIR = os.environ.get("BRANDSYNC_ARTIFACT_DIR", os.path.join("output", "artifacts"))
+ARTIFACT_MAX_AGE_DAYS = float(os.environ.get("BRANDSYNC_ARTIFACT_MAX_AGE_DAYS", "14"))
+ARTIFACT_MAX_MB = float(os.environ.get("BRANDSYNC_ARTIFACT_MAX_MB", "2048"))
+GC_EVERY_PUTS = 100
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _replace_atomically(dest_dir, dest, fill):
+    """Creates a temp file in dest_dir, lets fill(tmp_path) write it, then renames it over dest."""
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        fill(tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ArtifactStore:
+    """Namespaces outputs per run and stores each distinct content once."""
+
+    def __init__(self, root=ARTIFACT_DIR, max_age_s=ARTIFACT_MAX_AGE_DAYS * 86400,
+                 max_bytes=int(ARTIFACT_MAX_MB * 1024 * 1024)):
+        self.root = root
+        self.max_age_s = max_age_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._puts_since_gc = 0
+        for sub in ("blobs", "runs", "tmp"):
+            os.makedirs(os.path.join(root, sub), exist_ok=True)
+
+    # --- Paths ---
+
+    def blob_path(self, artifact_id, ext=""):
+        return os.path.join(self.root, "blobs", artifact_id[:2], f"{artifact_id}{ext}")
+
+    def run_dir(self, run_id):
+        return os.path.join(self.root, "runs", run_id)
+
+    def temp_path(self, suffix=""):
+        """A fresh path inside the store (same filesystem as the blobs) for a producer to write to."""
+        fd, path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"), suffix=suffix)
+        os.close(fd)
+        return path
+
+    def path_for(self, artifact_id):
+        """Blob path of an artifact ID, or None if it has been collected."""
+        folder = os.path.join(self.root, "blobs", artifact_id[:2])
+        if os.path.isdir(folder):
+            for name in os.listdir(folder):
+                if name.split(".", 1)[0] == artifact_id:
+                    return os.path.join(folder, name)
+        return None
+
+    # --- Writing ---
+
+    def _ensure_blob(self, src_path, artifact_id, ext):
+        blob = self.blob_path(artifact_id, ext)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            _replace_atomically(os.path.dirname(blob), blob, lambda tmp: shutil.copyfile(src_path, tmp))
+        return blob
+
+    def _link(self, blob, dest):
+        def fill(tmp_path):
+            os.remove(tmp_path)
+            try:
+                os.link(blob, tmp_path)
+            except OSError:
+                shutil.copyfile(blob, tmp_path)  # No hardlinks here (e.g. FAT, some network mounts)
+        _replace_atomically(os.path.dirname(dest), dest, fill)
+
+    def put_file(self, run_id, name, src_path, move=False):
+        """Stores src_path as runs/<run_id>/<name>. Returns {"id", "name", "path", "bytes"}.
+
+        Identical content is stored once; with move=True src_path is removed afterwards.
+        """
+        artifact_id = _sha256_file(src_path)
+        ext = os.path.splitext(name)[1]
+        dest = os.path.join(self.run_dir(run_id), name)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        with self._lock:
+            for attempt in range(2):
+                blob = self._ensure_blob(src_path, artifact_id, ext)
+                try:
+                    self._link(blob, dest)
+                    break
+                except FileNotFoundError:
+                    if attempt:  # Collected by another process between the two steps
+                        raise
+            self._update_manifest(run_id, name, artifact_id)
+            self._puts_since_gc += 1
+            should_gc = self._puts_since_gc >= GC_EVERY_PUTS
+        if move:
+            os.remove(src_path)
+        if should_gc:
+            self.gc()
+        return {"id": artifact_id, "name": name, "path": dest, "bytes": os.path.getsize(dest)}
+
+    def put_bytes(self, run_id, name, data):
+        tmp_path = self.temp_path(os.path.splitext(name)[1])
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return self.put_file(run_id, name, tmp_path, move=True)
+
+    def _update_manifest(self, run_id, name, artifact_id):
+        manifest = self.manifest(run_id)
+        manifest[name] = artifact_id
+        path = os.path.join(self.run_dir(run_id), "manifest.json")
+        _replace_atomically(self.run_dir(run_id), path,
+                            lambda tmp: open(tmp, "w", encoding="utf-8").write(json.dumps(manifest, indent=2)))
+
+    # --- Reading ---
+
+    def manifest(self, run_id):
+        """{name: artifact_id} for one run ({} if unknown)."""
+        try:
+            with open(os.path.join(self.run_dir(run_id), "manifest.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def runs(self):
+        """[(run_id, mtime)] oldest first."""
+        runs_root = os.path.join(self.root, "runs")
+        entries = [(name, os.path.getmtime(os.path.join(runs_root, name))) for name in os.listdir(runs_root)]
+        return sorted(entries, key=lambda entry: entry[1])
+
+    def usage_bytes(self):
+        """Bytes on disk, counting each hardlinked inode once."""
+        seen, total = set(), 0
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                st = os.stat(os.path.join(folder, name))
+                if (st.st_dev, st.st_ino) not in seen:
+                    seen.add((st.st_dev, st.st_ino))
+                    total += st.st_size
+        return total
+
+    # --- Garbage Collection ---
+
+    def _remove_run(self, run_id):
+        """Deletes a run and any blob it held the last reference to. Returns bytes freed."""
+        freed = 0
+        folder = self.run_dir(run_id)
+        manifest = self.manifest(run_id)
+        for name in os.listdir(folder):
+            path = os.path.join(folder, name)
+            st = os.stat(path)
+            os.remove(path)
+            if st.st_nlink == 1:
+                freed += st.st_size  # A copy, or the only link
+            blob = self.path_for(manifest[name]) if name in manifest else None
+            if blob and os.stat(blob).st_nlink == 1:
+                freed += os.path.getsize(blob)
+                os.remove(blob)
+        os.rmdir(folder)
+        return freed
+
+    def gc(self, max_age_s=None, max_bytes=None):
+        """Drops runs older than max_age_s, then the oldest runs while over max_bytes. Returns a summary."""
+        max_age_s = self.max_age_s if max_age_s is None else max_age_s
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        removed = 0
+        with self._lock:
+            self._puts_since_gc = 0
+            now = time.time()
+            runs = self.runs()
+            for run_id, mtime in list(runs):
+                if max_age_s and now - mtime > max_age_s:
+                    self._remove_run(run_id)
+                    runs.remove((run_id, mtime))
+                    removed += 1
+            usage = self.usage_bytes()
+            while max_bytes and usage > max_bytes and runs:
+                run_id, _ = runs.pop(0)
+                usage -= self._remove_run(run_id)
+                removed += 1
+            # Stale temp files from crashed writers
+            tmp_root = os.path.join(self.root, "tmp")
+            for name in os.listdir(tmp_root):
+                path = os.path.join(tmp_root, name)
+                if now - os.path.getmtime(path) > 3600:
+                    os.remove(path)
+        return {"runs_removed": removed, "bytes": self.usage_bytes()}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store():
+    """Process-wide store rooted at BRANDSYNC_ARTIFACT_DIR."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore()
+        return _store
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or garbage-collect the artifact store.")
+    parser.add_argument("command", choices=("ls", "gc"))
+    parser.add_argument("--max-age-days", type=float, default=None)
+    parser.add_argument("--max-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    store = get_artifact_store()
+    if args.command == "ls":
+        for run_id, mtime in store.runs():
+            print(f"{run_id}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(mtime))}")
+            for name, artifact_id in store.manifest(run_id).items():
+                print(f"    {name}  {artifact_id[:16]}")
+        print(f"{store.usage_bytes() / 1024 / 1024:.1f} MB on disk")
+    else:
+        summary = store.gc(None if args.max_age_days is None else args.max_age_days * 86400,
+                           None if args.max_mb is None else int(args.max_mb * 1024 * 1024))
+        print(f"🧹 Removed {summary['runs_removed']} runs; {summary['bytes'] / 1024 / 1024:.1f} MB left")
@@ -1,27 +1,31 @@
 # agents/brand_guardian.py
-from ollama import Client
+from agents.review import areview_brand, review_brand
 
 # Minimal class definition needed for function signature (avoids circular import)
 class AgentState: pass 
 
-client = Client(host='http://localhost:11434')
 
-def brand_guardian(state: AgentState) -> AgentState:
-    """Checks content consistency, tone, and logo use against brand guidelines."""
-    copy = state["copy"]
-    strategy = state["strategy"]
+def _finish(state, verdict):
     rev_count = state.get("revision_count", 0)
-    
-    # Mocking the LLM behavior to force a rejection and then a pass for the demo flow
-    if rev_count == 0:
-        # Initial copy is mocked to be generic
-        feedback = "REJECT: Copy tone mismatch. The copy is too formal and generic, failing the 'Playful Tone Score'. Target: copywriter"
-        state["rejection_target"] = "copywriter"
+    reasons = "; ".join(r for r in verdict["reasons"] if r)
+    scores = ", ".join(f"{dim} {score:.2f}" for dim, score in verdict.get("scores", {}).items())
+    if verdict["decision"] == "REJECT":
+        feedback = f"REJECT: {reasons}. Scores: {scores}. Target: {verdict['target']}"
     else:
-        # After copywriter runs the revision
-        feedback = "PASS: Tone is now acceptable. Visual consistency check passed after revision."
-        state["rejection_target"] = ""
-        
-    state["brand_feedback"] = feedback
-    print(f"Brand Guardian Feedback (Rev {rev_count}): {feedback[:40]}...")
-    return state
\ No newline at end of file
+        feedback = f"PASS: {reasons}. Scores: {scores}."
+    print(f"Brand Guardian Feedback (Rev {rev_count}, tier {verdict['tier']}): {feedback[:40]}...")
+    return {"brand_feedback": feedback, "rejection_target": verdict["target"], "brand_verdict": verdict,
+            "llm_tokens": verdict.get("tokens", 0)}
+
+
+def brand_guardian(state: AgentState) -> AgentState:
+    """Scores tone, format, claims and visual against brand rules, escalating to Llama 3.1 only when unsure.
+
+    rejection_target is the cheapest fix: "edit" (targeted sentence edits), "copywriter" or "designer".
+    """
+    return _finish(state, review_brand(state))
+
+
+async def abrand_guardian(state: AgentState) -> AgentState:
+    """Async variant of brand_guardian(); only an escalated (tier 2) review awaits the LLM."""
+    return _finish(state, await areview_brand(state))
@@ -0,0 +1,265 @@
+# agents/brand_profiles.py (Brand-profile registry: compiled, hot-reloadable subject/theme rules)
+#
+# Usage:
+#   profile = get_brand_profile("brandsync")       # default: BRANDSYNC_BRAND
+#   profile.subject(brief, rng), profile.style(strategy, rng), profile.visual(brief)
+#   python -m agents.brand_profiles list | check <brand> "<brief>"
+#
+# One JSON file per brand in BRANDSYNC_BRAND_DIR (default agents/data/brands); .yaml/.yml files work too
+# when PyYAML is installed. A profile holds keyword -> subject/style/theme/composition/tagline rules, the
+# render themes and fonts. On load, every rule keyword is compiled into one Aho-Corasick automaton, so
+# picking everything for a brief is a single O(len(brief)) scan followed by first-match rule checks.
+# A rule's "when" is a list of keywords (any may match), or a list of such lists that must all match.
+# The registry re-checks file mtimes at most every RELOAD_CHECK_S and swaps in recompiled profiles,
+# so editing a brand file takes effect without restarting the app or workers.
+import argparse
+import json
+import os
+import threading
+import time
+from collections import deque
+
+BRAND_DIR = os.environ.get("BRANDSYNC_BRAND_DIR", os.path.join(os.path.dirname(__file__), "data", "brands"))
+DEFAULT_BRAND = os.environ.get("BRANDSYNC_BRAND", "brandsync")
+RELOAD_CHECK_S = 2.0
+PROFILE_EXTENSIONS = (".json", ".yaml", ".yml")
+
+
+# --- 1. Keyword Matcher ---
+
+class KeywordMatcher:
+    """Aho-Corasick automaton: the set of keywords occurring in a text (as substrings) in one pass."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        out = [set()]
+        for keyword in {k.lower() for k in keywords if k}:
+            node = 0
+            for ch in keyword:
+                if ch not in self._goto[node]:
+                    self._goto[node][ch] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    out.append(set())
+                node = self._goto[node][ch]
+            out[node].add(keyword)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                out[child] |= out[self._fail[child]]
+        self._out = [frozenset(o) for o in out]
+
+    def find(self, text):
+        found = set()
+        node = 0
+        for ch in (text or "").lower():
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            if self._out[node]:
+                found |= self._out[node]
+        return found
+
+
+# --- 2. Profiles ---
+
+def _groups(when):
+    """"when" as a tuple of keyword sets that must each have a hit."""
+    if when and isinstance(when[0], str):
+        when = [when]
+    return tuple(frozenset(k.lower() for k in group) for group in when)
+
+
+def _compile_rules(rules):
+    return [(_groups(rule["when"]), rule) for rule in rules]
+
+
+def _first(rules, found):
+    for groups, rule in rules:
+        if all(group & found for group in groups):
+            return rule
+    return None
+
+
+class BrandProfile:
+    """One brand's compiled rules and render assets. Immutable; a reload builds a new instance."""
+
+    def __init__(self, key, data, path=None):
+        self.key = key
+        self.path = path
+        self.name = data["name"]
+        self.prompt_branding = data.get("prompt_branding", f"'{self.name}' subtle branding")
+        self.default_subjects = list(data["default_subjects"])
+        self.default_style = data["default_style"]
+        self.default_tagline = data["default_tagline"]
+        self.themes = {name: {"bg": tuple(tuple(c) for c in theme["bg"]), "accent": tuple(theme["accent"]),
+                              "label": theme["label"]}
+                       for name, theme in data["themes"].items()}
+        self.compositions = {name: {layer: [(shape, tuple(box), value) for shape, box, value in comp.get(layer, [])]
+                                    for layer in ("glow", "outline")}
+                             for name, comp in data["compositions"].items()}
+        fonts = data.get("fonts", {})
+        self.font_candidates = tuple(fonts.get("candidates", ("DejaVuSans.ttf",)))
+        self.font_sizes = tuple(sorted(fonts.get("sizes", {"title": 70, "theme": 28, "subtitle": 32, "small": 22}).items()))
+
+        self._subjects = _compile_rules(data["subjects"])
+        self._styles = _compile_rules(data.get("styles", []))
+        self._themes = _compile_rules(data.get("theme_rules", []))
+        self._compositions = _compile_rules(data.get("composition_rules", []))
+        self._taglines = _compile_rules(data.get("taglines", []))
+        for rules, table, key_name in ((self._themes, self.themes, "theme"), (self._compositions, self.compositions, "composition")):
+            missing = {rule[key_name] for _, rule in rules} - set(table)
+            if missing or "default" not in table:
+                raise ValueError(f"{key}: undefined {key_name}(s) {', '.join(sorted(missing)) or 'default'}")
+
+        keywords = {k for rules in (self._subjects, self._styles, self._themes, self._compositions, self._taglines)
+                    for groups, _ in rules for group in groups for k in group}
+        self.keyword_count = len(keywords)
+        self.matcher = KeywordMatcher(keywords)
+
+    def subject(self, brief, rng):
+        """Main image subject for a brief; an unmatched brief draws one of the default subjects from rng."""
+        rule = _first(self._subjects, self.matcher.find(brief))
+        return rule["subject"] if rule else rng.choice(self.default_subjects)
+
+    def style(self, strategy, rng):
+        """Visual style for a strategy string; {choice} in a style is filled from its choices via rng."""
+        rule = _first(self._styles, self.matcher.find(strategy))
+        if rule is None:
+            return self.default_style
+        return rule["style"].format(choice=rng.choice(rule["choices"])) if rule.get("choices") else rule["style"]
+
+    def visual(self, brief):
+        """(theme, composition, tagline) for the fallback renderer, from one scan of the brief."""
+        found = self.matcher.find(brief)
+        theme = _first(self._themes, found)
+        composition = _first(self._compositions, found)
+        tagline = _first(self._taglines, found)
+        return (theme["theme"] if theme else "default", composition["composition"] if composition else "default",
+                tagline["tagline"] if tagline else self.default_tagline)
+
+
+def load_profile(path):
+    """Reads and compiles one profile file; raises ValueError on a malformed profile."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            data = json.load(f)
+        else:
+            import yaml  # Optional: only needed for YAML profiles
+            data = yaml.safe_load(f)
+    key = os.path.splitext(os.path.basename(path))[0]
+    try:
+        return BrandProfile(key, data, path)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{path}: malformed brand profile ({e!r})") from e
+
+
+# --- 3. Registry ---
+
+class BrandRegistry:
+    """Profiles keyed by file name (brandsync.json -> "brandsync"), reloaded when their files change."""
+
+    def __init__(self, root=BRAND_DIR, default=DEFAULT_BRAND):
+        self.root = root
+        self.default = default
+        self._profiles = {}
+        self._mtimes = {}
+        self._checked = 0.0
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def _files(self):
+        if not os.path.isdir(self.root):
+            return {}
+        return {os.path.splitext(name)[0]: os.path.join(self.root, name)
+                for name in sorted(os.listdir(self.root)) if name.endswith(PROFILE_EXTENSIONS)}
+
+    def refresh(self, force=False):
+        """Recompiles profiles whose files changed. A broken edit keeps the previous version live."""
+        with self._lock:
+            if not force and time.monotonic() - self._checked < RELOAD_CHECK_S:
+                return
+            self._checked = time.monotonic()
+            files = self._files()
+            profiles = dict(self._profiles)
+            for key in set(profiles) - set(files):
+                profiles.pop(key)
+                self._mtimes.pop(key, None)
+            for key, path in files.items():
+                mtime = os.path.getmtime(path)
+                if self._mtimes.get(key) == mtime:
+                    continue
+                try:
+                    profiles[key] = load_profile(path)
+                    if key in self._mtimes:
+                        print(f"🔄 Reloaded brand profile {key}")
+                except Exception as e:
+                    print(f"⚠️ Brand profile {path} not loaded: {e}")
+                self._mtimes[key] = mtime
+            self._profiles = profiles
+
+    def names(self):
+        self.refresh()
+        return sorted(self._profiles)
+
+    def get(self, key=None):
+        """The named profile (default brand when key is empty or unknown)."""
+        self.refresh()
+        profiles = self._profiles
+        if key and key in profiles:
+            return profiles[key]
+        if key and key not in self._warned:
+            self._warned.add(key)
+            print(f"⚠️ Unknown brand {key!r}; using {self.default!r}")
+        if self.default not in profiles:
+            raise KeyError(f"No brand profile {self.default!r} in {self.root}")
+        return profiles[self.default]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_brand_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = BrandRegistry()
+        return _registry
+
+
+def get_brand_profile(key=None):
+    return get_brand_registry().get(key)
+
+
+if __name__ == "__main__":
+    import random
+
+    parser = argparse.ArgumentParser(description="List brand profiles or check what one picks for a brief.")
+    parser.add_argument("command", choices=("list", "check"))
+    parser.add_argument("brand", nargs="?")
+    parser.add_argument("brief", nargs="?", default="")
+    parser.add_argument("--strategy", default="Tone: Playful")
+    args = parser.parse_args()
+
+    registry = get_brand_registry()
+    if args.command == "list":
+        for key in registry.names():
+            profile = registry.get(key)
+            print(f"{key:<16} {profile.name}  ({profile.keyword_count} keywords)")
+    else:
+        profile = registry.get(args.brand)
+        rng = random.Random(0)
+        theme, composition, tagline = profile.visual(args.brief)
+        print(f"subject:     {profile.subject(args.brief, rng)}")
+        print(f"style:       {profile.style(args.strategy, rng)}")
+        print(f"theme:       {theme} / {composition} — {tagline}")
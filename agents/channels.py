@@ -0,0 +1,163 @@
+# agents/channels.py (Per-channel copy and visual variants from one approved campaign)
+#
+# Usage:
+#   app.invoke({"brief": ..., "channels": ["instagram", "linkedin", "x", "story"]})
+#   final_state["channel_outputs"]["x"]   # {copy, image_path, image_artifact, report, ...} per channel
+#
+# The strategist, copywriter, designer and brand review run once. After compliance, graph.py fans out one
+# channel_variant node per requested channel (LangGraph Send), so channels are processed concurrently.
+# Each node adapts the approved caption to the channel's limits with one short LLM call and crops the
+# single master image locally to the channel's aspect ratio. Crops are not generated again per channel.
+import asyncio
+import os
+import re
+
+from agents.gateway import agenerate, generate, response_tokens
+from agents.model_lifecycle import register_prefix
+from agents.review import areview_compliance, review_compliance, split_sentences
+
+# Minimal class definition needed for function signature (avoids circular import)
+class AgentState: pass
+
+CHANNELS = {
+    "instagram": {"size": (1080, 1080), "max_chars": 300, "max_hashtags": 5,
+                  "style": "Visual-first and warm; end with up to 5 relevant hashtags."},
+    "linkedin": {"size": (1200, 627), "max_chars": 700, "max_hashtags": 3,
+                 "style": "Professional and value-led, 2-3 short sentences, no slang."},
+    "x": {"size": (1600, 900), "max_chars": 280, "max_hashtags": 2,
+          "style": "Punchy, one or two sentences."},
+    "story": {"size": (1080, 1920), "max_chars": 90, "max_hashtags": 0,
+              "style": "A single short overlay line, no hashtags."},
+}
+CHANNEL_SYSTEM = register_prefix("channel_adapter", (
+    "You adapt an approved social media caption to one channel. Keep its message, tone and keywords; "
+    "follow the channel's style and stay under its character limit. Reply with the adapted caption only."
+))
+ADAPT_OPTIONS = {'temperature': 0.3, 'num_predict': 160}
+
+
+def parse_channels(value):
+    """"instagram, x" or ["instagram", "x"] -> known channel names, in order, without duplicates."""
+    names = value.split(",") if isinstance(value, str) else (value or [])
+    unknown = [n.strip() for n in names if n.strip() and n.strip().lower() not in CHANNELS]
+    if unknown:
+        raise ValueError(f"Unknown channel(s) {', '.join(unknown)}; choose from {', '.join(CHANNELS)}")
+    return list(dict.fromkeys(n.strip().lower() for n in names if n.strip()))
+
+
+# --- 1. Copy ---
+
+def fit_copy(copy, spec):
+    """Enforces the channel's hashtag and length limits deterministically."""
+    tags = re.findall(r"#\w+", copy)
+    for tag in tags[spec["max_hashtags"]:]:
+        copy = copy.replace(tag, "", 1)
+    copy = re.sub(r"\s{2,}", " ", copy).strip()
+    sentences = split_sentences(copy)
+    while len(copy) > spec["max_chars"] and len(sentences) > 1:
+        sentences.pop()
+        copy = " ".join(sentences)
+    if len(copy) > spec["max_chars"]:
+        copy = copy[:spec["max_chars"] - 1].rsplit(" ", 1)[0].rstrip(",;:-") + "…"
+    return copy
+
+
+def _adapt_prompt(state, channel, spec):
+    return (f"STRATEGY: {state['strategy']}\nCHANNEL: {channel} — {spec['style']} "
+            f"Max {spec['max_chars']} characters, max {spec['max_hashtags']} hashtags.\nCAPTION: {state['copy']}")
+
+
+def _adapted(state, spec, response):
+    text = response['response'].strip().strip('"') if response else ""
+    return fit_copy(text or state["copy"], spec), response_tokens(response) if response else 0
+
+
+# --- 2. Visual ---
+
+def _focus_offset(energy, window):
+    """Start of the window (along one axis) holding the most edge energy."""
+    import numpy as np
+
+    totals = np.convolve(energy, np.ones(window), mode="valid")
+    return int(totals.argmax())
+
+
+def smart_crop(img, size):
+    """Scales img to cover `size`, then crops along the overflowing axis where the detail (edge energy) is."""
+    import numpy as np
+    from PIL import Image
+
+    width, height = size
+    scale = max(width / img.width, height / img.height)
+    img = img.resize((max(width, round(img.width * scale)), max(height, round(img.height * scale))), Image.LANCZOS)
+    if img.size == (width, height):
+        return img
+    gray = np.asarray(img.convert("L"), dtype=np.float32)
+    energy = np.abs(np.diff(gray, axis=0))[:, :-1] + np.abs(np.diff(gray, axis=1))[:-1, :]
+    if img.width > width:
+        left = min(_focus_offset(energy.sum(axis=0), width - 1), img.width - width)
+        return img.crop((left, 0, left + width, height))
+    top = min(_focus_offset(energy.sum(axis=1), height - 1), img.height - height)
+    return img.crop((0, top, width, top + height))
+
+
+def crop_for_channel(state, channel, spec):
+    """Crops the run's master image for a channel and files it next to the master. Returns the artifact."""
+    from PIL import Image
+
+    from agents.artifacts import get_artifact_store
+    from agents.image_encoding import delivery_extension, encode_delivery
+
+    store = get_artifact_store()
+    with Image.open(state["image_path"]) as master:
+        crop = smart_crop(master.convert("RGB"), spec["size"])
+    ext = delivery_extension()
+    tmp_path = store.temp_path(ext)
+    encode_delivery(crop, tmp_path, f"channel_{channel}")
+    stem = os.path.splitext(os.path.basename(state["image_path"]))[0]
+    return store.put_file(state.get("run_id") or "adhoc", f"{stem}.{channel}{ext}", tmp_path, move=True)
+
+
+# --- 3. Node ---
+
+def _finish(state, channel, spec, copy, tokens, image, verdict):
+    output = {
+        "channel": channel,
+        "copy": copy,
+        "image_path": image["path"],
+        "image_artifact": image["id"],
+        "size": list(spec["size"]),
+        "report": f"{verdict['decision']}: {'; '.join(r for r in verdict['reasons'] if r)}",
+    }
+    print(f"📣 {channel}: {len(copy)} chars, {spec['size'][0]}x{spec['size'][1]} → {verdict['decision']}")
+    return {"channel_outputs": {channel: output}, "llm_tokens": tokens + verdict.get("tokens", 0)}
+
+
+def channel_variant(state: AgentState) -> AgentState:
+    """Adapts the approved caption and crops the master image for state["channel"], then re-checks compliance."""
+    channel = state["channel"]
+    spec = CHANNELS[channel]
+    try:
+        response = generate(_adapt_prompt(state, channel, spec), options=ADAPT_OPTIONS, system=CHANNEL_SYSTEM)
+    except Exception as e:
+        print(f"Ollama Error in Channel Adapter ({channel}): {e}. Trimming the approved caption.")
+        response = None
+    copy, tokens = _adapted(state, spec, response)
+    image = crop_for_channel(state, channel, spec)
+    verdict = review_compliance({**state, "copy": copy})
+    return _finish(state, channel, spec, copy, tokens, image, verdict)
+
+
+async def achannel_variant(state: AgentState) -> AgentState:
+    """Async variant of channel_variant(); the crop runs off the event loop."""
+    channel = state["channel"]
+    spec = CHANNELS[channel]
+    try:
+        response = await agenerate(_adapt_prompt(state, channel, spec), options=ADAPT_OPTIONS, system=CHANNEL_SYSTEM)
+    except Exception as e:
+        print(f"Ollama Error in Channel Adapter ({channel}): {e}. Trimming the approved caption.")
+        response = None
+    copy, tokens = _adapted(state, spec, response)
+    image = await asyncio.to_thread(crop_for_channel, state, channel, spec)
+    verdict = await areview_compliance({**state, "copy": copy})
+    return _finish(state, channel, spec, copy, tokens, image, verdict)
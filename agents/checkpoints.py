@@ -0,0 +1,121 @@
+# agents/checkpoints.py (SQLite checkpoints: resumable and queryable workflow runs)
+#
+# Usage:
+#   app = build_workflow(parallel=True, checkpointer=open_checkpointer())
+#   app.invoke(initial_state, run_config(run_id))   # every finished node is persisted under run_id
+#   resume_run(app, run_id)                          # continues after the last completed node
+#   python -m agents.checkpoints list | show <run_id>
+#
+# Checkpoints are keyed by LangGraph's thread_id, which we use as the run ID. The saver comes from the
+# langgraph-checkpoint-sqlite package and is imported only when a checkpointer is opened.
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import uuid
+
+CHECKPOINT_PATH = os.environ.get("BRANDSYNC_CHECKPOINT_DB", os.path.join(".cache", "checkpoints.sqlite"))
+
+_savers = {}
+_savers_lock = threading.Lock()
+
+
+def open_checkpointer(path=CHECKPOINT_PATH):
+    """Process-wide SqliteSaver per database file (safe to share across worker threads)."""
+    with _savers_lock:
+        if path not in _savers:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            saver = SqliteSaver(conn)
+            saver.setup()
+            _savers[path] = saver
+        return _savers[path]
+
+
+def new_run_id():
+    return uuid.uuid4().hex[:12]
+
+
+def run_config(run_id, **configurable):
+    """RunnableConfig for a checkpointed run; extra keys (e.g. trace=) go into "configurable"."""
+    return {"configurable": {"thread_id": run_id, **configurable}}
+
+
+# --- Queries ---
+
+def run_status(app, run_id):
+    """Latest persisted state of a run, or None if the run ID is unknown. Never re-executes nodes."""
+    snapshot = app.get_state(run_config(run_id))
+    if not snapshot.values:
+        return None
+    values = snapshot.values
+    return {
+        "run_id": run_id,
+        "status": "interrupted" if snapshot.next else "completed",
+        "next": list(snapshot.next),
+        "brief": values.get("brief"),
+        "revision_count": values.get("revision_count", 0),
+        "final_output": values.get("final_output"),
+        "updated_at": snapshot.created_at,
+        "values": values,
+    }
+
+
+def _run_ids(checkpointer, limit):
+    with checkpointer.cursor(transaction=False) as cur:
+        cur.execute(
+            "SELECT thread_id FROM checkpoints WHERE checkpoint_ns = '' "
+            "GROUP BY thread_id ORDER BY MAX(checkpoint_id) DESC LIMIT ?",
+            (limit,),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def list_runs(app, limit=20, status=None):
+    """Most recent runs first; status="completed" or "interrupted" filters the list."""
+    runs = []
+    for run_id in _run_ids(app.checkpointer, limit):
+        run = run_status(app, run_id)
+        if run and (status is None or run["status"] == status):
+            runs.append(run)
+    return runs
+
+
+def resume_run(app, run_id, config=None):
+    """Continues an interrupted run from its last checkpoint; completed runs return their stored state."""
+    run = run_status(app, run_id)
+    if run is None:
+        raise KeyError(f"No checkpoints for run {run_id!r}")
+    if run["status"] == "completed":
+        return run["values"]
+    config = config or run_config(run_id)
+    print(f"♻️ Resuming run {run_id} at: {', '.join(run['next'])}")
+    return app.invoke(None, config)
+
+
+if __name__ == "__main__":
+    from graph import build_workflow
+
+    parser = argparse.ArgumentParser(description="Inspect or resume checkpointed BrandSync runs.")
+    parser.add_argument("command", choices=["list", "show", "resume"])
+    parser.add_argument("run_id", nargs="?")
+    parser.add_argument("--db", default=CHECKPOINT_PATH)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    app = build_workflow(parallel=True, checkpointer=open_checkpointer(args.db))
+    if args.command == "list":
+        for run in list_runs(app, args.limit):
+            print(f"{run['run_id']}  {run['status']:<11}  {run['updated_at']}  {(run['brief'] or '')[:60]}")
+    elif not args.run_id:
+        parser.error(f"{args.command} needs a run_id")
+    elif args.command == "show":
+        run = run_status(app, args.run_id)
+        print(json.dumps({k: v for k, v in run.items() if k != "values"}, indent=2, default=str) if run else "Unknown run")
+    else:
+        final_state = resume_run(app, args.run_id)
+        print(json.dumps(final_state.get("final_output"), indent=2, default=str))
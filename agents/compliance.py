@@ -1,25 +1,46 @@
 # agents/compliance.py
-from ollama import Client
+import asyncio
+
+from agents.image_encoding import variant_artifacts
+from agents.review import areview_compliance, review_compliance
 
 # Minimal class definition needed for function signature (avoids circular import)
 class AgentState: pass 
 
-client = Client(host='http://localhost:11434')
 
-def compliance_officer(state: AgentState) -> AgentState:
-    """Performs final checks for copyright, ethics, and bias using Llama 3.1."""
-    
-    # Mocked final report, as the LLM call is slow for demo
-    report = "PASS: Bias check clear (Low Risk). Copyright check: Image generation metadata recorded (None). Content is ready for publish."
-         
-    state["compliance_report"] = report
-    
+def _artifacts(state):
+    """Content IDs of the image and its delivery variants (waits briefly for encodes still in flight)."""
+    image_id = state.get("image_artifact")
+    return {"image": image_id, **(variant_artifacts(image_id) if image_id else {})}
+
+
+def _finish(state, verdict, artifacts):
+    reasons = "; ".join(r for r in verdict["reasons"] if r)
+    if verdict["decision"] == "PASS":
+        report = f"PASS: {reasons}. Content is ready for publish. (Decided by tier {verdict['tier']})"
+    else:
+        report = f"FLAG: {reasons}. Needs human review before publishing. (Decided by tier {verdict['tier']})"
+
     # Final assembly
-    state["final_output"] = {
+    final_output = {
         "copy": state["copy"],
         "image_path": state["image_path"],
+        "image_variants": state.get("image_variants") or {},
+        "artifacts": artifacts,
         "strategy": state["strategy"],
-        "report": state["compliance_report"]
+        "report": report
     }
     print("Compliance Officer Output: Final Output Ready. Routing to END.")
-    return state
\ No newline at end of file
+    return {"compliance_report": report, "compliance_verdict": verdict, "final_output": final_output,
+            "llm_tokens": verdict.get("tokens", 0)}
+
+
+def compliance_officer(state: AgentState) -> AgentState:
+    """Performs final checks for claims, bias and copyright: rules first, Llama 3.1 only for ambiguous copy."""
+    return _finish(state, review_compliance(state), _artifacts(state))
+
+
+async def acompliance_officer(state: AgentState) -> AgentState:
+    """Async variant of compliance_officer(); only an escalated (tier 2) review awaits the LLM."""
+    verdict = await areview_compliance(state)
+    return _finish(state, verdict, await asyncio.to_thread(_artifacts, state))
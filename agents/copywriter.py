@@ -1,50 +1,224 @@
 # agents/copywriter.py
-from ollama import Client
 import json
+import os
+import re
+
+from agents.gateway import agenerate, generate, response_tokens
+from agents.model_lifecycle import register_prefix
+from agents.review import POLICY, parse_strategy, score_caption
+from agents.streaming import report_ttft, token_callback
+from agents.voice_index import voice_examples
 
 # Minimal class definition needed for function signature (avoids circular import)
-class AgentState: pass 
+class AgentState: pass
 
-client = Client(host='http://localhost:11434')
+# Static instructions go in the system prompt, a prefix Ollama can keep in its KV cache between calls
+COPYWRITER_SYSTEM = register_prefix("copywriter", (
+    "You are a viral social media copywriter specializing in brand consistency.\n"
+    "Your goal is to write a single, attention-grabbing social media caption (max 3 sentences).\n"
+    "Ensure the copy strictly follows the TONE defined in the strategy."
+))
+EDITOR_SYSTEM = register_prefix("copy_editor", (
+    "You are a copy editor for brand-consistent social media captions. You receive one sentence from a caption "
+    "and the problem with it. Rewrite only that sentence so the problem is gone, keeping the tone of the strategy. "
+    "Reply with the rewritten sentence only."
+))
+# Best-of-N: one call returns N numbered captions, ranked locally with the review engine's tier 0/1 scorer
+# so only the strongest reaches the brand guardian (1 = a single caption, as before)
+CANDIDATES = int(os.environ.get("BRANDSYNC_COPY_CANDIDATES", "1"))
+CANDIDATES_SYSTEM = register_prefix("copywriter_candidates", (
+    "You are a viral social media copywriter specializing in brand consistency.\n"
+    f"Write {CANDIDATES} different attention-grabbing social media captions (max 3 sentences each), "
+    f"numbered 1. to {CANDIDATES}., one caption per line and nothing else.\n"
+    "Every caption must strictly follow the TONE defined in the strategy; vary the angle, not the tone."
+)) if CANDIDATES > 1 else None
+# On-tone captions retrieved from the brand-voice index per call (0 disables retrieval)
+VOICE_EXAMPLES = int(os.environ.get("BRANDSYNC_VOICE_EXAMPLES", "3"))
+# A one-sentence rewrite needs a fraction of a full caption's tokens
+EDIT_OPTIONS = {'temperature': 0.3, 'num_predict': 60}
 
-def copywriter(state: AgentState) -> AgentState:
-    """Writes content using Ollama and prompt engineering (mocking fine-tuned brand voice)."""
+
+def _prepare(state):
+    """Works out this pass's revision number and builds the prompt/options for it."""
     strategy = state["strategy"]
     feedback = state.get("brand_feedback", "None")
     rev_count = state.get("revision_count", 0)
 
     if "REJECT" in feedback:
-        state["revision_count"] = rev_count + 1
         rev_count += 1
 
-    prompt = f"""
-    You are a viral social media copywriter specializing in brand consistency.
-    STRATEGY: {strategy}
-    PREVIOUS FEEDBACK: {feedback}
+    prompt = f"STRATEGY: {strategy}\nPREVIOUS FEEDBACK: {feedback}"
+    examples = voice_examples(strategy, parse_strategy(strategy)["tone"], VOICE_EXAMPLES) if VOICE_EXAMPLES else []
+    if examples:
+        # After the static system prefix, so retrieval does not invalidate Ollama's cached prefix
+        prompt += "\nON-TONE EXAMPLES (match their voice, do not copy them):\n" + "\n".join(f"- {e}" for e in examples)
+    options = {'temperature': 0.8 if rev_count == 0 else 0.4}
+    return rev_count, prompt, options
+
 
-    Your goal is to write a single, attention-grabbing social media caption (max 3 sentences).
-    Ensure the copy strictly follows the TONE defined in the strategy.
+_NUMBERED = re.compile(r"^\s*(\d+)[.)]\s*(.+?)\s*$", re.MULTILINE)
+
+
+class CandidateStop:
+    """stop_when for candidates mode: a caption numbered past `count` means the model is running past the ask.
+
+    The gateway passes one chunk at a time, so feed() buffers them and matches the lines the new chunk
+    touched (a numbered line usually spans several tokens). Build one per call.
     """
-    
+
+    def __init__(self, count):
+        self.count = count
+        self.text = ""
+
+    def feed(self, chunk):
+        line_start = self.text.rfind("\n") + 1
+        self.text += chunk
+        return any(int(n) > self.count for n, _ in _NUMBERED.findall(self.text, line_start))
+
+
+def parse_candidates(text, count=None):
+    """Numbered captions (up to `count`, default CANDIDATES) from a candidates response; the whole text
+    if the model ignored the numbering."""
+    count = count or CANDIDATES
+    found = [caption.strip('"') for n, caption in _NUMBERED.findall(text) if int(n) <= count]
+    return found or [text.strip()]
+
+
+def _pick(strategy, text):
+    """Returns (best caption, ranked [{copy, score}]) for a response; a single caption passes straight through."""
+    if CANDIDATES <= 1:
+        return text.strip(), []
+    ranked = sorted(({"copy": c, **score_caption(c, strategy)} for c in parse_candidates(text)),
+                    key=lambda c: c["score"], reverse=True)
+    print(f"🏆 Picked 1 of {len(ranked)} candidates (score {ranked[0]['score']:.2f})")
+    return ranked[0]["copy"], ranked
+
+
+def _generate_kwargs():
+    if CANDIDATES > 1:
+        return {"system": CANDIDATES_SYSTEM, "stop_when": CandidateStop(CANDIDATES).feed}
+    return {"system": COPYWRITER_SYSTEM}
+
+
+def _finish(state, rev_count, new_copy, tokens=0, candidates=()):
+    print(f"Copywriter Output (Rev {rev_count}): {new_copy[:50]}...")
+    return {"copy": new_copy, "revision_count": rev_count, "llm_tokens": tokens, "copy_candidates": list(candidates),
+            "edit_stalled": False}
+
+
+def _fallback_copy(error, rev_count):
+    print(f"Ollama Error in Copywriter: {error}. Using fallback.")
+    return f"ERROR: Ollama failed. Fallback Copy (Rev {rev_count}). Consistency is key, even when the AI fails!"
+
+
+def copywriter(state: AgentState) -> AgentState:
+    """Writes content using Ollama and prompt engineering (mocking fine-tuned brand voice)."""
+    rev_count, prompt, options = _prepare(state)
+    try:
+        response = generate(prompt, options=options, on_token=token_callback("copywriter"), **_generate_kwargs())
+        report_ttft("copywriter", response)
+        new_copy, candidates = _pick(state["strategy"], response['response'])
+        tokens = response_tokens(response)
+    except Exception as e:
+        new_copy, tokens, candidates = _fallback_copy(e, rev_count), 0, []
+    return _finish(state, rev_count, new_copy, tokens, candidates)
+
+
+async def acopywriter(state: AgentState) -> AgentState:
+    """Async variant of copywriter() for ainvoke/astream runs."""
+    rev_count, prompt, options = _prepare(state)
     try:
-        response = client.generate(
-            model='llama3.1:8b', 
-            prompt=prompt,
-            stream=False,
-            options={'temperature': 0.8 if rev_count == 0 else 0.4}
-        )
-        new_copy = response['response'].strip()
+        response = await agenerate(prompt, options=options, on_token=token_callback("copywriter"),
+                                   **_generate_kwargs())
+        report_ttft("copywriter", response)
+        new_copy, candidates = _pick(state["strategy"], response['response'])
+        tokens = response_tokens(response)
     except Exception as e:
-        print(f"Ollama Error in Copywriter: {e}. Using fallback.")
-        new_copy = f"ERROR: Ollama failed. Fallback Copy (Rev {rev_count}). Consistency is key, even when the AI fails!"
+        new_copy, tokens, candidates = _fallback_copy(e, rev_count), 0, []
+    return _finish(state, rev_count, new_copy, tokens, candidates)
+
+
+# --- Targeted Edits (brand verdicts with rejection_target "edit") ---
+
+def _edit_prompt(state, edit):
+    return f"STRATEGY: {state['strategy']}\nPROBLEM: {edit['reason']}\nSENTENCE: {edit['sentence']}"
+
+
+def _apply_edit(copy, edit, rewritten=None):
+    """Applies one deterministic edit, or swaps in an LLM-rewritten sentence."""
+    if edit["action"] == "drop":
+        return re.sub(r"\s{2,}", " ", copy.replace(edit["sentence"], "")).strip()
+    if edit["action"] == "trim_hashtags":
+        keep = POLICY["brand"]["max_hashtags"]
+        tags = re.findall(r"#\w+", copy)
+        for tag in tags[keep:]:
+            copy = copy.replace(tag, "", 1)
+        return re.sub(r"\s{2,}", " ", copy).strip()
+    return copy.replace(edit["sentence"], rewritten.strip().strip('"'), 1) if rewritten else copy
+
+
+def _finish_edit(state, new_copy, tokens):
+    rev_count = state.get("revision_count", 0) + 1
+    stalled = new_copy == state["copy"]  # e.g. every rewrite failed: re-reviewing would repeat the same verdict
+    if stalled:
+        print(f"Copy Editor (Rev {rev_count}): no change; the next revision regenerates the copy")
+    else:
+        print(f"Copy Editor Output (Rev {rev_count}): {new_copy[:50]}...")
+    return {"copy": new_copy, "revision_count": rev_count, "llm_tokens": tokens, "edit_stalled": stalled}
+
+
+def edit_copy(state: AgentState) -> AgentState:
+    """Fixes only the sentences the brand verdict flagged: drops/trims deterministically, rewrites the rest with a short LLM call."""
+    new_copy, tokens = state["copy"], 0
+    for edit in (state.get("brand_verdict") or {}).get("edits", []):
+        if edit["sentence"] and edit["sentence"] not in new_copy:
+            continue  # Already rewritten for another problem
+        rewritten = None
+        if edit["action"] == "rewrite":
+            try:
+                response = generate(_edit_prompt(state, edit), options=EDIT_OPTIONS, system=EDITOR_SYSTEM)
+                rewritten, tokens = response['response'], tokens + response_tokens(response)
+            except Exception as e:
+                print(f"Ollama Error in Copy Editor: {e}. Keeping the sentence.")
+        new_copy = _apply_edit(new_copy, edit, rewritten)
+    return _finish_edit(state, new_copy, tokens)
+
+
+async def aedit_copy(state: AgentState) -> AgentState:
+    """Async variant of edit_copy()."""
+    new_copy, tokens = state["copy"], 0
+    for edit in (state.get("brand_verdict") or {}).get("edits", []):
+        if edit["sentence"] and edit["sentence"] not in new_copy:
+            continue  # Already rewritten for another problem
+        rewritten = None
+        if edit["action"] == "rewrite":
+            try:
+                response = await agenerate(_edit_prompt(state, edit), options=EDIT_OPTIONS, system=EDITOR_SYSTEM)
+                rewritten, tokens = response['response'], tokens + response_tokens(response)
+            except Exception as e:
+                print(f"Ollama Error in Copy Editor: {e}. Keeping the sentence.")
+        new_copy = _apply_edit(new_copy, edit, rewritten)
+    return _finish_edit(state, new_copy, tokens)
+
 
-    # Mock the behavior for the demo to force rejection/pass
-    if rev_count == 0:
-        new_copy = "BrandSync Studio is the new standard for AI content creation. Our platform ensures total brand consistency across all channels. Sign up today!"
-    elif rev_count == 1:
-        new_copy = "GUARANTEED PASS: The revised copy is highly engaging and maintains the playful tone. Rework is history! #BrandSyncSuccess"
+if __name__ == "__main__":
+    # Replays a token-by-token candidates stream through the gateway's chunk loop and checks that
+    # generation stops as soon as the model starts a caption past the requested count.
+    from agents.gateway import _collect_chunk, _new_stream
 
+    count = 3
+    captions = "".join(f"{n}. Caption number {n}, on tone and on brand!\n" for n in range(1, count + 3))
+    chunks = [{"response": token, "done": False} for token in re.findall(r"\S+\s*", captions)]
+    chunks.append({"response": "", "done": True})
 
-    state["copy"] = new_copy
-    print(f"Copywriter Output (Rev {rev_count}): {state['copy'][:50]}...")
-    return state
\ No newline at end of file
+    stream, stop = _new_stream(), CandidateStop(count)
+    consumed = 0
+    for chunk in chunks:
+        consumed += 1
+        if _collect_chunk(stream, chunk, None, 0.0, stop.feed):
+            break
+    text = "".join(stream["parts"])
+    print(f"Consumed {consumed}/{len(chunks)} chunks, stopped early: {stream['stopped_early']}")
+    print(f"Parsed {len(parse_candidates(text, count))} candidates from: {text!r}")
+    assert stream["stopped_early"], "candidates stream ran to the end"
+    assert len(parse_candidates(text, count)) == count and f"{count + 1}. Caption" not in text, "stopped at the wrong place"
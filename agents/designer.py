@@ -1,258 +1,173 @@
-# agents/designer.py (FIXED - No More Duplicate Images)
+# agents/designer.py
+import asyncio
+import hashlib
 import os
-import requests
-from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
-from io import BytesIO
-import urllib.parse
-import time
 import random
+import time
+
+from agents.artifacts import get_artifact_store
+from agents.brand_profiles import get_brand_profile
+from agents.image_backends import get_image_backend
+from agents.image_cache import ImageCache, get_image_cache
+from agents.image_encoding import save_master, schedule_variants
+from agents.tracing import record_image, record_write
 
 class AgentState: pass 
 
-def designer(state: AgentState) -> AgentState:
-    """Generates professional AI visuals with unique prompts every time."""
-    copy = state["copy"]
-    strategy = state["strategy"]
+# Reproducible by default: the same brief + strategy + revision yields the same prompt and seed,
+# so repeat requests hit the image cache. Set BRANDSYNC_IMAGE_VARIETY=1 (or state["image_variety"]) to opt out.
+IMAGE_VARIETY = os.environ.get("BRANDSYNC_IMAGE_VARIETY", "0") == "1"
+IMAGE_SIZE = (1200, 630)
+
+
+def derive_seed(brief, strategy, rev_count):
+    """Stable 31-bit seed from (brief, strategy, revision)."""
+    digest = hashlib.sha256(f"{brief}|{strategy}|{rev_count}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") & 0x7FFFFFFF
+
+
+def _plan_image(state):
+    """Builds the image prompt and seed for this pass."""
     brief = state.get("brief", "")
+    strategy = state["strategy"]
     rev_count = state.get('revision_count', 0)
+    variety = state.get("image_variety", IMAGE_VARIETY)
+
+    # Variety mode draws from the global RNG; reproducible mode from a seeded one
+    seed = None if variety else derive_seed(brief, strategy, rev_count)
+    rng = random if variety else random.Random(seed)
     
-    # Extract key concepts from the brief
-    brief_lower = brief.lower()
-    
-    # MUCH MORE SPECIFIC subject detection
-    if "product" in brief_lower or "launch" in brief_lower:
-        if "speaker" in brief_lower or "audio" in brief_lower:
-            main_subject = "sleek smart speaker device on podium, sound waves visualization, product photography"
-        elif "phone" in brief_lower or "mobile" in brief_lower:
-            main_subject = "modern smartphone with glowing screen, app interface visible, product shot"
-        else:
-            main_subject = "innovative tech product on display pedestal, product launch event atmosphere"
-    
-    elif "event" in brief_lower or "webinar" in brief_lower or "conference" in brief_lower or "summit" in brief_lower:
-        main_subject = "crowded auditorium with large presentation screen, conference attendees, event photography, stage lighting"
-    
-    elif "announcement" in brief_lower or "news" in brief_lower or "breakthrough" in brief_lower:
-        main_subject = "dramatic spotlight on announcement podium, press conference setup, journalists with cameras"
-    
-    elif "brand" in brief_lower or "story" in brief_lower or "mission" in brief_lower or "empower" in brief_lower:
-        main_subject = "diverse team of professionals collaborating in modern office, inspiring workspace, corporate lifestyle"
-    
-    elif "research" in brief_lower or "innovation" in brief_lower or "neural" in brief_lower:
-        main_subject = "scientists in advanced laboratory, high-tech equipment, research facility, data visualization screens"
-    
-    elif "creative" in brief_lower or "design" in brief_lower or "artists" in brief_lower:
-        main_subject = "artist working on digital tablet in creative studio, colorful design workspace, creative process"
-    
-    elif "agency" in brief_lower or "autonomous" in brief_lower:
-        main_subject = "futuristic AI control room with robotic arms, holographic displays showing BrandSync Studio, cyberpunk aesthetic"
-    
-    else:
-        # Randomize default to avoid caching
-        subjects = [
-            "modern tech office with glass walls and city view",
-            "sleek corporate presentation room with large displays",
-            "innovative startup workspace with collaborative areas",
-            "high-tech control center with multiple monitors"
-        ]
-        main_subject = random.choice(subjects)
-    
-    # More varied style options
-    if "playful" in strategy.lower():
-        style = f"vibrant rainbow colors, {random.choice(['fun confetti effects', 'playful bubble elements', 'cheerful atmosphere'])}, bright daylight"
-    elif "energetic" in strategy.lower():
-        style = f"high energy scene, {random.choice(['motion trails', 'speed lines', 'dynamic angles'])}, intense dramatic lighting"
-    elif "corporate" in strategy.lower() or "professional" in strategy.lower():
-        style = f"ultra professional, {random.choice(['clean minimalist', 'elegant sophisticated', 'polished premium'])}, soft natural lighting"
-    else:
-        style = "photorealistic, cinematic composition, professional photography"
-    
-    # Add random seed to prevent caching
-    random_seed = random.randint(1000, 9999)
-    timestamp = int(time.time())
+    # Subject and style come from the brand profile's compiled rules: one keyword scan per text
+    profile = get_brand_profile(state.get("brand"))
+    main_subject = profile.subject(brief, rng)
+    style = profile.style(strategy, rng)
+    prompt_seed = rng.randint(1000, 9999)
     
-    # Build HIGHLY customized prompt with cache-busting
+    # Build HIGHLY customized prompt
     image_prompt = (
         f"{main_subject}, "
         f"theme: {brief[:60]}, "
-        f"'BrandSync Studio' subtle branding, "
+        f"{profile.prompt_branding}, "
         f"{style}, "
         f"professional commercial photography, 8k ultra detailed, "
-        f"seed:{random_seed}"  # This prevents caching!
+        f"seed:{prompt_seed}"
     )
     
-    path = f"output_content/image_rev_{rev_count}.png"
-    os.makedirs("output_content", exist_ok=True)
+    return brief, strategy, rev_count, main_subject, image_prompt, seed
+
+
+def _store_image(state, rev_count, image_prompt, src_path, move=True):
+    """Files the rendered image under the run's namespace (identical images share one blob) and queues its
+    WebP/JPEG delivery copies and preview thumbnail on the encoding pool."""
+    run_id, name = state.get("run_id") or "adhoc", f"image_rev_{rev_count}.png"
+    artifact = get_artifact_store().put_file(run_id, name, src_path, move=move)
+    variants = schedule_variants(run_id, name, artifact["path"], artifact["id"])
+    return {"image_prompt": image_prompt, "image_path": artifact["path"], "image_artifact": artifact["id"],
+            "image_variants": variants}
+
+
+def _cache_lookup(backend, image_prompt, seed):
+    """Returns (cache_key, cached_path). Variety runs (seed None) are never cached."""
+    if backend is None or seed is None:
+        return None, None
+    cache_key = ImageCache.make_key(backend.name, image_prompt, *IMAGE_SIZE, seed)
+    return cache_key, get_image_cache().get(cache_key)
+
+
+def designer(state: AgentState) -> AgentState:
+    """Generates professional AI visuals; reproducible prompts are served from the image cache."""
+    brief, strategy, rev_count, main_subject, image_prompt, seed = _plan_image(state)
+    backend = get_image_backend()
+
+    cache_key, cached_path = _cache_lookup(backend, image_prompt, seed)
+    if cached_path:
+        print(f"⚡ Image cache hit ({cache_key[:12]})")
+        record_image(0.0, "cache")
+        return _store_image(state, rev_count, image_prompt, cached_path, move=False)
+
+    # Rendered to a scratch file in the store, then filed under the run by _store_image
+    path = get_artifact_store().temp_path(".png")
     
-    # Try Pollinations with cache-busting
-    try:
-        print(f"🎨 Generating unique image...")
-        print(f"📝 Prompt: {image_prompt[:120]}...")
-        
-        if generate_pollinations_unique(image_prompt, path, timestamp):
-            print(f"✅ Successfully generated unique image")
-            state["image_prompt"] = image_prompt
-            state["image_path"] = path
-            return state
-    except Exception as e:
-        print(f"⚠️ Generation failed: {e}")
+    if backend is not None:
+        try:
+            print(f"🎨 Generating image via {backend.name}...")
+            print(f"📝 Prompt: {image_prompt[:120]}...")
+            
+            start = time.perf_counter()
+            ok = backend.generate(image_prompt, path, *IMAGE_SIZE, seed=seed)
+            record_image(time.perf_counter() - start, backend.name)
+            if ok:
+                print(f"✅ Successfully generated image")
+                record_write(path)
+                if cache_key:
+                    get_image_cache().put(cache_key, path)
+                return _store_image(state, rev_count, image_prompt, path)
+        except Exception as e:
+            print(f"⚠️ Generation failed: {e}")
     
     print("📦 Creating premium styled image...")
-    create_premium_fallback(path, brief, strategy, rev_count, main_subject)
+    create_premium_fallback(path, brief, strategy, rev_count, main_subject, state.get("brand"))
     
-    state["image_prompt"] = image_prompt
-    state["image_path"] = path
-    return state
+    return _store_image(state, rev_count, image_prompt, path)
 
 
-def generate_pollinations_unique(prompt, path, timestamp):
-    """Pollinations.ai with cache-busting parameters."""
-    encoded_prompt = urllib.parse.quote(prompt)
-    
-    # Add multiple cache-busting parameters
-    image_url = (
-        f"https://image.pollinations.ai/prompt/{encoded_prompt}"
-        f"?width=1200&height=630"
-        f"&nologo=true"
-        f"&enhance=true"
-        f"&model=flux"
-        f"&seed={random.randint(1, 999999)}"  # Random seed
-        f"&timestamp={timestamp}"  # Current timestamp
-    )
-    
-    response = requests.get(image_url, timeout=60)
-    if response.status_code == 200 and len(response.content) > 5000:
-        img = Image.open(BytesIO(response.content))
-        img.save(path, format='PNG', quality=95)
-        return True
-    return False
+async def adesigner(state: AgentState) -> AgentState:
+    """Async variant of designer(): non-blocking HTTP, PIL work off the event loop."""
+    brief, strategy, rev_count, main_subject, image_prompt, seed = _plan_image(state)
+    backend = get_image_backend()
 
+    cache_key, cached_path = _cache_lookup(backend, image_prompt, seed)
+    if cached_path:
+        print(f"⚡ Image cache hit ({cache_key[:12]})")
+        record_image(0.0, "cache")
+        return await asyncio.to_thread(_store_image, state, rev_count, image_prompt, cached_path, False)
 
-def create_premium_fallback(path, brief, strategy, rev_count, main_subject):
-    """Creates highly customized fallback image based on brief."""
-    width, height = 1200, 630
-    
-    # Highly varied color schemes based on content
-    if "product" in brief.lower():
-        bg_colors = [(20, 20, 40), (60, 60, 100)]
-        accent = (100, 200, 255)
-        theme_text = "PRODUCT LAUNCH"
-    elif "event" in brief.lower() or "conference" in brief.lower():
-        bg_colors = [(80, 20, 80), (150, 50, 150)]
-        accent = (255, 200, 100)
-        theme_text = "LIVE EVENT"
-    elif "creative" in brief.lower():
-        bg_colors = [(180, 50, 100), (220, 100, 150)]
-        accent = (255, 220, 100)
-        theme_text = "CREATIVE STUDIO"
-    elif "research" in brief.lower() or "innovation" in brief.lower():
-        bg_colors = [(10, 50, 80), (30, 100, 140)]
-        accent = (0, 255, 200)
-        theme_text = "INNOVATION LAB"
-    else:
-        bg_colors = [(10, 25, 47), (29, 53, 87)]
-        accent = (69, 178, 157)
-        theme_text = "AI POWERED"
+    # Rendered to a scratch file in the store, then filed under the run by _store_image
+    path = get_artifact_store().temp_path(".png")
     
-    # Create base with gradient
-    img = Image.new('RGB', (width, height), color=bg_colors[0])
-    draw = ImageDraw.Draw(img, 'RGBA')
-    
-    # Gradient
-    for i in range(height):
-        ratio = i / height
-        r = int(bg_colors[0][0] + (bg_colors[1][0] - bg_colors[0][0]) * ratio)
-        g = int(bg_colors[0][1] + (bg_colors[1][1] - bg_colors[0][1]) * ratio)
-        b = int(bg_colors[0][2] + (bg_colors[1][2] - bg_colors[0][2]) * ratio)
-        draw.rectangle([(0, i), (width, i+1)], fill=(r, g, b))
-    
-    # Varied geometric patterns based on content
-    glow_layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    glow_draw = ImageDraw.Draw(glow_layer)
-    
-    if "event" in brief.lower():
-        # Stage-like composition
-        glow_draw.rectangle([100, 400, 1100, 600], fill=accent + (40,))
-        glow_draw.ellipse([400, 100, 800, 400], fill=accent + (30,))
-    elif "product" in brief.lower():
-        # Pedestal composition
-        glow_draw.ellipse([450, 200, 750, 500], fill=accent + (50,))
-        glow_draw.rectangle([500, 400, 700, 550], fill=accent + (40,))
-    else:
-        # Default tech composition
-        glow_draw.ellipse([50, 50, 350, 350], fill=accent + (30,))
-        glow_draw.rectangle([850, 250, 1100, 550], fill=accent + (40,))
-    
-    glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=25))
-    img.paste(glow_layer, (0, 0), glow_layer)
-    
-    # Sharp outlines
-    if "event" in brief.lower():
-        draw.rectangle([100, 400, 1100, 600], outline=accent, width=4)
-    else:
-        draw.ellipse([50, 50, 350, 350], outline=accent, width=3)
-        draw.rectangle([850, 250, 1100, 550], outline=accent, width=3)
-    
-    # Fonts
-    try:
-        font_title = ImageFont.truetype("arial.ttf", 70)
-        font_theme = ImageFont.truetype("arial.ttf", 28)
-        font_subtitle = ImageFont.truetype("arial.ttf", 32)
-        font_small = ImageFont.truetype("arial.ttf", 22)
-    except:
+    if backend is not None:
         try:
-            font_title = ImageFont.truetype("Arial.ttf", 70)
-            font_theme = ImageFont.truetype("Arial.ttf", 28)
-            font_subtitle = ImageFont.truetype("Arial.ttf", 32)
-            font_small = ImageFont.truetype("Arial.ttf", 22)
-        except:
-            font_title = ImageFont.load_default()
-            font_theme = font_title
-            font_subtitle = font_title
-            font_small = font_title
-    
-    # Theme label at top
-    draw.text((width//2, 80), theme_text, fill=accent, font=font_theme, anchor="mm")
+            print(f"🎨 Generating image via {backend.name}...")
+            print(f"📝 Prompt: {image_prompt[:120]}...")
+            
+            start = time.perf_counter()
+            ok = await backend.agenerate(image_prompt, path, *IMAGE_SIZE, seed=seed)
+            record_image(time.perf_counter() - start, backend.name)
+            if ok:
+                print(f"✅ Successfully generated image")
+                record_write(path)
+                if cache_key:
+                    await asyncio.to_thread(get_image_cache().put, cache_key, path)
+                return await asyncio.to_thread(_store_image, state, rev_count, image_prompt, path)
+        except Exception as e:
+            print(f"⚠️ Generation failed: {e}")
     
-    # Brand name
-    shadow_offset = 4
-    draw.text((width//2 + shadow_offset, 220 + shadow_offset), "BrandSync Studio", 
-             fill=(0, 0, 0, 120), font=font_title, anchor="mm")
-    draw.text((width//2, 220), "BrandSync Studio", 
-             fill=(255, 255, 255), font=font_title, anchor="mm")
-    
-    # Brief excerpt
-    brief_words = " ".join(brief.split()[:8]) + "..."
-    draw.text((width//2, 320), brief_words, 
-             fill=(220, 220, 220), font=font_small, anchor="mm")
-    
-    # Dynamic tagline based on content
-    if "launch" in brief.lower():
-        tagline = "Revolutionary Launch Experience"
-    elif "event" in brief.lower():
-        tagline = "Transforming Virtual Events"
-    elif "creative" in brief.lower():
-        tagline = "Empowering Creative Innovation"
-    elif "research" in brief.lower():
-        tagline = "Advancing AI Research"
-    else:
-        tagline = "AI-Powered Brand Consistency"
-    
-    draw.text((width//2, 400), tagline, fill=accent, font=font_subtitle, anchor="mm")
-    
-    # Revision badge
-    if rev_count > 0:
-        draw.rounded_rectangle([width//2 - 140, 520, width//2 + 140, 570],
-                              radius=25, fill=accent + (220,), outline=(255, 255, 255), width=2)
-        draw.text((width//2, 545), f"✓ Revision {rev_count}", 
-                 fill=(255, 255, 255), font=font_small, anchor="mm")
-    
-    # Scanlines
-    for i in range(0, height, 3):
-        draw.line([(0, i), (width, i)], fill=(255, 255, 255, 3), width=1)
-    
-    # Enhance
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(1.3)
+    print("📦 Creating premium styled image...")
+    await asyncio.to_thread(create_premium_fallback, path, brief, strategy, rev_count, main_subject,
+                            state.get("brand"))
     
-    img.save(path, format='PNG', quality=95)
-    print(f"✅ Unique styled image created")
\ No newline at end of file
+    return await asyncio.to_thread(_store_image, state, rev_count, image_prompt, path)
+
+
+def revise_visual(state: AgentState) -> AgentState:
+    """Designer pass for a rejected visual; it counts as a revision, so the seed and artifact name change."""
+    rev_count = state.get("revision_count", 0) + 1
+    return {**designer({**state, "revision_count": rev_count}), "revision_count": rev_count}
+
+
+async def arevise_visual(state: AgentState) -> AgentState:
+    """Async variant of revise_visual()."""
+    rev_count = state.get("revision_count", 0) + 1
+    return {**await adesigner({**state, "revision_count": rev_count}), "revision_count": rev_count}
+
+
+def create_premium_fallback(path, brief, strategy, rev_count, main_subject, brand=None):
+    """Creates highly customized fallback image based on brief (see agents/render_engine.py)."""
+    from agents.render_engine import render_fallback  # NumPy + PIL load only when a fallback is drawn
+
+    start = time.perf_counter()
+    img = render_fallback(brief, rev_count, get_brand_profile(brand))
+    save_master(img, path)
+    record_image(time.perf_counter() - start, "fallback")
+    record_write(path)
+    print(f"✅ Unique styled image created")
@@ -0,0 +1,374 @@
+# agents/gateway.py (Shared, pooled LLM gateway for every Ollama call)
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+from ollama import AsyncClient, Client, ResponseError
+
+from agents.llm_cache import CACHE_ENABLED, PromptCache
+from agents.tracing import record_llm
+
+DEFAULT_MODEL = 'llama3.1:8b'
+
+# Comma-separated list, e.g. OLLAMA_HOSTS="http://gpu-a:11434,http://gpu-b:11434"
+OLLAMA_HOSTS = [h.strip() for h in os.environ.get("OLLAMA_HOSTS", "http://localhost:11434").split(",") if h.strip()]
+REQUEST_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "120"))
+MAX_RETRIES = int(os.environ.get("OLLAMA_MAX_RETRIES", "2"))
+MAX_INFLIGHT_PER_MODEL = int(os.environ.get("OLLAMA_MAX_INFLIGHT", "4"))
+RETRY_BACKOFF = float(os.environ.get("OLLAMA_RETRY_BACKOFF", "0.5"))
+# How long Ollama keeps the model loaded after a request: a duration ("30m") or seconds; -1 = forever
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+# A load_duration above this means the call paid for loading the model (a cold start)
+COLD_LOAD_THRESHOLD_S = 0.5
+
+
+def parse_keep_alive(value):
+    """Ollama takes either a Go duration string or a number of seconds; "-1" must be sent as a number."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value) if "." in str(value) else int(value)
+    except ValueError:
+        return value
+
+
+def _field(response, name, default=None):
+    """Reads a field from an ollama response (dict or pydantic model)."""
+    try:
+        value = response[name]
+    except (KeyError, TypeError):
+        value = getattr(response, name, default)
+    return default if value is None else value
+
+
+def response_tokens(response):
+    """Prompt + completion tokens of a generate response (0 for cache hits)."""
+    return (_field(response, "prompt_eval_count", 0) or 0) + (_field(response, "eval_count", 0) or 0)
+
+
+def _new_stream():
+    return {"parts": [], "ttft": None, "final": None, "stopped_early": False}
+
+
+def _collect_chunk(stream, chunk, on_token, start, stop_when=None):
+    """Accumulates one streamed chunk, timing the first token and forwarding text to on_token.
+
+    Returns True when stop_when(text) asks to end the generation early.
+    """
+    text = _field(chunk, "response", "")
+    if text:
+        if stream["ttft"] is None:
+            stream["ttft"] = time.perf_counter() - start
+        stream["parts"].append(text)
+        if on_token is not None:
+            on_token(text)
+    if _field(chunk, "done", False):
+        stream["final"] = chunk
+    elif stop_when is not None and stop_when(text):
+        stream["stopped_early"] = True
+        return True
+    return False
+
+
+def _stream_response(model, stream):
+    final = stream["final"] or {}
+    return {
+        "model": model,
+        "response": "".join(stream["parts"]),
+        "done": True,
+        "prompt_eval_count": _field(final, "prompt_eval_count", 0),
+        # A stream cut short never sees the final stats chunk; one chunk is roughly one token
+        "eval_count": _field(final, "eval_count", len(stream["parts"])),
+        "load_duration": _field(final, "load_duration", 0),
+        "ttft_s": stream["ttft"],
+        "stopped_early": stream["stopped_early"],
+    }
+
+
+class _Host:
+    """One Ollama server. The ollama Client keeps a persistent httpx connection pool."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.inflight = 0
+        self.failures = 0
+        self._client = None  # Created on the first call, not at import
+        self._client_lock = threading.Lock()
+        # httpx async pools are bound to the event loop that created them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = Client(host=self.url, timeout=self.timeout)
+            return self._client
+
+    def async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = AsyncClient(host=self.url, timeout=self.timeout)
+            self._async_clients[loop] = client
+        return client
+
+
+class LLMGateway:
+    """Routes generate calls to the least-loaded host, capping in-flight requests per model."""
+
+    def __init__(self, hosts=None, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES,
+                 max_inflight_per_model=MAX_INFLIGHT_PER_MODEL, backoff=RETRY_BACKOFF, cache=None,
+                 keep_alive=KEEP_ALIVE):
+        self.hosts = [_Host(url, timeout) for url in (hosts or OLLAMA_HOSTS)]
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.max_retries = max_retries
+        self.max_inflight_per_model = max_inflight_per_model
+        self.backoff = backoff
+        self.cache = cache
+        self.calls = deque(maxlen=1000)  # Recent per-call records (latency, tokens, host)
+        self._lock = threading.Lock()
+        self._model_slots = {}
+        self._async_model_slots = weakref.WeakKeyDictionary()  # loop -> {model: asyncio.Semaphore}
+
+    # --- Routing & Concurrency ---
+
+    def _slot(self, model):
+        with self._lock:
+            if model not in self._model_slots:
+                self._model_slots[model] = threading.BoundedSemaphore(self.max_inflight_per_model)
+            return self._model_slots[model]
+
+    def _async_slot(self, model):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            slots = self._async_model_slots.setdefault(loop, {})
+            if model not in slots:
+                slots[model] = asyncio.Semaphore(self.max_inflight_per_model)
+            return slots[model]
+
+    def _acquire_host(self):
+        with self._lock:
+            host = min(self.hosts, key=lambda h: (h.inflight, h.failures))
+            host.inflight += 1
+            return host
+
+    def _release_host(self, host, failed):
+        with self._lock:
+            host.inflight -= 1
+            host.failures = host.failures + 1 if failed else 0
+
+    @staticmethod
+    def _is_retryable(error):
+        # 4xx (unknown model, bad request) will not get better on retry
+        if isinstance(error, ResponseError):
+            return getattr(error, "status_code", 500) >= 500
+        return True
+
+    # --- Cache ---
+
+    def enable_cache(self, **cache_kwargs):
+        if self.cache is None:
+            self.cache = PromptCache(**cache_kwargs)
+        return self.cache
+
+    def disable_cache(self):
+        self.cache = None
+
+    def cache_stats(self):
+        return self.cache.snapshot() if self.cache else None
+
+    def _cache_lookup(self, model, prompt, options, kwargs):
+        """Returns (cache_key, cached_response); the key is None when the call is not cacheable."""
+        if self.cache is None or not self.cache.is_cacheable(options):
+            return None, None
+        cache_key = PromptCache.make_key(model, prompt, options, **kwargs)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print(f"⚡ LLM cache hit for {model} ({cache_key[:12]})")
+            self.calls.append({"model": model, "host": "cache", "latency_s": 0.0, "prompt_tokens": 0,
+                               "completion_tokens": 0, "attempts": 0, "cached": True})
+            record_llm(0.0, cached=True)
+        return cache_key, cached
+
+    def _cache_store(self, cache_key, model, response):
+        if cache_key is None or self.cache is None:
+            return
+        self.cache.put(cache_key, {
+            "model": model,
+            "response": _field(response, "response", ""),
+            "done": True,
+            "prompt_eval_count": _field(response, "prompt_eval_count", 0),
+            "eval_count": _field(response, "eval_count", 0),
+            "cached": True,
+        })
+
+    # --- Public API ---
+
+    def generate(self, prompt, model=DEFAULT_MODEL, options=None, on_token=None, stop_when=None, **kwargs):
+        """Blocking generate with retry/backoff. Returns the ollama response.
+
+        Low-temperature calls are served from the prompt cache when it is enabled. With on_token,
+        the call streams and on_token(text) fires per chunk; the response then carries "ttft_s".
+        stop_when(text) is also called per chunk and closes the stream as soon as it returns True.
+        """
+        cache_key, cached = self._cache_lookup(model, prompt, options, kwargs)
+        if cached is not None:
+            return self._replay(cached, on_token)
+        response = self._generate_uncached(prompt, model, options, on_token, stop_when, **kwargs)
+        self._cache_store(cache_key, model, response)
+        return response
+
+    async def agenerate(self, prompt, model=DEFAULT_MODEL, options=None, on_token=None, stop_when=None, **kwargs):
+        """Async twin of generate(), built on ollama.AsyncClient."""
+        cache_key, cached = self._cache_lookup(model, prompt, options, kwargs)
+        if cached is not None:
+            return self._replay(cached, on_token)
+        response = await self._agenerate_uncached(prompt, model, options, on_token, stop_when, **kwargs)
+        self._cache_store(cache_key, model, response)
+        return response
+
+    @staticmethod
+    def _replay(cached, on_token):
+        """Cache hits arrive as a single 'token' so streaming consumers still render them."""
+        if on_token is not None and cached.get("response"):
+            on_token(cached["response"])
+        return {**cached, "ttft_s": 0.0}
+
+    def _generate_uncached(self, prompt, model, options, on_token=None, stop_when=None, **kwargs):
+        if self.keep_alive is not None:
+            kwargs.setdefault("keep_alive", self.keep_alive)  # Not part of the cache key
+        with self._slot(model):
+            attempt = 0
+            while True:
+                host = self._acquire_host()
+                start = time.perf_counter()
+                stream = _new_stream()
+                try:
+                    if on_token is None and stop_when is None:
+                        response = host.client.generate(model=model, prompt=prompt, options=options, stream=False, **kwargs)
+                    else:
+                        chunks = host.client.generate(model=model, prompt=prompt, options=options, stream=True, **kwargs)
+                        try:
+                            for chunk in chunks:
+                                if _collect_chunk(stream, chunk, on_token, start, stop_when):
+                                    break
+                        finally:
+                            chunks.close()  # Dropping the connection makes Ollama stop generating
+                        response = _stream_response(model, stream)
+                except Exception as e:
+                    self._release_host(host, failed=True)
+                    # Once tokens have reached the caller a retry would duplicate them
+                    if attempt >= self.max_retries or not self._is_retryable(e) or stream["parts"]:
+                        raise
+                    attempt += 1
+                    print(f"⚠️ LLM call to {host.url} failed ({e}). Retry {attempt}/{self.max_retries}...")
+                    time.sleep(self.backoff * (2 ** (attempt - 1)))
+                    continue
+                self._release_host(host, failed=False)
+                self._record(model, host.url, time.perf_counter() - start, response, attempt + 1)
+                return response
+
+    async def _agenerate_uncached(self, prompt, model, options, on_token=None, stop_when=None, **kwargs):
+        if self.keep_alive is not None:
+            kwargs.setdefault("keep_alive", self.keep_alive)  # Not part of the cache key
+        async with self._async_slot(model):
+            attempt = 0
+            while True:
+                host = self._acquire_host()
+                start = time.perf_counter()
+                stream = _new_stream()
+                try:
+                    if on_token is None and stop_when is None:
+                        response = await host.async_client().generate(model=model, prompt=prompt, options=options, stream=False, **kwargs)
+                    else:
+                        chunks = await host.async_client().generate(model=model, prompt=prompt, options=options, stream=True, **kwargs)
+                        try:
+                            async for chunk in chunks:
+                                if _collect_chunk(stream, chunk, on_token, start, stop_when):
+                                    break
+                        finally:
+                            await chunks.aclose()
+                        response = _stream_response(model, stream)
+                except Exception as e:
+                    self._release_host(host, failed=True)
+                    if attempt >= self.max_retries or not self._is_retryable(e) or stream["parts"]:
+                        raise
+                    attempt += 1
+                    print(f"⚠️ LLM call to {host.url} failed ({e}). Retry {attempt}/{self.max_retries}...")
+                    await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+                    continue
+                self._release_host(host, failed=False)
+                self._record(model, host.url, time.perf_counter() - start, response, attempt + 1)
+                return response
+
+    def embed(self, texts, model):
+        """Embeds a list of texts with an Ollama embedding model (one request, no retries)."""
+        with self._slot(model):
+            host = self._acquire_host()
+            try:
+                response = host.client.embed(model=model, input=list(texts), keep_alive=self.keep_alive)
+            except Exception:
+                self._release_host(host, failed=True)
+                raise
+            self._release_host(host, failed=False)
+        return _field(response, "embeddings", [])
+
+    def _record(self, model, host_url, latency, response, attempts):
+        record = {
+            "model": model,
+            "host": host_url,
+            "latency_s": round(latency, 4),
+            "prompt_tokens": _field(response, "prompt_eval_count", 0),
+            "completion_tokens": _field(response, "eval_count", 0),
+            "attempts": attempts,
+        }
+        ttft = _field(response, "ttft_s")
+        if ttft is not None:
+            record["ttft_s"] = round(ttft, 4)
+        load_s = (_field(response, "load_duration", 0) or 0) / 1e9
+        if load_s >= COLD_LOAD_THRESHOLD_S:
+            record["cold_load_s"] = round(load_s, 4)
+        self.calls.append(record)
+        record_llm(latency, record["prompt_tokens"], record["completion_tokens"])
+        if _field(response, "stopped_early", False):
+            record["stopped_early"] = True
+        print(f"⏱️ LLM {model} @ {host_url}: {latency:.2f}s"
+              + (f" (first token {ttft:.2f}s)" if ttft is not None else "")
+              + (" [stopped early]" if record.get("stopped_early") else "")
+              + (f" [cold start, model load {load_s:.2f}s]" if "cold_load_s" in record else "")
+              + f", {record['prompt_tokens']} prompt / {record['completion_tokens']} completion tokens")
+        return record
+
+    def summary(self):
+        """Aggregates recent calls per model: count, mean latency, token totals and cold starts."""
+        per_model = {}
+        for call in list(self.calls):
+            agg = per_model.setdefault(call["model"], {"calls": 0, "latency_s": 0.0, "prompt_tokens": 0,
+                                                       "completion_tokens": 0, "cold_starts": 0})
+            agg["calls"] += 1
+            agg["cold_starts"] += int("cold_load_s" in call)
+            agg["latency_s"] += call["latency_s"]
+            agg["prompt_tokens"] += call["prompt_tokens"]
+            agg["completion_tokens"] += call["completion_tokens"]
+        for agg in per_model.values():
+            agg["mean_latency_s"] = round(agg.pop("latency_s") / agg["calls"], 4)
+        return per_model
+
+
+# Process-wide gateway shared by every agent and crew.py
+gateway = LLMGateway(cache=PromptCache() if CACHE_ENABLED else None)
+
+
+def generate(prompt, model=DEFAULT_MODEL, options=None, on_token=None, stop_when=None, **kwargs):
+    """Module-level shortcut for gateway.generate."""
+    return gateway.generate(prompt, model=model, options=options, on_token=on_token, stop_when=stop_when, **kwargs)
+
+
+async def agenerate(prompt, model=DEFAULT_MODEL, options=None, on_token=None, stop_when=None, **kwargs):
+    """Module-level shortcut for gateway.agenerate."""
+    return await gateway.agenerate(prompt, model=model, options=options, on_token=on_token,
+                                   stop_when=stop_when, **kwargs)
@@ -0,0 +1,259 @@
+# agents/image_backends.py (Pluggable text-to-image backends used by the designer)
+import asyncio
+import os
+import random
+import threading
+import time
+import urllib.parse
+import weakref
+from io import BytesIO
+
+from agents.image_encoding import save_master
+
+# requests, httpx and PIL are imported on first use so importing the graph stays fast
+
+# "pollinations" (default), "diffusers" (local Stable Diffusion) or "none" (PIL fallback only).
+# Point POLLINATIONS_URL at benchmarks/stub_image_server.py to run fully offline.
+IMAGE_BACKEND = os.environ.get("BRANDSYNC_IMAGE_BACKEND", "pollinations").lower()
+POLLINATIONS_URL = os.environ.get("POLLINATIONS_URL", "https://image.pollinations.ai").rstrip("/")
+CONNECT_TIMEOUT = float(os.environ.get("POLLINATIONS_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("POLLINATIONS_TIMEOUT", "60"))
+DIFFUSERS_MODEL = os.environ.get("BRANDSYNC_SD_MODEL", "runwayml/stable-diffusion-v1-5")
+
+MIN_IMAGE_BYTES = 5000  # Anything smaller is an error page, not an image
+
+
+# --- 1. Circuit Breaker ---
+
+class CircuitBreaker:
+    """Stops calling a backend after repeated failures, then lets one probe through after a cool-down."""
+
+    def __init__(self, failure_threshold=3, reset_timeout=120.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+# --- 2. Backends ---
+
+class ImageBackend:
+    """Interface: write a width x height PNG for `prompt` to `path`; return True on success."""
+
+    name = "base"
+
+    def generate(self, prompt, path, width=1200, height=630, seed=None):
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, path, width=1200, height=630, seed=None):
+        return await asyncio.to_thread(self.generate, prompt, path, width, height, seed)
+
+
+def _save_image_bytes(content, path):
+    from PIL import Image
+
+    save_master(Image.open(BytesIO(content)), path)
+
+
+class PollinationsBackend(ImageBackend):
+    """Pollinations.ai (or any server speaking its GET /prompt/<text> API) over pooled HTTP."""
+
+    name = "pollinations"
+
+    def __init__(self, base_url=POLLINATIONS_URL, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, model="flux"):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.model = model
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()  # loop -> httpx.AsyncClient
+
+    def url(self, prompt, width, height, seed=None):
+        url = (
+            f"{self.base_url}/prompt/{urllib.parse.quote(prompt)}"
+            f"?width={width}&height={height}"
+            f"&nologo=true"
+            f"&enhance=true"
+            f"&model={self.model}"
+        )
+        if seed is not None:
+            return url + f"&seed={seed}"
+        # Variety mode: random seed + timestamp keep Pollinations from returning a cached image
+        return url + f"&seed={random.randint(1, 999999)}&timestamp={int(time.time())}"
+
+    def session(self):
+        with self._session_lock:
+            if self._session is None:
+                import requests
+
+                self._session = requests.Session()
+            return self._session
+
+    def generate(self, prompt, path, width=1200, height=630, seed=None):
+        response = self.session().get(self.url(prompt, width, height, seed), timeout=self.timeout)
+        if response.status_code == 200 and len(response.content) > MIN_IMAGE_BYTES:
+            _save_image_bytes(response.content, path)
+            return True
+        return False
+
+    def _async_client(self):
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            import httpx
+
+            connect, read = self.timeout
+            client = httpx.AsyncClient(timeout=httpx.Timeout(read, connect=connect))
+            self._async_clients[loop] = client
+        return client
+
+    async def agenerate(self, prompt, path, width=1200, height=630, seed=None):
+        response = await self._async_client().get(self.url(prompt, width, height, seed))
+        if response.status_code == 200 and len(response.content) > MIN_IMAGE_BYTES:
+            await asyncio.to_thread(_save_image_bytes, response.content, path)
+            return True
+        return False
+
+
+class DiffusersBackend(ImageBackend):
+    """Local Stable Diffusion via diffusers. The pipeline is loaded once and reused across calls."""
+
+    name = "diffusers"
+
+    def __init__(self, model_id=DIFFUSERS_MODEL, steps=25):
+        self.model_id = model_id
+        self.steps = steps
+        self._pipe = None
+        self._device = "cpu"
+        self._load_lock = threading.Lock()
+        self._run_lock = threading.Lock()  # One pipeline, one generation at a time
+
+    def _pipeline(self):
+        with self._load_lock:
+            if self._pipe is None:
+                import torch
+                from diffusers import AutoPipelineForText2Image
+
+                self._device = "cuda" if torch.cuda.is_available() else "cpu"
+                dtype = torch.float16 if self._device == "cuda" else torch.float32
+                print(f"🧠 Loading {self.model_id} on {self._device} (one-time)...")
+                self._pipe = AutoPipelineForText2Image.from_pretrained(self.model_id, torch_dtype=dtype).to(self._device)
+            return self._pipe
+
+    def generate(self, prompt, path, width=1200, height=630, seed=None):
+        import torch
+
+        pipe = self._pipeline()
+        generator = torch.Generator(device=self._device).manual_seed(seed if seed is not None else random.randint(1, 999999))
+        with self._run_lock:
+            # SD needs multiples of 8; render at the nearest size and resize to the requested one
+            image = pipe(prompt, width=width // 8 * 8, height=height // 8 * 8,
+                         num_inference_steps=self.steps, generator=generator).images[0]
+        save_master(image.resize((width, height)), path)
+        return True
+
+
+class GuardedBackend(ImageBackend):
+    """Wraps a backend with a circuit breaker so a dead backend fails fast instead of timing out."""
+
+    def __init__(self, backend, breaker=None):
+        self.backend = backend
+        self.breaker = breaker or CircuitBreaker()
+        self.name = backend.name
+
+    def _skip(self):
+        if self.breaker.allow():
+            return False
+        print(f"⚡ {self.name} circuit open; skipping straight to fallback")
+        return True
+
+    def _record(self, ok):
+        if ok:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        return ok
+
+    def generate(self, prompt, path, width=1200, height=630, seed=None):
+        if self._skip():
+            return False
+        try:
+            ok = self.backend.generate(prompt, path, width, height, seed)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        return self._record(ok)
+
+    async def agenerate(self, prompt, path, width=1200, height=630, seed=None):
+        if self._skip():
+            return False
+        try:
+            ok = await self.backend.agenerate(prompt, path, width, height, seed)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        return self._record(ok)
+
+
+# --- 3. Registry ---
+
+BACKENDS = {
+    "pollinations": PollinationsBackend,
+    "diffusers": DiffusersBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_image_backend():
+    """Process-wide backend selected by BRANDSYNC_IMAGE_BACKEND; None means fallback-only."""
+    global _backend
+    with _backend_lock:
+        if _backend is None and IMAGE_BACKEND in BACKENDS:
+            _backend = GuardedBackend(BACKENDS[IMAGE_BACKEND]())
+        return _backend
+
+
+def set_image_backend(backend):
+    """Swaps the process-wide backend (wrapped in a fresh circuit breaker); None disables it."""
+    global _backend
+    with _backend_lock:
+        _backend = GuardedBackend(backend) if backend is not None else None
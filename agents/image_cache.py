@@ -0,0 +1,99 @@
+# agents/image_cache.py (Content-addressed on-disk cache of generated images with LRU eviction)
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+IMAGE_CACHE_DIR = os.environ.get("BRANDSYNC_IMAGE_CACHE_DIR", os.path.join(".cache", "images"))
+IMAGE_CACHE_MB = float(os.environ.get("BRANDSYNC_IMAGE_CACHE_MB", "512"))
+
+
+class ImageCache:
+    """Maps a hash of (backend, prompt, size, seed) to a PNG on disk; evicts least-recently-used files."""
+
+    def __init__(self, root=IMAGE_CACHE_DIR, max_bytes=int(IMAGE_CACHE_MB * 1024 * 1024)):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Computed lazily on first put
+
+    @staticmethod
+    def make_key(backend_name, prompt, width, height, seed):
+        payload = json.dumps([backend_name, prompt, width, height, seed], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def get(self, key):
+        """Returns the cached file path (and marks it recently used), or None."""
+        path = self.path_for(key)
+        with self._lock:
+            if not os.path.exists(path):
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+        os.utime(path, None)  # mtime doubles as the LRU clock
+        return path
+
+    def put(self, key, src_path):
+        """Copies src_path into the cache atomically and returns the cached path."""
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(src_path, tmp_path)
+
+        with self._lock:
+            # Replacing an entry (a regenerated key, or two workers racing on one) must not count it twice
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += os.path.getsize(path) - replaced
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+        return path
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.endswith(".png"):
+                    yield os.path.join(dirpath, name)
+
+    def _scan_total(self):
+        return sum(os.path.getsize(p) for p in self._files())
+
+    def evict(self):
+        """Deletes least-recently-used images until the cache is back under max_bytes."""
+        with self._lock:
+            entries = sorted((os.stat(p).st_mtime, os.path.getsize(p), p) for p in self._files())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                self.stats["evicted"] += 1
+            self._total_bytes = total
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Process-wide image cache shared by every designer call."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache()
+        return _cache
@@ -0,0 +1,207 @@
+# agents/image_encoding.py (Master PNG + background delivery variants and thumbnails)
+#
+# Usage:
+#   save_master(img, path)                                   # PNG at BRANDSYNC_PNG_COMPRESS, timed
+#   variants = schedule_variants(run_id, "image_rev_0.png", master_path, master_id)
+#   variants["thumb"]                                        # run path the thumbnail will appear at
+#   variant_artifacts(master_id)                             # {"webp": id, "jpeg": id, "thumb": id} once encoded
+#   encoding_stats()                                         # bytes and milliseconds per image
+#
+# The master is written once as PNG (quality= is ignored by PNG; compress_level is what costs CPU).
+# WebP/JPEG delivery copies and a small preview thumbnail are encoded on a background thread pool and
+# filed into the artifact store next to the master, so the designer node returns as soon as the master
+# is stored. Identical masters (image cache hits) reuse the variants already encoded for them.
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PNG_COMPRESS_LEVEL = int(os.environ.get("BRANDSYNC_PNG_COMPRESS", "6"))
+DELIVERY_FORMATS = [f for f in os.environ.get("BRANDSYNC_IMAGE_FORMATS", "webp,jpeg").split(",") if f]
+DELIVERY_QUALITY = int(os.environ.get("BRANDSYNC_IMAGE_QUALITY", "80"))
+THUMB_WIDTH = int(os.environ.get("BRANDSYNC_THUMB_PX", "320"))
+ENCODE_WORKERS = int(os.environ.get("BRANDSYNC_ENCODE_WORKERS", "2"))
+VARIANT_WAIT_S = 5.0
+
+_EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+
+_pool = None
+_lock = threading.Lock()
+_pending = {}   # master_id -> Future
+_variants = {}  # master_id -> {kind: artifact_id}
+_stats = {"images": 0, "master_bytes": 0, "master_ms": 0.0, "variants": {}}
+
+
+def _webp_supported():
+    from PIL import features
+
+    return features.check("webp")
+
+
+def _formats():
+    return [f for f in DELIVERY_FORMATS if f in _EXTENSIONS and (f != "webp" or _webp_supported())]
+
+
+def _delivery_format():
+    return "webp" if _webp_supported() else "jpeg"
+
+
+def variant_name(name, kind):
+    """image_rev_0.png -> image_rev_0.webp / image_rev_0.jpg / image_rev_0.thumb.webp"""
+    stem = os.path.splitext(name)[0]
+    if kind == "thumb":
+        return f"{stem}.thumb{_EXTENSIONS[_delivery_format()]}"
+    return f"{stem}{_EXTENSIONS[kind]}"
+
+
+# --- 1. Master ---
+
+def save_master(img, path):
+    """Writes the master PNG once and records its size and encode time."""
+    start = time.perf_counter()
+    img.save(path, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    _record_master(os.path.getsize(path), (time.perf_counter() - start) * 1000)
+
+
+def _record_master(size, ms):
+    with _lock:
+        _stats["images"] += 1
+        _stats["master_bytes"] += size
+        _stats["master_ms"] += ms
+
+
+def _record_variant(kind, size, ms):
+    with _lock:
+        entry = _stats["variants"].setdefault(kind, {"count": 0, "bytes": 0, "ms": 0.0})
+        entry["count"] += 1
+        entry["bytes"] += size
+        entry["ms"] += ms
+
+
+# --- 2. Variants ---
+
+def _encode(img, kind, fmt, path):
+    start = time.perf_counter()
+    if fmt == "jpeg":
+        img = img.convert("RGB")
+    img.save(path, format=fmt.upper(), quality=DELIVERY_QUALITY)
+    size, ms = os.path.getsize(path), (time.perf_counter() - start) * 1000
+    _record_variant(kind, size, ms)
+    return f"{kind} {size / 1024:.0f} KB ({ms:.0f} ms)"
+
+
+def delivery_extension():
+    """Extension of the preferred delivery format (WebP where Pillow supports it, else JPEG)."""
+    return _EXTENSIONS[_delivery_format()]
+
+
+def encode_delivery(img, path, kind):
+    """Encodes an already-derived image (e.g. a channel crop) in the delivery format; stats are kept under `kind`."""
+    return _encode(img, kind, _delivery_format(), path)
+
+
+def _encode_all(run_id, name, master_path, master_id):
+    from PIL import Image
+
+    from agents.artifacts import get_artifact_store
+
+    store = get_artifact_store()
+    ids, notes = {}, []
+    try:
+        with Image.open(master_path) as master:
+            master.load()
+            for kind, fmt in [(kind, kind) for kind in _formats()] + [("thumb", _delivery_format())]:
+                img = master
+                if kind == "thumb":
+                    img = master.copy()
+                    img.thumbnail((THUMB_WIDTH, THUMB_WIDTH))
+                tmp_path = store.temp_path(_EXTENSIONS[fmt])
+                notes.append(_encode(img, kind, fmt, tmp_path))
+                ids[kind] = store.put_file(run_id, variant_name(name, kind), tmp_path, move=True)["id"]
+        with _lock:
+            _variants[master_id] = ids
+    finally:
+        with _lock:
+            _pending.pop(master_id, None)
+    print(f"🗜️ {name}: PNG {os.path.getsize(master_path) / 1024:.0f} KB → {', '.join(notes)}")
+    return ids
+
+
+def _link_existing(run_id, name, master_id):
+    """A master seen before (image cache hit): link its variants into this run without re-encoding."""
+    from agents.artifacts import get_artifact_store
+
+    store = get_artifact_store()
+    with _lock:
+        ids = dict(_variants.get(master_id) or {})
+    for kind, artifact_id in ids.items():
+        blob = store.path_for(artifact_id)
+        if blob is None:
+            return False  # Collected since; encode again
+        store.put_file(run_id, variant_name(name, kind), blob)
+    return bool(ids)
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+        return _pool
+
+
+def _report_failure(future):
+    if future.exception():
+        print(f"⚠️ Variant encoding failed: {future.exception()}")
+
+
+def schedule_variants(run_id, name, master_path, master_id):
+    """Queues delivery variants and a thumbnail for a stored master. Returns {kind: run path} they will land at."""
+    from agents.artifacts import get_artifact_store
+
+    run_dir = get_artifact_store().run_dir(run_id)
+    paths = {kind: os.path.join(run_dir, variant_name(name, kind)) for kind in _formats() + ["thumb"]}
+    if _link_existing(run_id, name, master_id):
+        return paths
+
+    pool = _get_pool()
+    with _lock:
+        future = _pending.get(master_id)
+        if future is None:
+            future = _pending[master_id] = pool.submit(_encode_all, run_id, name, master_path, master_id)
+            future.add_done_callback(_report_failure)
+            return paths
+    # The same master is already encoding for another run: link its results when they land
+    future.add_done_callback(lambda f: f.exception() or _link_existing(run_id, name, master_id))
+    return paths
+
+
+def variant_artifacts(master_id, timeout=VARIANT_WAIT_S):
+    """{kind: artifact_id} for a master, waiting up to `timeout` for encoding still in flight."""
+    with _lock:
+        future = _pending.get(master_id)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
+    with _lock:
+        return dict(_variants.get(master_id) or {})
+
+
+def encoding_stats():
+    """Totals and per-image averages: bytes on disk and encode milliseconds for the master and each variant."""
+    with _lock:
+        images = _stats["images"]
+        report = {"images": images, "master_bytes": _stats["master_bytes"],
+                  "master_ms_per_image": round(_stats["master_ms"] / images, 2) if images else 0.0}
+        for kind, entry in _stats["variants"].items():
+            report[kind] = {
+                "count": entry["count"],
+                "bytes_per_image": entry["bytes"] // entry["count"],
+                "ms_per_image": round(entry["ms"] / entry["count"], 2),
+            }
+    if images and "thumb" in report:
+        # What the UI no longer ships while a run is in progress
+        report["preview_bytes_saved_per_image"] = report["master_bytes"] // images - report["thumb"]["bytes_per_image"]
+    return report
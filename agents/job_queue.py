@@ -0,0 +1,164 @@
+# agents/job_queue.py (SQLite-backed job queue shared by the Streamlit front end and worker processes)
+#
+# The front end only calls submit() / events() / get(); worker.py processes claim() jobs, run the
+# workflow and append progress events. WAL mode lets many readers poll while one worker writes.
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUE_PATH = os.environ.get("BRANDSYNC_QUEUE_DB", os.path.join(".cache", "jobs.sqlite"))
+# A running job whose worker has not sent a heartbeat for this long is handed to another worker
+STALE_AFTER_S = float(os.environ.get("BRANDSYNC_JOB_STALE_S", "90"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    brief TEXT NOT NULL,
+    params TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    node TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, id);
+"""
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class JobQueue:
+    """Durable FIFO of briefs. Safe to use from many threads and processes at once."""
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections must not cross threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- Producer side ---
+
+    def submit(self, brief, params=None, job_id=None):
+        """Queues a brief and returns its job ID (also used as the checkpoint run ID)."""
+        job_id = job_id or uuid.uuid4().hex[:12]
+        self._conn().execute(
+            "INSERT INTO jobs (id, brief, params, created_at) VALUES (?, ?, ?, ?)",
+            (job_id, brief, json.dumps(params or {}), time.time()),
+        )
+        return job_id
+
+    def get(self, job_id):
+        return _row_to_job(self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def list_jobs(self, limit=20):
+        rows = self._conn().execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def events(self, job_id, after_id=0):
+        """Progress events of a job in order; pass the last seen id to fetch only new ones."""
+        rows = self._conn().execute(
+            "SELECT id, ts, type, node, payload FROM events WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, after_id),
+        ).fetchall()
+        return [{**dict(row), "payload": json.loads(row["payload"]) if row["payload"] else {}} for row in rows]
+
+    def counts(self):
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: n for status, n in rows}
+
+    def retry(self, job_id):
+        """Puts a failed job back in the queue; the worker resumes it from its last checkpoint."""
+        self._conn().execute("UPDATE jobs SET status = 'queued', error = NULL WHERE id = ? AND status = 'failed'", (job_id,))
+
+    # --- Worker side ---
+
+    def claim(self, worker=None):
+        """Atomically moves the oldest queued job to 'running' and returns it (None if the queue is empty)."""
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (worker, now, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"]) if row is not None else None
+
+    def heartbeat(self, job_id):
+        self._conn().execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def add_events(self, job_id, events):
+        """Appends (type, node, payload) tuples in one transaction and refreshes the heartbeat."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT INTO events (job_id, ts, type, node, payload) VALUES (?, ?, ?, ?, ?)",
+            [(job_id, now, kind, node, json.dumps(payload, default=str)) for kind, node, payload in events],
+        )
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (now, job_id))
+        conn.execute("COMMIT")
+
+    def complete(self, job_id, result):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'done', result = ?, finished_at = ? WHERE id = ?",
+            (json.dumps(result, default=str), time.time(), job_id),
+        )
+
+    def fail(self, job_id, error):
+        self._conn().execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (str(error), time.time(), job_id),
+        )
+
+    def requeue_stale(self, stale_after=STALE_AFTER_S):
+        """Returns jobs of crashed workers to the queue. Returns how many were requeued."""
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat_at < ?",
+            (time.time() - stale_after,),
+        )
+        return cursor.rowcount
@@ -0,0 +1,148 @@
+# agents/llm_cache.py (Content-addressed prompt/response cache for deterministic LLM calls)
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_ENABLED = os.environ.get("BRANDSYNC_LLM_CACHE", "0") == "1"
+CACHE_PATH = os.environ.get("BRANDSYNC_LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite"))
+
+# Calls hotter than this are creative on purpose; caching them would freeze the output
+MAX_CACHEABLE_TEMPERATURE = 0.5
+# Ollama's own default temperature, used when a call passes no options
+OLLAMA_DEFAULT_TEMPERATURE = 0.8
+
+
+class PromptCache:
+    """Two-tier cache: in-memory LRU over an on-disk SQLite table, with TTL and size eviction."""
+
+    def __init__(self, path=CACHE_PATH, memory_entries=256, max_disk_entries=5000,
+                 max_disk_bytes=64 * 1024 * 1024, ttl_seconds=7 * 24 * 3600,
+                 max_temperature=MAX_CACHEABLE_TEMPERATURE):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0}
+        self._memory = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._db.commit()
+        self.evict()
+
+    # --- Keys & Policy ---
+
+    @staticmethod
+    def make_key(model, prompt, options=None, **kwargs):
+        """SHA-256 over the canonical JSON of everything that shapes the completion."""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "options": options or {}, "extra": kwargs},
+            sort_keys=True, default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, options=None):
+        temperature = (options or {}).get("temperature", OLLAMA_DEFAULT_TEMPERATURE)
+        cacheable = temperature <= self.max_temperature
+        if not cacheable:
+            with self._lock:
+                self.stats["bypassed"] += 1
+        return cacheable
+
+    # --- Lookup & Store ---
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+            row = self._db.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.stats["disk_hits"] += 1
+            return value
+
+    def put(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        blob = json.dumps(value, default=str)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), expires_at, now),
+            )
+            self._db.commit()
+            self._puts_since_evict += 1
+            should_evict = self._puts_since_evict >= 50
+        if should_evict:
+            self.evict()
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # --- Eviction ---
+
+    def evict(self):
+        """Drops expired rows, then least-recently-used rows until under the entry and byte caps."""
+        with self._lock:
+            self._puts_since_evict = 0
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            if count > self.max_disk_entries or total > self.max_disk_bytes:
+                rows = self._db.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if count <= self.max_disk_entries and total <= self.max_disk_bytes:
+                        break
+                    doomed.append((key,))
+                    count -= 1
+                    total -= size
+                self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+    def snapshot(self):
+        """Counter snapshot for UIs: hits, misses, bypasses and hit rate."""
+        with self._lock:
+            stats = dict(self.stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        return stats
@@ -0,0 +1,115 @@
+# agents/model_lifecycle.py (Model warm-up, keep-alive pinning and reusable system-prompt prefixes)
+#
+# Usage:
+#   from agents.model_lifecycle import warm_up
+#   warm_up()                           # load the model on every host and prime each agent's prefix
+#   python -m agents.model_lifecycle    # same, printing the cold/warm report as JSON
+#
+# Agents send their fixed instructions as Ollama's `system` prompt and register it here. The system
+# prompt is rendered first in the chat template, so consecutive calls share a token prefix that Ollama
+# keeps in its KV cache and does not evaluate again. Warm-up loads the model with the gateway's
+# keep_alive (OLLAMA_KEEP_ALIVE) and runs one 1-token call per prefix, so the first brief pays neither
+# the model load nor the preamble.
+import json
+import os
+import threading
+import time
+
+from agents.gateway import DEFAULT_MODEL, _field, gateway
+
+WARMUP_ENABLED = os.environ.get("BRANDSYNC_WARMUP", "1") != "0"
+WARMUP_PROMPT = "Reply with OK."
+
+_prefixes = {}  # agent -> system prompt
+_reports = []
+_lock = threading.Lock()
+
+
+# --- 1. Prompt Prefixes ---
+
+def register_prefix(agent, system):
+    """Records an agent's static system prompt so warm-up can prime it. Returns the prompt unchanged."""
+    with _lock:
+        _prefixes[agent] = system
+    return system
+
+
+def prefixes():
+    with _lock:
+        return dict(_prefixes)
+
+
+# --- 2. Warm-Up ---
+
+def _timed_generate(host, model, keep_alive, **kwargs):
+    start = time.perf_counter()
+    response = host.client.generate(model=model, stream=False, keep_alive=keep_alive, **kwargs)
+    return time.perf_counter() - start, response
+
+
+def warm_host(host, model=DEFAULT_MODEL, keep_alive=None):
+    """Loads `model` on one host, then times a warm call per registered prefix.
+
+    cold_s is the load call (an empty prompt only loads the model); warm_s is the first real 1-token
+    call afterwards and prefix_s the same call per agent prefix once its tokens are cached.
+    """
+    keep_alive = gateway.keep_alive if keep_alive is None else keep_alive
+    report = {"host": host.url, "model": model, "keep_alive": keep_alive}
+    try:
+        cold_s, response = _timed_generate(host, model, keep_alive, prompt="")
+        report["cold_s"] = round(cold_s, 4)
+        report["load_s"] = round(_field(response, "load_duration", 0) / 1e9, 4)
+
+        warm_s, _ = _timed_generate(host, model, keep_alive, prompt=WARMUP_PROMPT, options={"num_predict": 1})
+        report["warm_s"] = round(warm_s, 4)
+
+        report["prefix_s"] = {}
+        for agent, system in prefixes().items():
+            # The first call evaluates the prefix, the second should find it cached
+            _timed_generate(host, model, keep_alive, prompt=WARMUP_PROMPT, system=system, options={"num_predict": 1})
+            primed_s, _ = _timed_generate(host, model, keep_alive, prompt=WARMUP_PROMPT, system=system,
+                                          options={"num_predict": 1})
+            report["prefix_s"][agent] = round(primed_s, 4)
+    except Exception as e:
+        report["error"] = str(e)
+    return report
+
+
+def warm_up(models=(DEFAULT_MODEL,), keep_alive=None):
+    """Warms every model on every gateway host. Failures are reported, never raised."""
+    results = []
+    for model in models:
+        for host in gateway.hosts:
+            report = warm_host(host, model, keep_alive)
+            results.append(report)
+            if "error" in report:
+                print(f"⚠️ Warm-up of {model} @ {host.url} failed: {report['error']}")
+            else:
+                print(f"🔥 Warmed {model} @ {host.url}: cold {report['cold_s']:.2f}s "
+                      f"(load {report['load_s']:.2f}s) → warm {report['warm_s']:.2f}s, keep_alive={report['keep_alive']}")
+    with _lock:
+        _reports.extend(results)
+    return results
+
+
+def warm_up_in_background(models=(DEFAULT_MODEL,), keep_alive=None):
+    """Starts warm_up() on a daemon thread (no-op when BRANDSYNC_WARMUP=0). Returns the thread or None."""
+    if not WARMUP_ENABLED:
+        return None
+    thread = threading.Thread(target=warm_up, args=(models, keep_alive), daemon=True, name="brandsync-warmup")
+    thread.start()
+    return thread
+
+
+def warmup_report():
+    """Every warm-up result of this process, oldest first."""
+    with _lock:
+        return list(_reports)
+
+
+if __name__ == "__main__":
+    # Importing the agents registers their prefixes
+    import agents.copywriter  # noqa: F401
+    import agents.strategist  # noqa: F401
+
+    print(json.dumps(warm_up(), indent=2))
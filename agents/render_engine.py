@@ -0,0 +1,113 @@
+# agents/render_engine.py (Cached, vectorized renderer behind designer.create_premium_fallback)
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from agents.brand_profiles import get_brand_profile
+
+WIDTH, HEIGHT = 1200, 630
+CONTRAST = 1.3
+SCANLINE_STEP = 3
+SCANLINE_ALPHA = 3  # Out of 255: a barely-visible CRT texture
+
+# Themes, compositions, taglines and fonts come from the brand profile (agents/brand_profiles.py).
+# Backgrounds are cached per profile instance, so a hot-reloaded profile gets freshly rendered assets.
+
+# --- 1. Cached Layers ---
+
+def _gradient_with_scanlines(top, bottom, width=WIDTH, height=HEIGHT):
+    """Vertical gradient with faint scanlines baked in, as one (height, width, 3) uint8 array."""
+    ratio = np.arange(height, dtype=np.float32)[:, None] / height
+    top = np.asarray(top, dtype=np.float32)
+    rows = np.trunc(top + (np.asarray(bottom, dtype=np.float32) - top) * ratio)
+    rows[::SCANLINE_STEP] += (255.0 - rows[::SCANLINE_STEP]) * (SCANLINE_ALPHA / 255.0)
+    return np.broadcast_to(rows.astype(np.uint8)[:, None, :], (height, width, 3))
+
+
+def _contrast_lut(mean):
+    """Per-channel LUT equivalent to ImageEnhance.Contrast(CONTRAST) around a fixed mean."""
+    levels = np.arange(256, dtype=np.float32)
+    return np.clip(mean + CONTRAST * (levels - mean), 0, 255).astype(np.uint8)
+
+
+@lru_cache(maxsize=64)
+def _background(profile, theme, composition):
+    """Gradient, blurred glow and outlines for one profile's (theme, composition), contrast already applied.
+
+    Returns (image, lut). Text drawn later uses lut-mapped colours: the contrast stretch is affine,
+    so stretching the fill colour is equivalent to stretching the composited pixel.
+    """
+    colors = profile.themes[theme]
+    accent = colors["accent"]
+    img = Image.fromarray(np.ascontiguousarray(_gradient_with_scanlines(*colors["bg"])), "RGB")
+
+    glow_layer = Image.new('RGBA', (WIDTH, HEIGHT), (0, 0, 0, 0))
+    glow_draw = ImageDraw.Draw(glow_layer)
+    for shape, box, alpha in profile.compositions[composition]["glow"]:
+        (glow_draw.rectangle if shape == "rect" else glow_draw.ellipse)(box, fill=accent + (alpha,))
+    glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=25))
+    img.paste(glow_layer, (0, 0), glow_layer)
+
+    draw = ImageDraw.Draw(img)
+    for shape, box, width in profile.compositions[composition]["outline"]:
+        (draw.rectangle if shape == "rect" else draw.ellipse)(box, outline=accent, width=width)
+
+    mean = int(np.asarray(img.convert("L"), dtype=np.float32).mean() + 0.5)
+    lut = _contrast_lut(mean)
+    return img.point(lut.tolist() * 3), lut
+
+
+@lru_cache(maxsize=8)
+def _fonts(candidates, sizes):
+    """Loads a profile's fallback fonts once per process instead of on every render."""
+    for name in candidates:
+        try:
+            return {key: ImageFont.truetype(name, size) for key, size in sizes}
+        except OSError:
+            continue
+    default = ImageFont.load_default()
+    return {key: default for key, _ in sizes}
+
+
+def warm_cache(profile=None):
+    """Pre-renders every theme/composition pair of a profile (e.g. at worker start)."""
+    profile = profile or get_brand_profile()
+    _fonts(profile.font_candidates, profile.font_sizes)
+    for theme in profile.themes:
+        for composition in profile.compositions:
+            _background(profile, theme, composition)
+
+
+# --- 2. Per-Call Compositing ---
+
+def render_fallback(brief, rev_count, profile=None):
+    """Returns the styled fallback image for a brief; only the text is drawn per call."""
+    profile = profile or get_brand_profile()
+    theme, composition, tagline = profile.visual(brief)
+    base, lut = _background(profile, theme, composition)
+    accent = profile.themes[theme]["accent"]
+    fonts = _fonts(profile.font_candidates, profile.font_sizes)
+
+    def ink(rgb, alpha=None):
+        mapped = tuple(int(lut[c]) for c in rgb)
+        return mapped if alpha is None else mapped + (alpha,)
+
+    img = base.copy()
+    draw = ImageDraw.Draw(img, 'RGBA')
+    cx = WIDTH // 2
+
+    # Theme label, brand name with shadow, brief excerpt and tagline
+    draw.text((cx, 80), profile.themes[theme]["label"], fill=ink(accent), font=fonts["theme"], anchor="mm")
+    draw.text((cx + 4, 224), profile.name, fill=ink((0, 0, 0), 120), font=fonts["title"], anchor="mm")
+    draw.text((cx, 220), profile.name, fill=ink((255, 255, 255)), font=fonts["title"], anchor="mm")
+    draw.text((cx, 320), " ".join(brief.split()[:8]) + "...", fill=ink((220, 220, 220)), font=fonts["small"], anchor="mm")
+    draw.text((cx, 400), tagline, fill=ink(accent), font=fonts["subtitle"], anchor="mm")
+
+    # Revision badge
+    if rev_count > 0:
+        draw.rounded_rectangle([cx - 140, 520, cx + 140, 570],
+                               radius=25, fill=ink(accent, 220), outline=ink((255, 255, 255)), width=2)
+        draw.text((cx, 545), f"✓ Revision {rev_count}", fill=ink((255, 255, 255)), font=fonts["small"], anchor="mm")
+
+    return img
@@ -0,0 +1,490 @@
+# agents/review.py (Tiered review engine behind the brand guardian and the compliance officer)
+#
+# Tier 0: deterministic rules (banned terms, length, hashtags, strategy keywords), compiled once into
+#         one alternation regex per term list.
+# Tier 1: a nearest-centroid classifier over character trigrams: no model download, microseconds per call.
+# Tier 2: llama3.1:8b with REVIEW_SCHEMA, only for what tiers 0 and 1 leave ambiguous.
+#
+# Every verdict records the tier that decided it; review_stats() reports per-check escalation rates so
+# the thresholds below can be tuned. BRANDSYNC_REVIEW_POLICY points at a JSON file overriding any key of
+# DEFAULT_POLICY; BRANDSYNC_REVIEW_LLM=0 never escalates (tier 1 then decides on its leaning).
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+
+from agents.gateway import response_tokens
+from agents.model_lifecycle import register_prefix
+from agents.structured import REVIEW_SCHEMA, agenerate_json, generate_json
+
+LLM_ENABLED = os.environ.get("BRANDSYNC_REVIEW_LLM", "1") != "0"
+POLICY_PATH = os.environ.get("BRANDSYNC_REVIEW_POLICY")
+
+# Tier 1 decides when its margin clears these; anything in between escalates to tier 2
+BRAND_PASS_MARGIN = 0.04
+BRAND_REJECT_MARGIN = -0.04
+COMPLIANCE_SAFE_MARGIN = 0.05
+COMPLIANCE_RISK_MARGIN = -0.05
+
+# Brand scores per dimension are in [0, 1]. A dimension passes at PASS_SCORE; a failing copy dimension
+# scoring at least EDIT_SCORE, with the offending sentences identified, gets a targeted edit instead
+# of a full rewrite
+PASS_SCORE = 0.6
+EDIT_SCORE = 0.35
+
+DEFAULT_POLICY = {
+    "brand": {
+        "banned_terms": ["click here", "buy now", "lorem ipsum", "cheap", "spam", "limited time only",
+                         "act now", "cheapest", "!!!"],
+        "max_chars": 280,
+        "max_sentences": 3,
+        "max_hashtags": 3,
+    },
+    "compliance": {
+        # Hard terms decide at tier 0; soft terms only make the case ambiguous
+        "hard_terms": ["miracle cure", "cures", "no side effects", "risk-free", "100% safe",
+                       "only for men", "only for women", "no girls allowed"],
+        "soft_terms": ["guaranteed", "guarantee", "best in the world", "#1", "100%", "proven",
+                       "never fails", "disney", "marvel", "nike", "adidas", "apple", "©", "™", "®"],
+    },
+}
+
+# Phrases that signal each tone; strategy tones are matched on their words ("Playful & Direct")
+TONE_LEXICON = {
+    "playful": ["fun", "love", "wow", "ready", "let's", "magic", "party", "yay", "oh", "🚀", "🎉", "✨"],
+    "direct": ["today", "now", "start", "sign up", "get", "try", "join", "meet", "no more", "ready"],
+    "energetic": ["fast", "faster", "speed", "boost", "power", "go", "rush", "move", "ignite", "⚡", "🔥"],
+    "professional": ["platform", "solution", "ensure", "reliable", "teams", "deliver", "enterprise", "quality"],
+    "friendly": ["you", "your", "we", "together", "hello", "hi", "welcome", "community", "😊"],
+    "bold": ["never", "first", "new standard", "rewrite", "unstoppable", "break", "dare", "future"],
+    "inspirational": ["dream", "create", "inspire", "imagine", "possible", "journey", "empower", "grow"],
+}
+# Generic corporate filler: copy that resembles this more than the target tone is off-brand
+OFF_TONE_EXEMPLARS = [
+    "Our platform ensures total consistency across all channels.",
+    "We are pleased to announce the availability of our new solution.",
+    "The company provides industry-leading services to its customers.",
+    "Please contact our sales department for more information.",
+]
+SAFE_EXEMPLARS = [
+    "Meet the new way to plan your week. Try it today.",
+    "Our team built this for creators who move fast.",
+    "Join us at the launch event and see it live.",
+]
+RISKY_EXEMPLARS = [
+    "Guaranteed results or your money back, proven to work every time.",
+    "The best product in the world, 100% effective, never fails.",
+    "Official Disney and Marvel characters in our new ad.",
+]
+
+
+def _load_policy(path=POLICY_PATH):
+    policy = json.loads(json.dumps(DEFAULT_POLICY))
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for check, overrides in json.load(f).items():
+                policy.setdefault(check, {}).update(overrides)
+    return policy
+
+
+POLICY = _load_policy()
+
+
+# --- 1. Tier 0: Compiled Rules ---
+
+@lru_cache(maxsize=256)
+def compile_terms(terms):
+    """One case-insensitive alternation for a tuple of terms (longest first, word-bounded where alphanumeric)."""
+    if not terms:
+        return None
+    parts = []
+    for term in sorted(terms, key=len, reverse=True):
+        pattern = re.escape(term)
+        if term[:1].isalnum():
+            pattern = r"\b" + pattern
+        if term[-1:].isalnum():
+            pattern += r"\b"
+        parts.append(pattern)
+    return re.compile("|".join(parts), re.IGNORECASE)
+
+
+def find_terms(terms, text):
+    """Distinct terms (lower-cased) from `terms` found in text."""
+    matcher = compile_terms(tuple(terms))
+    if matcher is None or not text:
+        return []
+    return sorted({m.group(0).lower() for m in matcher.finditer(text)})
+
+
+def parse_strategy(strategy):
+    """Splits "Tone: ...; Keywords: a, b; Goal: ..." into {"tone", "keywords", "goal"}."""
+    fields = {"tone": "", "keywords": [], "goal": ""}
+    for part in (strategy or "").split(";"):
+        key, _, value = part.partition(":")
+        key = key.strip().lower()
+        if key == "keywords":
+            fields["keywords"] = [k.strip() for k in value.split(",") if k.strip()]
+        elif key in fields:
+            fields[key] = value.strip()
+    return fields
+
+
+def tone_names(tone):
+    return [word for word in re.split(r"[^a-z]+", tone.lower()) if word in TONE_LEXICON]
+
+
+def split_sentences(text):
+    return [s for s in re.split(r"(?<=[.!?])\s+", text.strip()) if s]
+
+
+def count_sentences(text):
+    return len(split_sentences(text))
+
+
+# --- 2. Tier 1: Trigram Centroid Classifier ---
+
+def _trigrams(text):
+    padded = f"  {text.lower()} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _cosine(a, b, b_norm=None):
+    dot = sum(count * b.get(gram, 0) for gram, count in a.items())
+    norm = math.sqrt(sum(v * v for v in a.values())) * (b_norm or math.sqrt(sum(v * v for v in b.values())))
+    return dot / norm if norm else 0.0
+
+
+class CentroidClassifier:
+    """Labels text by cosine similarity to the summed trigram vector of each label's exemplars."""
+
+    def __init__(self, exemplars):
+        self.centroids = {}
+        for label, texts in exemplars.items():
+            centroid = Counter()
+            for text in texts:
+                centroid.update(_trigrams(text))
+            self.centroids[label] = (centroid, math.sqrt(sum(v * v for v in centroid.values())))
+
+    def scores(self, text):
+        grams = _trigrams(text)
+        return {label: _cosine(grams, centroid, norm) for label, (centroid, norm) in self.centroids.items()}
+
+    def margin(self, text, positive, negative):
+        scores = self.scores(text)
+        return scores[positive] - scores[negative]
+
+
+@lru_cache(maxsize=64)
+def _tone_classifier(tone_key, keywords):
+    on_tone = [phrase for name in tone_key for phrase in TONE_LEXICON[name]] + list(keywords)
+    return CentroidClassifier({"on": on_tone or list(keywords) or ["brand"], "off": OFF_TONE_EXEMPLARS})
+
+
+@lru_cache(maxsize=1)
+def _risk_classifier():
+    return CentroidClassifier({"safe": SAFE_EXEMPLARS, "risky": RISKY_EXEMPLARS})
+
+
+# --- 3. Verdicts & Stats ---
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _verdict(check, decision, tier, reasons, score=None, target="", **extra):
+    verdict = {"check": check, "decision": decision, "tier": tier, "reasons": reasons,
+               "score": None if score is None else round(score, 4), "target": target, **extra}
+    with _stats_lock:
+        stats = _stats.setdefault(check, {"reviews": 0, "tier0": 0, "tier1": 0, "tier2": 0, "llm_errors": 0})
+        stats["reviews"] += 1
+        stats[f"tier{tier}"] += 1
+    return verdict
+
+
+def _record_llm_error(check):
+    with _stats_lock:
+        _stats.setdefault(check, {"reviews": 0, "tier0": 0, "tier1": 0, "tier2": 0, "llm_errors": 0})["llm_errors"] += 1
+
+
+def review_stats():
+    """Per-check review counts by deciding tier, LLM errors and the tier-2 escalation rate."""
+    with _stats_lock:
+        snapshot = {check: dict(stats) for check, stats in _stats.items()}
+    for stats in snapshot.values():
+        stats["escalation_rate"] = round(stats["tier2"] / stats["reviews"], 4) if stats["reviews"] else 0.0
+    return snapshot
+
+
+# --- 4. Brand Review ---
+
+BRAND_SYSTEM = register_prefix("brand_guardian", (
+    "You are a brand guardian. Decide whether a social media caption matches the strategy's tone and keywords "
+    "and avoids off-brand language. Rule signals from automated checks are included. Respond with a JSON object: "
+    '"approved" (boolean) and "feedback" (one sentence).'
+))
+
+
+def _brand_rules(state):
+    """Tier 0: scores for the format, claims and visual dimensions (plus a tone cap for banned terms),
+    and the sentence-level edits that would fix each one."""
+    policy = POLICY["brand"]
+    claim_policy = POLICY["compliance"]
+    copy = state.get("copy", "")
+    sentences = split_sentences(copy)
+    scores = {"tone": 1.0, "format": 1.0, "claims": 1.0, "visual": 1.0}
+    reasons, edits = [], []
+    if not copy.strip():
+        # Nothing to edit: a format score of 0 sends the revision back to the copywriter
+        scores["format"] = 0.0
+        reasons.append("empty copy")
+
+    hard_claims = soft_claims = 0
+    for sentence in sentences:
+        banned = find_terms(policy["banned_terms"], sentence)
+        if banned:
+            scores["tone"] = 0.45
+            edits.append({"dimension": "tone", "action": "rewrite", "sentence": sentence,
+                          "reason": f"remove off-brand terms: {', '.join(banned)}"})
+        hard = find_terms(claim_policy["hard_terms"], sentence)
+        soft = find_terms(claim_policy["soft_terms"], sentence)
+        hard_claims += len(hard)
+        soft_claims += len(soft)
+        if hard or soft:
+            edits.append({"dimension": "claims", "action": "rewrite", "sentence": sentence,
+                          "reason": f"drop or substantiate claims: {', '.join(hard + soft)}"})
+    if scores["tone"] < 1.0:
+        reasons.append("banned terms in copy")
+    if hard_claims or soft_claims:
+        scores["claims"] = max(0.0, 1.0 - 0.6 * hard_claims - 0.3 * soft_claims)
+        reasons.append(f"{hard_claims + soft_claims} risky claim term(s)")
+
+    if len(sentences) > policy["max_sentences"]:
+        scores["format"] = 0.5
+        reasons.append(f"{len(sentences)} sentences > {policy['max_sentences']}")
+        edits.extend({"dimension": "format", "action": "drop", "sentence": sentence, "reason": "over the sentence limit"}
+                     for sentence in sentences[policy["max_sentences"]:])
+    hashtags = re.findall(r"#\w+", copy)
+    if len(hashtags) > policy["max_hashtags"]:
+        scores["format"] = 0.5
+        reasons.append(f"{len(hashtags)} hashtags > {policy['max_hashtags']}")
+        edits.append({"dimension": "format", "action": "trim_hashtags", "sentence": "",
+                      "reason": f"keep at most {policy['max_hashtags']} hashtags"})
+    if len(copy) > policy["max_chars"] and len(sentences) <= policy["max_sentences"] and sentences:
+        scores["format"] = 0.5
+        reasons.append(f"{len(copy)} characters > {policy['max_chars']}")
+        edits.append({"dimension": "format", "action": "rewrite", "sentence": max(sentences, key=len),
+                      "reason": "shorten this sentence"})
+
+    banned_visual = find_terms(policy["banned_terms"], state.get("image_prompt", ""))
+    if banned_visual:
+        scores["visual"] = 0.0
+        reasons.append(f"banned terms in image prompt: {', '.join(banned_visual)}")
+    return scores, reasons, edits
+
+
+def _tone_score(margin):
+    """Maps a tier-1 margin onto the tone scale: clear passes land above PASS_SCORE, clear misses below EDIT_SCORE."""
+    if margin >= BRAND_PASS_MARGIN:
+        return min(1.0, PASS_SCORE + 2 * margin)
+    if margin <= BRAND_REJECT_MARGIN:
+        return 0.3
+    return 0.5
+
+
+def plan_revision(verdict):
+    """Where a rejected verdict should go: "" (accept), "edit" (targeted sentence edits),
+    "copywriter" (regenerate the copy) or "designer" (regenerate the visual)."""
+    scores = verdict.get("scores")
+    if not scores:
+        return "" if verdict.get("decision") == "PASS" else "copywriter"
+    failing = {dim for dim, score in scores.items() if score < PASS_SCORE}
+    if not failing:
+        return ""
+    copy_failing = failing - {"visual"}
+    if copy_failing:
+        covered = {edit["dimension"] for edit in verdict.get("edits", [])}
+        if copy_failing <= covered and all(scores[dim] >= EDIT_SCORE for dim in copy_failing):
+            return "edit"
+        return "copywriter"
+    return "designer"
+
+
+def _brand_verdict(tier, scores, reasons, edits, margin=None, tokens=0):
+    failing = {dim for dim, score in scores.items() if score < PASS_SCORE}
+    verdict = {"decision": "REJECT" if failing else "PASS", "scores": {k: round(v, 3) for k, v in scores.items()},
+               "edits": [edit for edit in edits if edit["dimension"] in failing]}
+    verdict["target"] = plan_revision(verdict)
+    return _verdict("brand", verdict["decision"], tier, reasons, margin, verdict["target"],
+                    scores=verdict["scores"], edits=verdict["edits"], tokens=tokens)
+
+
+def _brand_fast(state):
+    """Tiers 0 and 1. Returns (verdict or None, partial scores, tier-1 margin, reasons, edits)."""
+    scores, reasons, edits = _brand_rules(state)
+    copy = state.get("copy", "")
+    strategy = parse_strategy(state.get("strategy", ""))
+
+    tones = tuple(tone_names(strategy["tone"]))
+    keyword_hits = find_terms(strategy["keywords"], copy)
+    tone_hits = find_terms([p for name in tones for p in TONE_LEXICON[name]], copy)
+    reasons = reasons + [f"keywords: {', '.join(keyword_hits) or 'none'}", f"tone signals: {', '.join(tone_hits) or 'none'}"]
+    if keyword_hits and (tone_hits or not tones):
+        return _brand_verdict(0, scores, reasons, edits), scores, None, reasons, edits
+
+    margin = _tone_classifier(tones, tuple(strategy["keywords"])).margin(copy, "on", "off")
+    scores["tone"] = min(scores["tone"], _tone_score(margin))
+    rules_failed = any(score < PASS_SCORE for dim, score in scores.items() if dim != "tone")
+    if rules_failed or margin >= BRAND_PASS_MARGIN or margin <= BRAND_REJECT_MARGIN:
+        # Either the rules already reject (so the LLM could not change the outcome) or tier 1 is confident
+        if margin <= BRAND_REJECT_MARGIN:
+            reasons.append("reads as generic corporate copy")
+        return _brand_verdict(0 if rules_failed else 1, scores, reasons, edits, margin), scores, margin, reasons, edits
+    return None, scores, margin, reasons, edits
+
+
+def score_caption(copy, strategy):
+    """Tiers 0 and 1 only, for ranking candidate captions before review: the weakest copy dimension,
+    nudged by keyword coverage and the tone margin. Returns {"score", "scores"}."""
+    scores, _, _ = _brand_rules({"copy": copy, "strategy": strategy})
+    scores.pop("visual")
+    parsed = parse_strategy(strategy)
+    tones = tuple(tone_names(parsed["tone"]))
+    keyword_hits = find_terms(parsed["keywords"], copy)
+    tone_hits = find_terms([p for name in tones for p in TONE_LEXICON[name]], copy)
+    margin = _tone_classifier(tones, tuple(parsed["keywords"])).margin(copy, "on", "off")
+    if not (keyword_hits and (tone_hits or not tones)):
+        scores["tone"] = min(scores["tone"], _tone_score(margin))
+    coverage = len(keyword_hits) / len(parsed["keywords"]) if parsed["keywords"] else 1.0
+    return {"score": round(min(scores.values()) + 0.1 * coverage + margin, 4),
+            "scores": {k: round(v, 3) for k, v in scores.items()}}
+
+
+def _brand_prompt(state, reasons):
+    return (f"STRATEGY: {state.get('strategy', '')}\nCAPTION: {state.get('copy', '')}\n"
+            f"IMAGE PROMPT: {state.get('image_prompt', '')}\nRULE SIGNALS: {'; '.join(reasons)}")
+
+
+def _brand_from_llm(obj, response, scores, margin, reasons, edits):
+    # The LLM judges the caption as a whole, so a rejection means regenerate rather than edit
+    scores["tone"] = max(scores["tone"], 0.65) if obj.get("approved") else min(scores["tone"], 0.3)
+    return _brand_verdict(2, scores, reasons + [obj.get("feedback", "")], edits, margin, response_tokens(response))
+
+
+def _brand_undecided(scores, margin, reasons, edits, error=None):
+    """No LLM (disabled or failed): fall back to the tier-1 leaning. A zero margin (no tone signal either
+    way, e.g. copy sharing no trigrams with the classifier) leans nowhere, so it does not pass."""
+    if error is not None:
+        _record_llm_error("brand")
+        print(f"⚠️ Brand review LLM error ({error}); using the tier-1 leaning")
+    scores["tone"] = PASS_SCORE if margin > 0 else 0.3
+    return _brand_verdict(1, scores, reasons + ["ambiguous, decided without the LLM"], edits, margin)
+
+
+def review_brand(state):
+    """Brand verdict: {"decision", "tier", "scores" per dimension, "edits", "target", "reasons", "tokens"}."""
+    verdict, scores, margin, reasons, edits = _brand_fast(state)
+    if verdict is not None:
+        return verdict
+    if not LLM_ENABLED:
+        return _brand_undecided(scores, margin, reasons, edits)
+    try:
+        obj, response = generate_json(_brand_prompt(state, reasons), REVIEW_SCHEMA, "brand_guardian",
+                                      options={"temperature": 0.1}, system=BRAND_SYSTEM)
+    except Exception as e:
+        return _brand_undecided(scores, margin, reasons, edits, e)
+    return _brand_from_llm(obj, response, scores, margin, reasons, edits)
+
+
+async def areview_brand(state):
+    """Async twin of review_brand(); only tier 2 awaits."""
+    verdict, scores, margin, reasons, edits = _brand_fast(state)
+    if verdict is not None:
+        return verdict
+    if not LLM_ENABLED:
+        return _brand_undecided(scores, margin, reasons, edits)
+    try:
+        obj, response = await agenerate_json(_brand_prompt(state, reasons), REVIEW_SCHEMA, "brand_guardian",
+                                             options={"temperature": 0.1}, system=BRAND_SYSTEM)
+    except Exception as e:
+        return _brand_undecided(scores, margin, reasons, edits, e)
+    return _brand_from_llm(obj, response, scores, margin, reasons, edits)
+
+
+# --- 5. Compliance Review ---
+
+COMPLIANCE_SYSTEM = register_prefix("compliance", (
+    "You are a compliance officer. Check a social media caption and its image prompt for unsubstantiated "
+    "claims, bias and copyright or trademark risk. Flagged terms from automated checks are included. Respond "
+    'with a JSON object: "approved" (boolean) and "feedback" (one sentence).'
+))
+
+
+def _compliance_fast(state):
+    policy = POLICY["compliance"]
+    text = f"{state.get('copy', '')}\n{state.get('image_prompt', '')}"
+
+    hard = find_terms(policy["hard_terms"], text)
+    if hard:
+        return _verdict("compliance", "FLAG", 0, [f"prohibited claims or bias: {', '.join(hard)}"]), None, []
+    soft = find_terms(policy["soft_terms"], text)
+    if not soft:
+        return _verdict("compliance", "PASS", 0, ["no flagged terms"]), None, []
+
+    reasons = [f"flagged terms: {', '.join(soft)}"]
+    margin = _risk_classifier().margin(state.get("copy", ""), "safe", "risky")
+    if margin >= COMPLIANCE_SAFE_MARGIN:
+        return _verdict("compliance", "PASS", 1, reasons, margin), margin, reasons
+    if margin <= COMPLIANCE_RISK_MARGIN:
+        return _verdict("compliance", "FLAG", 1, reasons, margin), margin, reasons
+    return None, margin, reasons
+
+
+def _compliance_prompt(state, reasons):
+    return (f"CAPTION: {state.get('copy', '')}\nIMAGE PROMPT: {state.get('image_prompt', '')}\n"
+            f"RULE SIGNALS: {'; '.join(reasons)}")
+
+
+def _compliance_from_llm(obj, response, margin, reasons):
+    return _verdict("compliance", "PASS" if obj.get("approved") else "FLAG", 2,
+                    reasons + [obj.get("feedback", "")], margin, tokens=response_tokens(response))
+
+
+def _compliance_undecided(margin, reasons, error=None):
+    if error is not None:
+        _record_llm_error("compliance")
+        print(f"⚠️ Compliance review LLM error ({error}); flagging for human review")
+    # Unlike brand fit, an unresolved compliance risk is never waved through
+    return _verdict("compliance", "FLAG", 1, reasons + ["ambiguous, needs human review"], margin)
+
+
+def review_compliance(state):
+    """Compliance verdict: decision is "PASS" or "FLAG" (publish only after a human looks)."""
+    verdict, margin, reasons = _compliance_fast(state)
+    if verdict is not None:
+        return verdict
+    if not LLM_ENABLED:
+        return _compliance_undecided(margin, reasons)
+    try:
+        obj, response = generate_json(_compliance_prompt(state, reasons), REVIEW_SCHEMA, "compliance",
+                                      options={"temperature": 0.1}, system=COMPLIANCE_SYSTEM)
+    except Exception as e:
+        return _compliance_undecided(margin, reasons, e)
+    return _compliance_from_llm(obj, response, margin, reasons)
+
+
+async def areview_compliance(state):
+    """Async twin of review_compliance()."""
+    verdict, margin, reasons = _compliance_fast(state)
+    if verdict is not None:
+        return verdict
+    if not LLM_ENABLED:
+        return _compliance_undecided(margin, reasons)
+    try:
+        obj, response = await agenerate_json(_compliance_prompt(state, reasons), REVIEW_SCHEMA, "compliance",
+                                             options={"temperature": 0.1}, system=COMPLIANCE_SYSTEM)
+    except Exception as e:
+        return _compliance_undecided(margin, reasons, e)
+    return _compliance_from_llm(obj, response, margin, reasons)
@@ -1,41 +1,82 @@
 # agents/strategist.py
-from ollama import Client
-import json
+import time
+import uuid
+
+from agents.gateway import response_tokens
+from agents.model_lifecycle import register_prefix
+from agents.streaming import report_ttft, token_callback
+from agents.structured import STRATEGY_SCHEMA, agenerate_json, generate_json
 
 # Minimal class definition needed for function signature (avoids circular import)
-class AgentState: pass 
+class AgentState: pass
+
+MOCK_STRATEGY = "Tone: Playful & Direct; Keywords: Autonomous AI, Consistency; Goal: Engagement"
+
+
+# Static instructions go in the system prompt, a prefix Ollama can keep in its KV cache between briefs
+STRATEGIST_SYSTEM = register_prefix("strategist", (
+    "Analyze the creative brief you are given. Output your response as a single, valid JSON object with the keys: "
+    '"tone" (e.g., Playful, Energetic), "keywords" (list of 3-5), and "goal" (short phrase).'
+))
+
+
+def _strategy_prompt(brief):
+    return f"BRIEF: {brief}"
+
+
+def _format_strategy(json_output):
+    return (
+        f"Tone: {json_output.get('tone', 'Professional')}; "
+        f"Keywords: {', '.join(json_output.get('keywords', ['AI', 'Consistency']))}; "
+        f"Goal: {json_output.get('goal', 'Engagement')}"
+    )
+
+
+def _finish(state, strategy, tokens=0):
+    print(f"Strategist Output: {strategy}")
+    # started_at anchors the run's revision time budget (see graph.route_to_revision);
+    # run_id namespaces the run's artifacts when the caller did not supply one (see agents/artifacts.py)
+    return {"strategy": strategy, "revision_count": state.get("revision_count", 0),
+            "started_at": state.get("started_at") or time.time(), "llm_tokens": tokens,
+            "run_id": state.get("run_id") or uuid.uuid4().hex[:12]}
 
-client = Client(host='http://localhost:11434')
 
 def strategist(state: AgentState) -> AgentState:
     """Takes user brief, defines tone, keywords, and goals using Llama 3.1 8B via Ollama."""
-    brief = state["brief"]
-    
-    prompt = f"""
-    Analyze the following creative brief. Output your response as a single, valid JSON object with the keys: "tone" (e.g., Playful, Energetic), "keywords" (list of 3-5), and "goal" (short phrase).
-
-    BRIEF: {brief}
-    """
-    
     try:
-        response = client.generate(
-            model='llama3.1:8b', 
-            prompt=prompt,
-            stream=False,
-            options={'temperature': 0.1}
-        )
-        json_output = json.loads(response['response'].strip().strip('```json').strip('```').strip())
-        
-        state["strategy"] = (
-            f"Tone: {json_output.get('tone', 'Professional')}; "
-            f"Keywords: {', '.join(json_output.get('keywords', ['AI', 'Consistency']))}; "
-            f"Goal: {json_output.get('goal', 'Engagement')}"
+        json_output, response = generate_json(
+            _strategy_prompt(state["brief"]),
+            STRATEGY_SCHEMA,
+            "strategist",
+            options={'temperature': 0.1},
+            on_token=token_callback("strategist"),
+            system=STRATEGIST_SYSTEM
         )
+        report_ttft("strategist", response)
+        strategy = _format_strategy(json_output)
+        tokens = response_tokens(response)
     except Exception as e:
         # NOTE: This fallback ensures the demo runs even if Ollama is not outputting perfect JSON
         print(f"Ollama/JSON Error in Strategist: {e}. Using mock data.")
-        state["strategy"] = "Tone: Playful & Direct; Keywords: Autonomous AI, Consistency; Goal: Engagement"
-        
-    state["revision_count"] = state.get("revision_count", 0)
-    print(f"Strategist Output: {state['strategy']}")
-    return state
\ No newline at end of file
+        strategy, tokens = MOCK_STRATEGY, 0
+    return _finish(state, strategy, tokens)
+
+
+async def astrategist(state: AgentState) -> AgentState:
+    """Async variant of strategist() for ainvoke/astream runs."""
+    try:
+        json_output, response = await agenerate_json(
+            _strategy_prompt(state["brief"]),
+            STRATEGY_SCHEMA,
+            "strategist",
+            options={'temperature': 0.1},
+            on_token=token_callback("strategist"),
+            system=STRATEGIST_SYSTEM
+        )
+        report_ttft("strategist", response)
+        strategy = _format_strategy(json_output)
+        tokens = response_tokens(response)
+    except Exception as e:
+        print(f"Ollama/JSON Error in Strategist: {e}. Using mock data.")
+        strategy, tokens = MOCK_STRATEGY, 0
+    return _finish(state, strategy, tokens)
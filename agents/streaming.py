@@ -0,0 +1,38 @@
+# agents/streaming.py (Forward LLM tokens from inside a node to LangGraph's "custom" stream)
+
+
+def _node_context():
+    """Returns (stream_writer, node_name) for the running LangGraph node, or (None, None) outside a run."""
+    try:
+        from langgraph.config import get_config, get_stream_writer
+
+        writer = get_stream_writer()
+        node = get_config().get("metadata", {}).get("langgraph_node")
+        return writer, node
+    except Exception:
+        return None, None
+
+
+def token_callback(default_node):
+    """Builds an on_token callback that emits {"node", "type": "token", "text"} events.
+
+    Returns None when called outside a graph run, so plain function calls stay non-streaming.
+    """
+    writer, node = _node_context()
+    if writer is None:
+        return None
+    node = node or default_node
+
+    def on_token(text):
+        writer({"node": node, "type": "token", "text": text})
+
+    return on_token
+
+
+def report_ttft(default_node, response):
+    """Emits the time-to-first-token of a finished streamed call as a {"type": "ttft"} event."""
+    ttft = response.get("ttft_s") if isinstance(response, dict) else None
+    writer, node = _node_context()
+    if writer is None or ttft is None:
+        return
+    writer({"node": node or default_node, "type": "ttft", "seconds": round(ttft, 3)})
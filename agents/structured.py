@@ -0,0 +1,195 @@
+# agents/structured.py (Schema-constrained JSON generation with an incremental, tolerant parser)
+#
+# Agents ask Ollama for output constrained by a JSON schema (`format=`), stream the tokens through
+# JsonObjectParser and cut the stream as soon as the top-level object closes. Output that still fails
+# to parse is counted per agent, so the fallback rate is visible instead of silent.
+import json
+import re
+import threading
+
+from agents.gateway import DEFAULT_MODEL, agenerate, generate
+
+# --- 1. Schemas (one per agent) ---
+
+STRATEGY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tone": {"type": "string"},
+        "keywords": {"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": 5},
+        "goal": {"type": "string"},
+    },
+    "required": ["tone", "keywords", "goal"],
+}
+
+DESIGN_SPEC_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "description": {"type": "string"},
+        "style": {"type": "string"},
+    },
+    "required": ["description", "style"],
+}
+
+REVIEW_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "approved": {"type": "boolean"},
+        "feedback": {"type": "string"},
+    },
+    "required": ["approved", "feedback"],
+}
+
+
+class StructuredOutputError(ValueError):
+    """The model's output could not be turned into an object matching the schema."""
+
+
+# --- 2. Incremental Parser ---
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+class JsonObjectParser:
+    """Finds the first top-level JSON object in streamed text.
+
+    feed() returns True once the object has closed, which the gateway uses to stop generation.
+    Anything before the object (prose, ``` fences) and after it is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._pos = 0
+        self._start = None
+        self._end = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def complete(self):
+        return self._end is not None
+
+    def feed(self, chunk):
+        if self._end is not None:
+            return True
+        self.text += chunk
+        for i in range(self._pos, len(self.text)):
+            ch = self.text[i]
+            if self._start is None:
+                if ch == "{":
+                    self._start = i
+                    self._stack.append(ch)
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in _CLOSERS:
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._end = i + 1
+                    self._pos = self._end
+                    return True
+        self._pos = len(self.text)
+        return False
+
+    def _repaired_tail(self):
+        """Closes a truncated object: open string, dangling comma/colon, then open brackets."""
+        body = self.text[self._start:]
+        if self._in_string:
+            body += '"'
+        body = body.rstrip().rstrip(",:")
+        return body + "".join(_CLOSERS[ch] for ch in reversed(self._stack))
+
+    def result(self):
+        """Returns (obj, repaired). Raises StructuredOutputError when nothing usable was produced."""
+        if self._start is None:
+            raise StructuredOutputError("no JSON object in model output")
+        candidate = self.text[self._start:self._end] if self.complete else self._repaired_tail()
+        repaired = not self.complete
+        try:
+            return json.loads(candidate), repaired
+        except json.JSONDecodeError:
+            pass
+        try:
+            return json.loads(_TRAILING_COMMA.sub(r"\1", candidate)), True
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"invalid JSON from model: {e}") from e
+
+
+def parse_json_object(text):
+    """One-shot helper: the first JSON object in text (fences and chatter tolerated)."""
+    parser = JsonObjectParser()
+    parser.feed(text)
+    return parser.result()[0]
+
+
+# --- 3. Parse-Failure Tracking ---
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record_parse(agent, ok, repaired=False, stopped_early=False):
+    with _stats_lock:
+        stats = _stats.setdefault(agent, {"calls": 0, "failures": 0, "repaired": 0, "stopped_early": 0})
+        stats["calls"] += 1
+        stats["failures"] += int(not ok)
+        stats["repaired"] += int(repaired)
+        stats["stopped_early"] += int(stopped_early)
+
+
+def parse_stats():
+    """Per-agent counts of structured calls, parse failures, repairs and early stops."""
+    with _stats_lock:
+        snapshot = {agent: dict(stats) for agent, stats in _stats.items()}
+    for stats in snapshot.values():
+        stats["failure_rate"] = round(stats["failures"] / stats["calls"], 4) if stats["calls"] else 0.0
+    return snapshot
+
+
+# --- 4. Generation ---
+
+def _finish(agent, schema, parser, response):
+    if not parser.text:
+        parser.feed(response.get("response", ""))  # Cache hits bypass the stream
+    stopped_early = bool(response.get("stopped_early"))
+    try:
+        obj, repaired = parser.result()
+        missing = [key for key in schema.get("required", []) if key not in obj]
+        if missing:
+            raise StructuredOutputError(f"{agent} output missing keys: {', '.join(missing)}")
+    except StructuredOutputError as e:
+        _record_parse(agent, ok=False, stopped_early=stopped_early)
+        print(f"⚠️ {agent}: structured output rejected ({e})")
+        raise
+    _record_parse(agent, ok=True, repaired=repaired, stopped_early=stopped_early)
+    return obj
+
+
+def generate_json(prompt, schema, agent, model=DEFAULT_MODEL, options=None, on_token=None, **kwargs):
+    """Generates an object constrained by `schema`. Returns (obj, response); raises StructuredOutputError.
+
+    Extra kwargs (e.g. `system`) are passed through to the gateway.
+    """
+    parser = JsonObjectParser()
+    response = generate(prompt, model=model, options=options, on_token=on_token,
+                        stop_when=parser.feed, format=schema, **kwargs)
+    return _finish(agent, schema, parser, response), response
+
+
+async def agenerate_json(prompt, schema, agent, model=DEFAULT_MODEL, options=None, on_token=None, **kwargs):
+    """Async twin of generate_json()."""
+    parser = JsonObjectParser()
+    response = await agenerate(prompt, model=model, options=options, on_token=on_token,
+                               stop_when=parser.feed, format=schema, **kwargs)
+    return _finish(agent, schema, parser, response), response
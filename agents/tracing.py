@@ -0,0 +1,258 @@
+# agents/tracing.py (Per-node latency/resource tracing for workflow runs)
+#
+# Usage:
+#   trace = Trace()
+#   app.invoke(state, config={"configurable": {"trace": trace}})
+#   trace.export_jsonl("output/traces/run.jsonl"); trace.export_chrome("output/traces/run.trace.json")
+#
+# build_workflow() wraps every node with traced_node(); the gateway and designer report LLM time,
+# tokens, image time and bytes written into whichever span is active on the current thread/task.
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_current_span = contextvars.ContextVar("brandsync_span", default=None)
+
+
+def _peak_rss_mb():
+    """Process high-water RSS in MB (None where it cannot be measured)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+# --- 1. Spans & Traces ---
+
+class Span:
+    """Metrics for one node execution."""
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.time()
+        self.end = None
+        self.thread = threading.get_ident()
+        self.llm_s = 0.0
+        self.llm_calls = 0
+        self.llm_cached_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.image_s = 0.0
+        self.image_source = None
+        self.bytes_written = 0
+        self.peak_rss_mb = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def wall_s(self):
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self):
+        return {
+            "node": self.name,
+            "start": round(self.start, 6),
+            "wall_s": round(self.wall_s, 4),
+            "llm_s": round(self.llm_s, 4),
+            "llm_calls": self.llm_calls,
+            "llm_cached_calls": self.llm_cached_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "image_s": round(self.image_s, 4),
+            "image_source": self.image_source,
+            "bytes_written": self.bytes_written,
+            "peak_rss_mb": self.peak_rss_mb,
+            "error": self.error,
+            "thread": self.thread,
+        }
+
+    @classmethod
+    def from_dict(cls, record):
+        span = cls(record["node"])
+        for key in ("start", "llm_s", "llm_calls", "llm_cached_calls", "prompt_tokens", "completion_tokens",
+                    "image_s", "image_source", "bytes_written", "peak_rss_mb", "error", "thread"):
+            if key in record:
+                setattr(span, key, record[key])
+        span.end = span.start + record["wall_s"]
+        return span
+
+
+class Trace:
+    """Collects the spans of one workflow run; exportable as JSONL or Chrome trace events."""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_records(cls, records, run_id=None):
+        """Rebuilds a trace from records() output, e.g. one stored by a worker process."""
+        trace = cls(run_id or (records[0]["run_id"] if records else None))
+        if records:
+            trace.started = min(r["start"] - r["offset_s"] for r in records)
+        trace.spans = [Span.from_dict(r) for r in records]
+        return trace
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def records(self):
+        with self._lock:
+            spans = list(self.spans)
+        return [{"run_id": self.run_id, "offset_s": round(s.start - self.started, 4), **s.to_dict()} for s in spans]
+
+    def totals(self):
+        rows = self.records()
+        keys = ("llm_s", "image_s", "prompt_tokens", "completion_tokens", "bytes_written", "llm_calls")
+        totals = {k: sum(r[k] for r in rows) for k in keys}
+        totals["wall_s"] = round(max((r["offset_s"] + r["wall_s"] for r in rows), default=0.0), 4)
+        rss = [r["peak_rss_mb"] for r in rows if r["peak_rss_mb"] is not None]
+        totals["peak_rss_mb"] = max(rss) if rss else None
+        return totals
+
+    def export_jsonl(self, path):
+        _ensure_parent(path)
+        with open(path, "a", encoding="utf-8") as f:
+            for record in self.records():
+                f.write(json.dumps(record) + "\n")
+        return path
+
+    def to_chrome(self):
+        """Chrome trace-event JSON (load in chrome://tracing or Perfetto)."""
+        with self._lock:
+            spans = list(self.spans)
+        threads = {}
+        events = []
+        for span in spans:
+            record = span.to_dict()
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            args = {k: v for k, v in record.items() if k not in ("node", "start", "thread")}
+            events.append({
+                "name": span.name, "cat": "node", "ph": "X", "pid": 1, "tid": tid,
+                "ts": int((span.start - self.started) * 1e6), "dur": int(record["wall_s"] * 1e6), "args": args,
+            })
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"run {self.run_id}"}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome(self, path):
+        _ensure_parent(path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+        return path
+
+
+def _ensure_parent(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+# --- 2. Reporting Hooks (no-ops outside a traced node) ---
+
+def record_llm(latency_s, prompt_tokens=0, completion_tokens=0, cached=False):
+    span = _current_span.get()
+    if span is None:
+        return
+    with span._lock:
+        span.llm_s += latency_s
+        span.llm_calls += 1
+        span.llm_cached_calls += int(cached)
+        span.prompt_tokens += prompt_tokens or 0
+        span.completion_tokens += completion_tokens or 0
+
+
+def record_image(seconds, source):
+    span = _current_span.get()
+    if span is None:
+        return
+    with span._lock:
+        span.image_s += seconds
+        span.image_source = source
+
+
+def record_write(path):
+    span = _current_span.get()
+    if span is None or not os.path.exists(path):
+        return
+    with span._lock:
+        span.bytes_written += os.path.getsize(path)
+
+
+# --- 3. Node Wrapper ---
+
+def _trace_from(config):
+    return ((config or {}).get("configurable") or {}).get("trace")
+
+
+def traced_node(name, fn):
+    """Wraps a node so that, when config carries a Trace, its execution is recorded as a span.
+
+    The wrapper deliberately takes a `config` parameter (LangGraph passes the RunnableConfig by
+    that name) and is not functools.wraps'd, which would hide the parameter from LangGraph.
+    """
+    def _start():
+        span = Span(name)
+        return span, _current_span.set(span)
+
+    def _finish(trace, span, token, error=None):
+        _current_span.reset(token)
+        span.end = time.time()
+        span.peak_rss_mb = _peak_rss_mb()
+        span.error = error
+        trace.add(span)
+
+    if asyncio.iscoroutinefunction(fn):
+        async def node(state, config=None):
+            trace = _trace_from(config)
+            if trace is None:
+                return await fn(state)
+            span, token = _start()
+            try:
+                result = await fn(state)
+            except Exception as e:
+                _finish(trace, span, token, error=str(e))
+                raise
+            _finish(trace, span, token)
+            return result
+    else:
+        def node(state, config=None):
+            trace = _trace_from(config)
+            if trace is None:
+                return fn(state)
+            span, token = _start()
+            try:
+                result = fn(state)
+            except Exception as e:
+                _finish(trace, span, token, error=str(e))
+                raise
+            _finish(trace, span, token)
+            return result
+
+    node.__name__ = getattr(fn, "__name__", name)
+    return node
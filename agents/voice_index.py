@@ -0,0 +1,293 @@
+# agents/voice_index.py (Brand-voice example index for retrieval-augmented copywriting)
+#
+# Usage:
+#   python -m agents.voice_index build                                  # from agents/data/brandvoice_sample.jsonl
+#   python -m agents.voice_index build --hf declare-lab/BrandVoice      # full dataset (needs `datasets`)
+#   python -m agents.voice_index query "Tone: Playful; Keywords: AI"    # top-k examples for a strategy
+#
+# The index is built offline from caption/tone_label pairs. Vectors are stored as one float32 matrix
+# (vectors.npy) that is memory-mapped at query time, with rows grouped by tone so a tone filter is a
+# contiguous slice. Tones with more than IVF_MIN_ROWS rows also get an IVF layer: k-means centroids,
+# with the tone's rows sorted by cluster, so a query scores the centroids and then only `nprobe` lists.
+# The default embedder hashes words and character trigrams (no model, sub-millisecond); `--embedder
+# ollama` uses an Ollama embedding model through the gateway instead. The copywriter retrieves the
+# closest on-tone captions and adds them to its prompt as few-shot examples, so changing the dataset
+# only means rebuilding the index, not retraining.
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+VOICE_INDEX_DIR = os.environ.get("BRANDSYNC_VOICE_INDEX", os.path.join(".cache", "brandvoice_index"))
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "data", "brandvoice_sample.jsonl")
+EMBED_MODEL = os.environ.get("BRANDSYNC_EMBED_MODEL", "nomic-embed-text")
+HASH_DIM = 512
+IVF_MIN_ROWS = 20000
+IVF_ROWS_PER_LIST = 1000
+DEFAULT_NPROBE = 8
+
+_TOKEN = re.compile(r"[a-z0-9']+|[^\sa-z0-9]")
+
+
+# --- 1. Embedders ---
+
+class HashEmbedder:
+    """Signed feature hashing of words and character trigrams into a fixed-size, L2-normalized vector."""
+
+    name = "hash"
+
+    def __init__(self, dim=HASH_DIM):
+        self.dim = dim
+
+    def _features(self, text):
+        text = text.lower()
+        words = _TOKEN.findall(text)
+        padded = f"  {text} "
+        return words + [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    def embed(self, texts):
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                matrix[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return _normalize(matrix)
+
+
+class OllamaEmbedder:
+    """Embeddings from an Ollama embedding model (e.g. nomic-embed-text) via the shared gateway."""
+
+    name = "ollama"
+
+    def __init__(self, model=EMBED_MODEL, batch_size=64):
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        import numpy as np
+        from agents.gateway import gateway
+
+        rows = []
+        for i in range(0, len(texts), self.batch_size):
+            rows.extend(gateway.embed(texts[i:i + self.batch_size], self.model))
+        return _normalize(np.asarray(rows, dtype=np.float32))
+
+
+def _normalize(matrix):
+    import numpy as np
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def make_embedder(name, **kwargs):
+    if name == "hash":
+        return HashEmbedder(**kwargs)
+    if name == "ollama":
+        return OllamaEmbedder(**kwargs)
+    raise ValueError(f"Unknown embedder {name!r}; use 'hash' or 'ollama'")
+
+
+# --- 2. Building ---
+
+def load_examples(path=SAMPLE_PATH, hf_dataset=None, split="train", limit=None):
+    """Reads caption/tone_label pairs from a JSONL file or a Hugging Face dataset; drops blanks and duplicates."""
+    if hf_dataset:
+        from datasets import load_dataset
+        rows = load_dataset(hf_dataset, split=split)
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    seen = set()
+    examples = []
+    for row in rows:
+        caption = (row.get("caption") or "").strip()
+        tone = (row.get("tone_label") or "").strip().lower()
+        if not caption or not tone or (tone, caption) in seen:
+            continue
+        seen.add((tone, caption))
+        examples.append({"caption": caption, "tone": tone})
+        if limit and len(examples) >= limit:
+            break
+    return examples
+
+
+def _kmeans(vectors, k, iterations=10, seed=3407):
+    """Spherical k-means (cosine); returns (centroids, assignment per row)."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(k):
+            members = vectors[assignment == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+def build_index(examples, out_dir=VOICE_INDEX_DIR, embedder="hash"):
+    """Embeds the examples and writes vectors.npy, centroids.npy and meta.json. Returns the metadata."""
+    import numpy as np
+
+    if not examples:
+        raise ValueError("No caption/tone_label examples to index")
+    model = make_embedder(embedder)
+    start = time.perf_counter()
+    examples = sorted(examples, key=lambda e: e["tone"])
+    vectors = model.embed([e["caption"] for e in examples])
+
+    tones, order, centroid_blocks = {}, [], []
+    n_centroids = 0
+    row = 0
+    for tone in sorted({e["tone"] for e in examples}):
+        rows = [i for i, e in enumerate(examples) if e["tone"] == tone]
+        entry = {"start": row, "end": row + len(rows)}
+        if len(rows) >= IVF_MIN_ROWS:
+            k = max(2, len(rows) // IVF_ROWS_PER_LIST)
+            centroids, assignment = _kmeans(vectors[rows], k)
+            rows = [rows[i] for i in np.argsort(assignment, kind="stable")]
+            sizes = np.bincount(assignment, minlength=k)
+            bounds = np.concatenate([[0], np.cumsum(sizes)]) + row
+            entry["centroids"] = [n_centroids, n_centroids + k]
+            entry["lists"] = [[int(bounds[c]), int(bounds[c + 1])] for c in range(k)]
+            centroid_blocks.append(centroids)
+            n_centroids += k
+        order.extend(rows)
+        tones[tone] = entry
+        row += len(rows)
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "vectors.npy"), np.ascontiguousarray(vectors[order]))
+    np.save(os.path.join(out_dir, "centroids.npy"),
+            np.concatenate(centroid_blocks) if centroid_blocks else np.zeros((0, vectors.shape[1]), dtype=np.float32))
+    meta = {
+        "embedder": embedder,
+        "embed_model": getattr(model, "model", None),
+        "dim": int(vectors.shape[1]),
+        "tones": tones,
+        "captions": [examples[i]["caption"] for i in order],
+        "built_s": round(time.perf_counter() - start, 3),
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+# --- 3. Querying ---
+
+class VoiceIndex:
+    """Read-only view of a built index; the vector matrix is memory-mapped, not loaded."""
+
+    def __init__(self, index_dir=VOICE_INDEX_DIR):
+        import numpy as np
+
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.centroids = np.load(os.path.join(index_dir, "centroids.npy"))
+        kwargs = {"model": self.meta["embed_model"]} if self.meta["embedder"] == "ollama" else {"dim": self.meta["dim"]}
+        self.embedder = make_embedder(self.meta["embedder"], **kwargs)
+
+    def tones_for(self, tone):
+        """Index tone labels that share a word with the strategy's tone ("Playful & Direct" -> playful, direct)."""
+        words = set(re.findall(r"[a-z]+", tone.lower()))
+        return [label for label in self.meta["tones"] if words & set(re.findall(r"[a-z]+", label))]
+
+    def _slices(self, entry, query, nprobe):
+        if "lists" not in entry:
+            return [(entry["start"], entry["end"])]
+        lo, hi = entry["centroids"]
+        best = (self.centroids[lo:hi] @ query).argsort()[::-1][:nprobe]
+        return [tuple(entry["lists"][c]) for c in best]
+
+    def search(self, query_text, tone="", k=3, nprobe=DEFAULT_NPROBE):
+        """Top-k captions for query_text, restricted to matching tones when any match. Returns [(caption, score)]."""
+        import numpy as np
+
+        query = self.embedder.embed([query_text])[0]
+        labels = self.tones_for(tone) if tone else []
+        entries = [self.meta["tones"][label] for label in labels] or [{"start": 0, "end": len(self.vectors)}]
+        rows, scores = [], []
+        for entry in entries:
+            for start, end in self._slices(entry, query, nprobe):
+                if end > start:
+                    scores.append(np.asarray(self.vectors[start:end]) @ query)
+                    rows.append(np.arange(start, end))
+        if not rows:
+            return []
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        top = np.argsort(scores)[::-1][:k]
+        return [(self.meta["captions"][rows[i]], round(float(scores[i]), 4)) for i in top]
+
+
+_index = None
+_index_lock = threading.Lock()
+_index_missing = False
+
+
+def get_voice_index(index_dir=VOICE_INDEX_DIR):
+    """Process-wide index, opened on first use. None (reported once) when no index has been built."""
+    global _index, _index_missing
+    with _index_lock:
+        if _index is None and not _index_missing:
+            if os.path.exists(os.path.join(index_dir, "meta.json")):
+                _index = VoiceIndex(index_dir)
+            else:
+                _index_missing = True
+                print(f"ℹ️ No brand-voice index at {index_dir}; run `python -m agents.voice_index build`")
+        return _index
+
+
+def voice_examples(strategy, tone, k=3):
+    """On-tone example captions for a strategy string, or [] when no index is available."""
+    try:
+        index = get_voice_index()
+        return [caption for caption, _ in index.search(strategy, tone, k)] if index else []
+    except Exception as e:
+        print(f"⚠️ Brand-voice retrieval failed ({e}); writing without examples")
+        return []
+
+
+# --- 4. CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the brand-voice example index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Embed caption/tone_label pairs into an index")
+    build.add_argument("--source", default=SAMPLE_PATH, help="JSONL with caption and tone_label")
+    build.add_argument("--hf", default=None, help="Hugging Face dataset instead, e.g. declare-lab/BrandVoice")
+    build.add_argument("--limit", type=int, default=None)
+    build.add_argument("--embedder", default="hash", choices=("hash", "ollama"))
+    build.add_argument("--out", default=VOICE_INDEX_DIR)
+    query = sub.add_parser("query", help="Show the top-k examples for a strategy string")
+    query.add_argument("strategy")
+    query.add_argument("-k", type=int, default=3)
+    query.add_argument("--index", default=VOICE_INDEX_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        meta = build_index(load_examples(args.source, args.hf, limit=args.limit), args.out, args.embedder)
+        print(f"📚 Indexed {len(meta['captions'])} captions across {len(meta['tones'])} tones "
+              f"in {meta['built_s']}s → {args.out}")
+    else:
+        from agents.review import parse_strategy
+
+        index = VoiceIndex(args.index)
+        start = time.perf_counter()
+        hits = index.search(args.strategy, parse_strategy(args.strategy)["tone"], args.k)
+        for caption, score in hits:
+            print(f"{score:.3f}  {caption}")
+        print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
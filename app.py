@@ -1,87 +1,186 @@
 # app.py (Streamlit UI - Cleaned Formatting with Fixed Step 4 Display)
 import streamlit as st
 import os
-from graph import build_workflow, AgentState
-from typing import TypedDict
+from agents.artifacts import get_artifact_store
+from agents.brand_profiles import get_brand_registry
+from agents.channels import CHANNELS
+from agents.job_queue import JobQueue
+from agents.tracing import Trace
 
-# Global state setup
-if 'app' not in st.session_state:
-    try:
-        # NOTE: The build_workflow function will now successfully load all agents
-        st.session_state.app = build_workflow()
-        st.success("🤖 BrandSync Studio Agents Initialized!")
-    except Exception as e:
-        st.error(f"Error initializing LangGraph: {e}")
-        st.session_state.app = None
+# Briefs run in worker processes (worker.py), each holding one compiled workflow; this script only
+# submits jobs and renders their progress events. BRANDSYNC_EMBEDDED_WORKERS=N starts N workers with
+# the Streamlit server; set it to 0 when running `python worker.py` separately.
+EMBEDDED_WORKERS = int(os.environ.get("BRANDSYNC_EMBEDDED_WORKERS", "2"))
+POLL_INTERVAL_S = 0.5
+MAX_STEPS = 7
+THUMB_DISPLAY_PX = 240
+STATUS_ICONS = {"queued": "🕒", "running": "⏳", "done": "✅", "failed": "❌"}
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+@st.cache_resource
+def start_embedded_workers(count):
+    """Runs once per server process (not per session)."""
+    if not count:
+        return []
+    from worker import start_workers
+    return start_workers(count)[0]
 
 st.set_page_config(page_title="BrandSync Studio", layout="wide")
 st.title("🖌️ BrandSync Studio: Autonomous AI Creative Agency")
 st.markdown("Enter your creative brief and watch the **5-Agent Team** generate, review, and finalize your brand-consistent content.")
 
+# Global state setup
+try:
+    queue = get_job_queue()
+    workers = start_embedded_workers(EMBEDDED_WORKERS)
+except Exception as e:
+    st.error(f"Error initializing the job queue: {e}")
+    st.stop()
+
+def open_job(job_id):
+    st.session_state.job_id = job_id
+    st.session_state.final_state = {}
+    st.session_state.trace = None
+    st.query_params["run"] = job_id
+
+# A ?run=<id> link (e.g. after a browser or server restart) reopens that job
+if 'job_id' not in st.session_state and st.query_params.get("run") and queue.get(st.query_params["run"]):
+    open_job(st.query_params["run"])
+
+# --- Run History ---
+with st.sidebar:
+    st.subheader("🗂️ Recent Runs")
+    counts = queue.counts()
+    st.caption(f"Queue: {counts.get('queued', 0)} waiting · {counts.get('running', 0)} running · "
+               f"{len(workers) or 'external'} workers")
+    for job in queue.list_jobs(limit=10):
+        label = f"{STATUS_ICONS.get(job['status'], '•')} {job['brief'][:32]}… ({job['id'][:6]})"
+        if st.button(label, key=f"run_{job['id']}", use_container_width=True):
+            open_job(job["id"])
+
 # --- UI Layout ---
 col1, col2 = st.columns([1, 2])
 
 with col1:
     user_brief = st.text_area("Creative Brief:", "Create an engaging social media post for our new autonomous AI agency launch, focusing on speed and consistency.")
+    image_variety = st.checkbox("🎲 Fresh image variations (skip the image cache)", value=False)
+    channels = st.multiselect("📣 Channel variants (one strategy and master image, adapted per channel):",
+                              list(CHANNELS), default=[])
+    brands = get_brand_registry().names()
+    brand = st.selectbox("🎨 Brand profile:", brands,
+                         index=brands.index(get_brand_registry().default) if get_brand_registry().default in brands else 0)
     
     if st.button("🚀 Launch Agent Workflow", use_container_width=True, type="primary"):
-        if st.session_state.app is None:
-            st.error("Workflow initialization failed. Cannot run.")
-        elif user_brief:
-            st.session_state.brief = user_brief
-            st.session_state.running = True
-            st.session_state.final_state = {}
-            st.info("Workflow Started. See status timeline on the right.")
+        if user_brief:
+            queue.requeue_stale()  # Hand jobs of crashed workers back to the pool
+            open_job(queue.submit(user_brief, {"image_variety": image_variety, "channels": channels, "brand": brand}))
+            st.info("Brief queued. See status timeline on the right.")
         else:
             st.warning("Please enter a creative brief.")
 
+def render_step(node_name, state_data):
+    if node_name == "strategist":
+        # FIX: Display strategy as clean markdown/text instead of st.json
+        st.markdown(f"**Strategy:** `{state_data.get('strategy')}`")
+    elif node_name in ("copywriter", "revise_copy", "edit_copy"):
+        st.code(state_data.get('copy'), language='markdown')
+        candidates = state_data.get('copy_candidates')
+        if candidates:
+            st.caption(f"🏆 Best of {len(candidates)} candidates · local scores "
+                       + ", ".join(f"{c['score']:.2f}" for c in candidates))
+            with st.expander("Ranked candidates"):
+                for c in candidates:
+                    used = "✅ " if c['copy'] == state_data.get('copy') else ""
+                    st.markdown(f"{used}`{c['score']:.2f}` {c['copy']}")
+    elif node_name in ("designer", "revise_visual"):
+        st.markdown(f"Image Prompt: `{state_data.get('image_prompt')[:70]}...`")
+        # Only the small preview is sent while the run is in progress; it appears once the encoder has written it
+        thumb = (state_data.get('image_variants') or {}).get('thumb')
+        if thumb and os.path.exists(thumb):
+            st.image(thumb, width=THUMB_DISPLAY_PX)
+        elif thumb:
+            st.caption("🗜️ Preview encoding...")
+    elif node_name == "brand_guardian":
+        # ✅ UPDATED: Clean display without error-like appearance
+        feedback = state_data.get('brand_feedback', '')
+        if 'REJECT' in feedback:
+            st.warning(f"🔄 **Revision Needed:** {feedback.replace('REJECT: ', '')}")
+        else:
+            st.success(f"✅ **Approved:** {feedback.replace('PASS: ', '')}")
+        verdict = state_data.get('brand_verdict')
+        if verdict:
+            scores = " · ".join(f"{dim} {score:.2f}" for dim, score in verdict.get('scores', {}).items())
+            st.caption(f"Decided by tier {verdict['tier']}" + (f" · {scores}" if scores else ""))
+    elif node_name == "compliance":
+        st.info(f"📋 **Report:** {state_data.get('compliance_report')}")
+    elif node_name == "channel_variant":
+        for channel, output in (state_data.get('channel_outputs') or {}).items():
+            st.markdown(f"**{channel}** ({output['size'][0]}x{output['size'][1]}): {output['copy']}")
+
+def render_timeline(job_id):
+    """Replays the job's progress events; re-run every POLL_INTERVAL_S while the job is active."""
+    job = queue.get(job_id)
+    events = queue.events(job_id)
+    step_count = 0
+    live = {}   # node -> partial strategy/caption text while its LLM call is streaming
+    ttfts = {}  # node -> time-to-first-token (seconds)
+
+    progress_bar = st.progress(0)
+    if job["status"] == "queued":
+        st.info("🕒 Waiting for a free worker...")
+
+    for event in events:
+        node_name, payload = event["node"], event["payload"]
+        if event["type"] == "token":
+            live[node_name] = live.get(node_name, "") + payload["text"]
+        elif event["type"] == "ttft":
+            ttfts[node_name] = payload["seconds"]
+        elif event["type"] == "resumed":
+            st.info(f"♻️ Resumed from checkpoint at: {', '.join(payload['next'])}")
+        elif event["type"] == "update":
+            step_count += 1
+            live.pop(node_name, None)
+            ttft_note = f" · ⏱️ first token {ttfts.pop(node_name):.2f}s" if node_name in ttfts else ""
+            st.markdown(f"**Step {step_count}: {node_name.upper()}**{ttft_note}")
+            render_step(node_name, payload["state"])
+            cache = payload.get("llm_cache")
+            if cache:
+                st.caption(f"⚡ LLM cache: {cache['hits']} hits / {cache['misses']} misses this run "
+                           f"({cache['hit_rate']:.0%} overall hit rate)")
+
+    for node_name, text in live.items():
+        st.markdown(f"*✍️ {node_name.upper()} is writing...*\n\n{text}")
+
+    progress_bar.progress(1.0 if job["status"] == "done" else min(step_count / MAX_STEPS, 1.0))
+    if job["status"] == "done":
+        st.success("✅ Workflow finished!")
+    elif job["status"] == "failed":
+        st.error(f"Workflow failed: {job['error']}")
+        if st.button("🔁 Retry from last checkpoint"):
+            queue.retry(job_id)
+            st.rerun()
+
+    # The fragment only refreshes itself; once the job ends, rerun the page to show the results
+    if job["status"] not in ("queued", "running") and st.session_state.get("polling") == job_id:
+        st.session_state.polling = None
+        st.rerun()
+
 with col2:
     st.subheader("Workflow Status Timeline")
-    
-    if st.session_state.get('running', False) and st.session_state.app:
-        progress_bar = st.progress(0)
-        
-        # Initial State
-        initial_state = {"brief": st.session_state.brief, "revision_count": 0}
-        
-        step_count = 0
-        max_steps = 7 
 
-        status_container = st.container()
-        
-        with status_container:
-            for i, step_state in enumerate(st.session_state.app.stream(initial_state)):
-                step_count += 1
-                progress_bar.progress(min(step_count / max_steps, 1.0))
-                
-                # Extracting the node name and state data
-                node_name = list(step_state.keys())[0]
-                state_data = step_state[node_name]
-                
-                st.markdown(f"**Step {step_count}: {node_name.upper()}**")
-                
-                if node_name == "strategist":
-                    # FIX: Display strategy as clean markdown/text instead of st.json
-                    st.markdown(f"**Strategy:** `{state_data.get('strategy')}`")
-                elif node_name == "copywriter":
-                    st.code(state_data.get('copy'), language='markdown')
-                elif node_name == "designer":
-                    st.markdown(f"Image Prompt: `{state_data.get('image_prompt')[:70]}...`")
-                elif node_name == "brand_guardian":
-                    # ✅ UPDATED: Clean display without error-like appearance
-                    feedback = state_data.get('brand_feedback', '')
-                    if 'REJECT' in feedback:
-                        st.warning(f"🔄 **Revision Needed:** {feedback.replace('REJECT: ', '')}")
-                    else:
-                        st.success(f"✅ **Approved:** {feedback.replace('PASS: ', '')}")
-                elif node_name == "compliance":
-                    st.info(f"📋 **Report:** {state_data.get('compliance_report')}")
-
-                st.session_state.final_state.update(state_data)
-                
-            st.session_state.running = False
-            progress_bar.progress(1.0)
-            st.success("✅ Workflow finished!")
+    job = queue.get(st.session_state.job_id) if st.session_state.get("job_id") else None
+    if job:
+        active = job["status"] in ("queued", "running")
+        st.session_state.polling = job["id"] if active else None
+        st.fragment(render_timeline, run_every=POLL_INTERVAL_S if active else None)(job["id"])
+
+        if job["status"] == "done":
+            st.session_state.final_state = job["result"]["final_state"]
+            records = job["result"].get("trace")
+            st.session_state.trace = Trace.from_records(records, job["id"]) if records else None
 
 # --- Display Final Output ---
 if st.session_state.get('final_state') and 'final_output' in st.session_state.final_state:
@@ -97,12 +196,77 @@ if st.session_state.get('final_state') and 'final_output' in st.session_state.fi
         st.markdown(f"**Total Revisions:** {st.session_state.final_state.get('revision_count', 0)}")
         
     with col4:
-        # Display the correctly mocked placeholder image (no more PIL errors)
-        image_path = final_data['image_path']
-        if os.path.exists(image_path):
-            st.image(image_path, caption="Generated Visual", use_container_width=True)
+        # Thumbnail by default; the full-size delivery copy (WebP, else JPEG, else the PNG master) on demand.
+        # If the run folder was garbage-collected, images are resolved from the store by content ID.
+        artifacts = final_data.get('artifacts') or {}
+        variants = final_data.get('image_variants') or {}
+        image_id = artifacts.get('image')
+
+        def resolve(path, artifact_id):
+            if path and os.path.exists(path):
+                return path
+            return get_artifact_store().path_for(artifact_id) if artifact_id else None
+
+        full_path = next(filter(None, (resolve(variants.get(kind), artifacts.get(kind)) for kind in ("webp", "jpeg"))),
+                         None) or resolve(final_data['image_path'], image_id)
+        thumb_path = resolve(variants.get('thumb'), artifacts.get('thumb'))
+        caption = f"Generated Visual ({image_id[:12] if image_id else 'no artifact ID'})"
+        if st.toggle("🔍 Full resolution", key=f"full_{image_id}") or not thumb_path:
+            if full_path:
+                st.image(full_path, caption=caption, use_container_width=True)
+            else:
+                st.warning(f"Image not found at: {final_data['image_path']}")
         else:
-             st.warning(f"Image mock not found at: {image_path}")
+            st.image(thumb_path, caption=caption)
         
     st.markdown("**Compliance Report:**")
-    st.code(final_data['report'])
\ No newline at end of file
+    st.code(final_data['report'])
+
+    channel_outputs = st.session_state.final_state.get('channel_outputs') or {}
+    if channel_outputs:
+        st.subheader("📣 Channel Variants")
+        for tab, (channel, output) in zip(st.tabs(list(channel_outputs)), channel_outputs.items()):
+            with tab:
+                st.code(output['copy'], language='markdown')
+                image_path = output['image_path']
+                if not os.path.exists(image_path):
+                    image_path = get_artifact_store().path_for(output['image_artifact'])
+                if image_path:
+                    st.image(image_path, caption=f"{output['size'][0]}x{output['size'][1]}", width=THUMB_DISPLAY_PX)
+                st.caption(output['report'])
+
+# --- Per-Run Waterfall ---
+if st.session_state.get('trace') and st.session_state.trace.spans:
+    import altair as alt
+    import json
+    import pandas as pd
+
+    trace = st.session_state.trace
+    st.subheader("⏱️ Run Waterfall")
+    rows = pd.DataFrame(trace.records())
+    rows["step"] = [f"{i + 1}. {node}" for i, node in enumerate(rows["node"])]
+    rows["end_s"] = rows["offset_s"] + rows["wall_s"]
+
+    chart = alt.Chart(rows).mark_bar().encode(
+        x=alt.X("offset_s", title="Seconds since start"),
+        x2="end_s",
+        y=alt.Y("step", sort=None, title=None),
+        color=alt.Color("node", legend=None),
+        tooltip=["node", "wall_s", "llm_s", "image_s", "prompt_tokens", "completion_tokens", "bytes_written", "peak_rss_mb"],
+    )
+    st.altair_chart(chart, use_container_width=True)
+
+    totals = trace.totals()
+    st.caption(f"Wall {totals['wall_s']:.2f}s · LLM {totals['llm_s']:.2f}s ({totals['llm_calls']} calls, "
+               f"{totals['prompt_tokens']}+{totals['completion_tokens']} tokens) · Image {totals['image_s']:.2f}s · "
+               f"{totals['bytes_written'] / 1024:.0f} KB written · peak RSS {totals['peak_rss_mb']} MB")
+    st.dataframe(rows[["step", "wall_s", "llm_s", "image_s", "prompt_tokens", "completion_tokens",
+                       "bytes_written", "peak_rss_mb"]], hide_index=True)
+
+    col5, col6 = st.columns(2)
+    with col5:
+        st.download_button("⬇️ Trace (JSONL)", "\n".join(json.dumps(r) for r in trace.records()),
+                           file_name=f"trace_{trace.run_id}.jsonl")
+    with col6:
+        st.download_button("⬇️ Trace (Chrome trace-event)", json.dumps(trace.to_chrome()),
+                           file_name=f"trace_{trace.run_id}.trace.json")
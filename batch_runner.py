@@ -0,0 +1,253 @@
+# batch_runner.py (Run a file of briefs through the LangGraph workflow concurrently)
+#
+# Usage:
+#   python batch_runner.py --input briefs.jsonl --output results.jsonl --workers 8
+#
+# Input is JSONL ({"id": ..., "brief": ...}) or CSV with "id" and "brief" columns; "id" is optional.
+# An optional "channels" field (list, or "instagram,x" in CSV) fans each brief out per channel.
+# An optional "brand" field picks the brand profile (agents/data/brands/<brand>.json).
+# Finished records are appended to the output JSONL as they complete, so re-running the same
+# command after a crash skips every brief that already has an "ok" record. A brief whose earlier
+# attempts all failed is retried until it has BRANDSYNC_BATCH_MAX_ATTEMPTS failed records.
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from graph import ainvoke, get_workflow
+from agents.channels import parse_channels
+from agents.model_lifecycle import WARMUP_ENABLED, warm_up
+from agents.tracing import percentile
+
+MAX_ATTEMPTS = int(os.environ.get("BRANDSYNC_BATCH_MAX_ATTEMPTS", "3"))
+
+
+# --- 1. Input / Output ---
+
+def load_briefs(path):
+    """Reads briefs from a .jsonl or .csv file into [{"id", "brief", "channels", "brand"}, ...]."""
+    items = []
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    for n, row in enumerate(rows):
+        brief = (row.get("brief") or "").strip()
+        if not brief:
+            print(f"⚠️ Skipping row {n}: no brief")
+            continue
+        item_id = str(row.get("id") or f"row-{n}")
+        try:
+            channels = parse_channels(row.get("channels") or [])
+        except ValueError as e:
+            print(f"⚠️ Skipping row {n} ({item_id}): {e}")
+            continue
+        items.append({"id": item_id, "brief": brief, "channels": channels, "brand": row.get("brand") or None})
+    return items
+
+
+def previous_attempts(output_path):
+    """(ids with a successful record, {id: failed attempts}) from the output file (for resuming)."""
+    done, failures = set(), {}
+    if not os.path.exists(output_path):
+        return done, failures
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line from a crash
+            if record.get("status") == "ok":
+                done.add(record["id"])
+            else:
+                failures[record["id"]] = failures.get(record["id"], 0) + 1
+    return done, failures
+
+
+def _open_for_append(output_path):
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    needs_newline = False
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b"\n"
+    out = open(output_path, "a", encoding="utf-8")
+    if needs_newline:
+        out.write("\n")
+    return out
+
+
+# --- 2. Execution ---
+
+def _make_record(item, final_state, start):
+    record = {
+        "id": item["id"],
+        "brief": item["brief"],
+        "status": "ok" if "final_output" in final_state else "incomplete",
+        "final_output": final_state.get("final_output"),
+        "channel_outputs": final_state.get("channel_outputs") or {},
+        "revision_count": final_state.get("revision_count", 0),
+    }
+    record["latency_s"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def _error_record(item, error, start):
+    return {"id": item["id"], "brief": item["brief"], "status": "error", "error": str(error),
+            "latency_s": round(time.perf_counter() - start, 3)}
+
+
+def _initial_state(item):
+    return {"brief": item["brief"], "revision_count": 0, "channels": item.get("channels", []),
+            "brand": item.get("brand")}
+
+
+def _run_id(item, initial_state):
+    """Checkpoint run ID: the row id plus a digest of the input, so files whose ids collide (e.g. the
+    default row-N) never resume each other's runs, while re-running the same file still does."""
+    digest = hashlib.sha1(json.dumps(initial_state, sort_keys=True).encode("utf-8")).hexdigest()[:10]
+    return f"batch-{item['id']}-{digest}"
+
+
+def _invoke(app, item):
+    initial_state = _initial_state(item)
+    if app.checkpointer is None:
+        return app.invoke(initial_state)
+    from agents.checkpoints import resume_run, run_config, run_status  # Only checkpointed runs need the saver
+    # Checkpointed graphs pick a crashed brief up after its last completed node
+    run_id = _run_id(item, initial_state)
+    if run_status(app, run_id) is not None:
+        return resume_run(app, run_id)
+    return app.invoke({**initial_state, "run_id": run_id}, run_config(run_id))
+
+
+def run_one(app, item):
+    """Runs one brief through the compiled graph and returns its output record."""
+    start = time.perf_counter()
+    try:
+        return _make_record(item, _invoke(app, item), start)
+    except Exception as e:
+        return _error_record(item, e, start)
+
+
+async def arun_one(item, semaphore):
+    """Async twin of run_one(); the semaphore bounds how many briefs are in flight."""
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            return _make_record(item, await ainvoke(_initial_state(item)), start)
+        except Exception as e:
+            return _error_record(item, e, start)
+
+
+async def _run_async(pending, workers, on_record):
+    semaphore = asyncio.Semaphore(workers)
+    for next_done in asyncio.as_completed([arun_one(item, semaphore) for item in pending]):
+        on_record(await next_done)
+
+
+def run_batch(input_path, output_path, workers=4, limit=None, app=None, use_async=False, checkpoints=False,
+              max_attempts=MAX_ATTEMPTS):
+    """Runs every pending brief with a bounded worker pool. Returns a summary dict.
+
+    With use_async=True all briefs share one event loop and `workers` caps concurrent briefs.
+    With checkpoints=True every node is persisted, so briefs interrupted mid-graph resume where they stopped.
+    Briefs with max_attempts failed or incomplete records are not retried.
+    """
+    items = load_briefs(input_path)
+    done, failures = previous_attempts(output_path)
+    given_up = [item["id"] for item in items if item["id"] not in done and failures.get(item["id"], 0) >= max_attempts]
+    pending = [item for item in items if item["id"] not in done and item["id"] not in given_up]
+    if limit:
+        pending = pending[:limit]
+
+    mode = "async tasks" if use_async else "workers"
+    print(f"📦 {len(items)} briefs loaded, {len(done)} already done, {len(pending)} to run with {workers} {mode}")
+    if given_up:
+        print(f"⚠️ Not retrying {len(given_up)} brief(s) after {max_attempts} failed attempts: {', '.join(given_up)}")
+    if not pending:
+        return {"briefs": 0, "ok": 0, "failed": 0}
+
+    if WARMUP_ENABLED:
+        warm_up()  # The first briefs would otherwise all queue behind the model load
+
+    write_lock = threading.Lock()
+    latencies = []
+    counts = {"ok": 0, "failed": 0}
+    start = time.perf_counter()
+
+    with _open_for_append(output_path) as out:
+        def on_record(record):
+            with write_lock:
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                if record["status"] == "ok":
+                    counts["ok"] += 1
+                    latencies.append(record["latency_s"])
+                else:
+                    counts["failed"] += 1
+                n = counts["ok"] + counts["failed"]
+            print(f"[{n}/{len(pending)}] {record['id']}: {record['status']} in {record['latency_s']:.1f}s")
+
+        if use_async:
+            asyncio.run(_run_async(pending, workers, on_record))
+        else:
+            app = app or get_workflow(parallel=True, checkpointed=checkpoints)  # Shared by all worker threads
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_one, app, item) for item in pending]
+                for future in as_completed(futures):
+                    on_record(future.result())
+
+    ok, failed = counts["ok"], counts["failed"]
+    elapsed = time.perf_counter() - start
+    summary = {
+        "briefs": len(pending),
+        "ok": ok,
+        "failed": failed,
+        "elapsed_s": round(elapsed, 2),
+        "briefs_per_min": round(len(pending) / elapsed * 60, 2) if elapsed else 0.0,
+        "p50_latency_s": round(percentile(latencies, 50), 3),
+        "p95_latency_s": round(percentile(latencies, 95), 3),
+    }
+    print("\n==========================================")
+    print("📊 BATCH SUMMARY")
+    print("==========================================")
+    print(f"Briefs: {summary['briefs']} ({ok} ok, {failed} failed) in {summary['elapsed_s']}s")
+    print(f"Throughput: {summary['briefs_per_min']} briefs/min")
+    print(f"Latency p50: {summary['p50_latency_s']}s | p95: {summary['p95_latency_s']}s")
+    return summary
+
+
+# --- 3. CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a batch of creative briefs through BrandSync Studio.")
+    parser.add_argument("--input", required=True, help="Briefs file (.jsonl or .csv)")
+    parser.add_argument("--output", default="output/batch_results.jsonl", help="Results JSONL (appended, resumable)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent briefs")
+    parser.add_argument("--limit", type=int, default=None, help="Only run the first N pending briefs")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Drive all briefs on a single event loop instead of a thread pool")
+    parser.add_argument("--checkpoints", action="store_true",
+                        help="Checkpoint every node (SQLite) so interrupted briefs resume mid-graph")
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS,
+                        help="Stop retrying a brief after this many failed or incomplete records")
+    args = parser.parse_args()
+    if args.checkpoints and args.use_async:
+        parser.error("--checkpoints is only supported with the thread-pool runner")
+    run_batch(args.input, args.output, workers=args.workers, limit=args.limit, use_async=args.use_async,
+              checkpoints=args.checkpoints, max_attempts=args.max_attempts)
+
+
+if __name__ == "__main__":
+    main()
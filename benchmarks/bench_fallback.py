@@ -0,0 +1,203 @@
+# benchmarks/bench_fallback.py (Fallbacks/sec: original renderer vs. cached render engine)
+#
+# Usage:
+#   python -m benchmarks.bench_fallback --iterations 50
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from agents.designer import create_premium_fallback
+from agents import render_engine
+
+BRIEFS = [
+    "Launch our new smart speaker product",
+    "Promote the annual developer conference event",
+    "Showcase our creative studio for artists",
+    "Announce breakthrough research in neural search",
+    "Tell our brand story to new customers",
+]
+STRATEGY = "Tone: Playful & Direct; Keywords: Autonomous AI, Consistency; Goal: Engagement"
+
+
+# --- 1. Baseline ---
+
+def legacy_create_premium_fallback(path, brief, strategy, rev_count, main_subject):
+    """The original per-call renderer, kept verbatim as the 'before' baseline."""
+    width, height = 1200, 630
+    
+    # Highly varied color schemes based on content
+    if "product" in brief.lower():
+        bg_colors = [(20, 20, 40), (60, 60, 100)]
+        accent = (100, 200, 255)
+        theme_text = "PRODUCT LAUNCH"
+    elif "event" in brief.lower() or "conference" in brief.lower():
+        bg_colors = [(80, 20, 80), (150, 50, 150)]
+        accent = (255, 200, 100)
+        theme_text = "LIVE EVENT"
+    elif "creative" in brief.lower():
+        bg_colors = [(180, 50, 100), (220, 100, 150)]
+        accent = (255, 220, 100)
+        theme_text = "CREATIVE STUDIO"
+    elif "research" in brief.lower() or "innovation" in brief.lower():
+        bg_colors = [(10, 50, 80), (30, 100, 140)]
+        accent = (0, 255, 200)
+        theme_text = "INNOVATION LAB"
+    else:
+        bg_colors = [(10, 25, 47), (29, 53, 87)]
+        accent = (69, 178, 157)
+        theme_text = "AI POWERED"
+    
+    # Create base with gradient
+    img = Image.new('RGB', (width, height), color=bg_colors[0])
+    draw = ImageDraw.Draw(img, 'RGBA')
+    
+    # Gradient
+    for i in range(height):
+        ratio = i / height
+        r = int(bg_colors[0][0] + (bg_colors[1][0] - bg_colors[0][0]) * ratio)
+        g = int(bg_colors[0][1] + (bg_colors[1][1] - bg_colors[0][1]) * ratio)
+        b = int(bg_colors[0][2] + (bg_colors[1][2] - bg_colors[0][2]) * ratio)
+        draw.rectangle([(0, i), (width, i+1)], fill=(r, g, b))
+    
+    # Varied geometric patterns based on content
+    glow_layer = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    glow_draw = ImageDraw.Draw(glow_layer)
+    
+    if "event" in brief.lower():
+        # Stage-like composition
+        glow_draw.rectangle([100, 400, 1100, 600], fill=accent + (40,))
+        glow_draw.ellipse([400, 100, 800, 400], fill=accent + (30,))
+    elif "product" in brief.lower():
+        # Pedestal composition
+        glow_draw.ellipse([450, 200, 750, 500], fill=accent + (50,))
+        glow_draw.rectangle([500, 400, 700, 550], fill=accent + (40,))
+    else:
+        # Default tech composition
+        glow_draw.ellipse([50, 50, 350, 350], fill=accent + (30,))
+        glow_draw.rectangle([850, 250, 1100, 550], fill=accent + (40,))
+    
+    glow_layer = glow_layer.filter(ImageFilter.GaussianBlur(radius=25))
+    img.paste(glow_layer, (0, 0), glow_layer)
+    
+    # Sharp outlines
+    if "event" in brief.lower():
+        draw.rectangle([100, 400, 1100, 600], outline=accent, width=4)
+    else:
+        draw.ellipse([50, 50, 350, 350], outline=accent, width=3)
+        draw.rectangle([850, 250, 1100, 550], outline=accent, width=3)
+    
+    # Fonts
+    try:
+        font_title = ImageFont.truetype("arial.ttf", 70)
+        font_theme = ImageFont.truetype("arial.ttf", 28)
+        font_subtitle = ImageFont.truetype("arial.ttf", 32)
+        font_small = ImageFont.truetype("arial.ttf", 22)
+    except:
+        try:
+            font_title = ImageFont.truetype("Arial.ttf", 70)
+            font_theme = ImageFont.truetype("Arial.ttf", 28)
+            font_subtitle = ImageFont.truetype("Arial.ttf", 32)
+            font_small = ImageFont.truetype("Arial.ttf", 22)
+        except:
+            font_title = ImageFont.load_default()
+            font_theme = font_title
+            font_subtitle = font_title
+            font_small = font_title
+    
+    # Theme label at top
+    draw.text((width//2, 80), theme_text, fill=accent, font=font_theme, anchor="mm")
+    
+    # Brand name
+    shadow_offset = 4
+    draw.text((width//2 + shadow_offset, 220 + shadow_offset), "BrandSync Studio", 
+             fill=(0, 0, 0, 120), font=font_title, anchor="mm")
+    draw.text((width//2, 220), "BrandSync Studio", 
+             fill=(255, 255, 255), font=font_title, anchor="mm")
+    
+    # Brief excerpt
+    brief_words = " ".join(brief.split()[:8]) + "..."
+    draw.text((width//2, 320), brief_words, 
+             fill=(220, 220, 220), font=font_small, anchor="mm")
+    
+    # Dynamic tagline based on content
+    if "launch" in brief.lower():
+        tagline = "Revolutionary Launch Experience"
+    elif "event" in brief.lower():
+        tagline = "Transforming Virtual Events"
+    elif "creative" in brief.lower():
+        tagline = "Empowering Creative Innovation"
+    elif "research" in brief.lower():
+        tagline = "Advancing AI Research"
+    else:
+        tagline = "AI-Powered Brand Consistency"
+    
+    draw.text((width//2, 400), tagline, fill=accent, font=font_subtitle, anchor="mm")
+    
+    # Revision badge
+    if rev_count > 0:
+        draw.rounded_rectangle([width//2 - 140, 520, width//2 + 140, 570],
+                              radius=25, fill=accent + (220,), outline=(255, 255, 255), width=2)
+        draw.text((width//2, 545), f"✓ Revision {rev_count}", 
+                 fill=(255, 255, 255), font=font_small, anchor="mm")
+    
+    # Scanlines
+    for i in range(0, height, 3):
+        draw.line([(0, i), (width, i)], fill=(255, 255, 255, 3), width=1)
+    
+    # Enhance
+    enhancer = ImageEnhance.Contrast(img)
+    img = enhancer.enhance(1.3)
+    
+    img.save(path, format='PNG', quality=95)
+
+
+# --- 2. Measurement ---
+
+def _fallbacks_per_sec(render, iterations, out_dir):
+    start = time.perf_counter()
+    for i in range(iterations):
+        brief = BRIEFS[i % len(BRIEFS)]
+        render(os.path.join(out_dir, f"bench_{i % len(BRIEFS)}.png"), brief, STRATEGY, i % 3, "subject")
+    return iterations / (time.perf_counter() - start)
+
+
+def run(iterations=50):
+    with tempfile.TemporaryDirectory() as out_dir:
+        before = _fallbacks_per_sec(legacy_create_premium_fallback, iterations, out_dir)
+
+        render_engine._background.cache_clear()
+        render_engine._fonts.cache_clear()
+        cold_start = time.perf_counter()
+        render_engine.warm_cache()
+        warm_up_s = time.perf_counter() - cold_start
+
+        after = _fallbacks_per_sec(create_premium_fallback, iterations, out_dir)
+
+        # Compositing alone, without PNG encoding/disk I/O
+        start = time.perf_counter()
+        for i in range(iterations):
+            render_engine.render_fallback(BRIEFS[i % len(BRIEFS)], i % 3)
+        render_only = iterations / (time.perf_counter() - start)
+
+    return {
+        "iterations": iterations,
+        "before_fallbacks_per_sec": round(before, 2),
+        "after_fallbacks_per_sec": round(after, 2),
+        "speedup": round(after / before, 2),
+        "render_only_per_sec": round(render_only, 2),
+        "theme_cache_warm_up_s": round(warm_up_s, 3),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the designer's PIL fallback renderer.")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
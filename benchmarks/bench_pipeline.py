@@ -0,0 +1,299 @@
+# benchmarks/bench_pipeline.py (End-to-end benchmarks against a mock Ollama and a stub image server)
+#
+# Usage:
+#   python -m benchmarks.bench_pipeline --output bench.json
+#   python -m benchmarks.bench_pipeline --scenarios single_brief,rejection_loop --compare bench_main.json
+#
+# Nothing touches the network: the gateway points at benchmarks/mock_ollama.py and the designer at
+# benchmarks/stub_image_server.py, both with fixed latencies, and every scenario runs in a throwaway
+# working directory with empty caches. Results are JSON, so two commits can be diffed with --compare.
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(REPO_ROOT)
+
+from benchmarks.mock_ollama import start_mock_ollama, unload_models
+from benchmarks.stub_image_server import start_stub_image_server
+
+SCENARIOS = ("single_brief", "batch", "rejection_loop", "crew", "fallback", "cold_start")
+BRIEF = "Create an engaging social media post for our new autonomous AI agency launch, focusing on speed and consistency."
+BATCH_TOPICS = [
+    "product launch for a smart speaker",
+    "developer conference event",
+    "brand story for a creative studio",
+    "breakthrough research in neural search",
+    "summer webinar series",
+]
+# Metrics where a higher number is better; everything else in --compare is "lower is better"
+HIGHER_IS_BETTER = {"throughput_per_min"}
+
+
+# --- 1. Measurement Helpers ---
+
+def summarize(latencies, elapsed, **extra):
+    """Common metric block for every scenario."""
+    from agents.tracing import _peak_rss_mb, percentile
+
+    return {
+        "runs": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_min": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+        "mean_latency_s": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        "p50_latency_s": round(percentile(latencies, 50), 4),
+        "p95_latency_s": round(percentile(latencies, 95), 4),
+        "p99_latency_s": round(percentile(latencies, 99), 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        **extra,
+    }
+
+
+def _timed_runs(fn, runs):
+    latencies = []
+    start = time.perf_counter()
+    for i in range(runs):
+        t0 = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# --- 2. Scenarios ---
+
+def bench_single_brief(runs):
+    """One brief at a time through the parallel graph; each run uses a fresh brief so caches stay cold."""
+    from graph import build_workflow
+    from agents.tracing import Trace
+
+    app = build_workflow(parallel=True)
+    traces = []
+
+    def run(i):
+        trace = Trace()
+        app.invoke({"brief": f"{BRIEF} (run {i})", "revision_count": 0}, {"configurable": {"trace": trace}})
+        traces.append(trace.totals())
+
+    latencies, elapsed = _timed_runs(run, runs)
+    return summarize(latencies, elapsed,
+                     llm_s_per_run=round(sum(t["llm_s"] for t in traces) / runs, 4),
+                     image_s_per_run=round(sum(t["image_s"] for t in traces) / runs, 4),
+                     llm_calls_per_run=round(sum(t["llm_calls"] for t in traces) / runs, 2))
+
+
+def bench_batch(briefs, workers):
+    """Runs `briefs` distinct briefs through batch_runner with a thread pool."""
+    from batch_runner import run_batch
+
+    input_path, output_path = "bench_briefs.jsonl", "bench_results.jsonl"
+    with open(input_path, "w", encoding="utf-8") as f:
+        for i in range(briefs):
+            f.write(json.dumps({"id": f"b{i:04d}", "brief": f"Social post for our {BATCH_TOPICS[i % len(BATCH_TOPICS)]} #{i}"}) + "\n")
+
+    start = time.perf_counter()
+    summary = run_batch(input_path, output_path, workers=workers)
+    elapsed = time.perf_counter() - start
+
+    with open(output_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    latencies = [r["latency_s"] for r in records if r["status"] == "ok"]
+    return summarize(latencies, elapsed, workers=workers, failed=summary["failed"])
+
+
+def bench_rejection_loop(runs):
+    """Brand guardian rejects every pass, so each run goes through the maximum number of revisions."""
+    import graph
+
+    original = graph.brand_guardian
+
+    def always_reject(state):
+        return {"brand_feedback": "REJECT: Benchmark forces a revision. Target: copywriter",
+                "rejection_target": "copywriter"}
+
+    graph.brand_guardian = always_reject
+    try:
+        app = graph.build_workflow(parallel=True)
+    finally:
+        graph.brand_guardian = original
+
+    revisions = []
+
+    def run(i):
+        state = app.invoke({"brief": f"{BRIEF} (loop {i})", "revision_count": 0})
+        revisions.append(state.get("revision_count", 0))
+
+    latencies, elapsed = _timed_runs(run, runs)
+    return summarize(latencies, elapsed, revisions_per_run=round(sum(revisions) / runs, 2))
+
+
+def bench_crew(runs):
+    """The standalone four-agent crew.py flow (four sequential LLM calls)."""
+    from crew import run_creative_copilot
+
+    latencies, elapsed = _timed_runs(lambda i: run_creative_copilot(), runs)
+    return summarize(latencies, elapsed)
+
+
+def bench_fallback(runs):
+    """The designer's PIL fallback alone (render + PNG encode + write)."""
+    from agents.designer import create_premium_fallback
+
+    os.makedirs("fallback", exist_ok=True)
+    latencies, elapsed = _timed_runs(
+        lambda i: create_premium_fallback(os.path.join("fallback", f"fallback_{i % 5}.png"),
+                                          f"{BATCH_TOPICS[i % len(BATCH_TOPICS)]}", "Tone: Playful", i % 3, "subject"),
+        runs)
+    return summarize(latencies, elapsed)
+
+
+def bench_cold_start(runs, ollama, load_latency):
+    """First brief after the model was unloaded, without and with warm-up (mock load = load_latency)."""
+    from graph import build_workflow
+    from agents.model_lifecycle import warm_up
+
+    app = build_workflow(parallel=True)
+    ollama.load_latency = load_latency
+    cold, warm, warmups = [], [], []
+    try:
+        for i in range(runs):
+            unload_models(ollama)
+            t0 = time.perf_counter()
+            app.invoke({"brief": f"{BRIEF} (cold {i})", "revision_count": 0})
+            cold.append(time.perf_counter() - t0)
+
+            unload_models(ollama)
+            t0 = time.perf_counter()
+            warm_up()
+            warmups.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            app.invoke({"brief": f"{BRIEF} (warm {i})", "revision_count": 0})
+            warm.append(time.perf_counter() - t0)
+    finally:
+        ollama.load_latency = 0.0
+    return summarize(warm, sum(warm), load_latency_s=load_latency,
+                     cold_first_brief_s=round(sum(cold) / runs, 4),
+                     warm_first_brief_s=round(sum(warm) / runs, 4),
+                     warmup_s=round(sum(warmups) / runs, 4))
+
+
+# --- 3. Runner ---
+
+def configure_environment(work_dir, ollama_url, image_url):
+    """Points every backend at the mocks. Must run before any agent module is imported."""
+    os.environ["OLLAMA_HOSTS"] = ollama_url
+    os.environ["POLLINATIONS_URL"] = image_url
+    os.environ["BRANDSYNC_IMAGE_BACKEND"] = "pollinations"
+    os.environ["BRANDSYNC_LLM_CACHE"] = "0"
+    os.environ["BRANDSYNC_IMAGE_VARIETY"] = "0"
+    os.environ["BRANDSYNC_WARMUP"] = "0"  # Only the cold_start scenario warms, explicitly
+    os.environ["BRANDSYNC_IMAGE_CACHE_DIR"] = os.path.join(work_dir, ".cache", "images")
+    os.chdir(work_dir)
+
+
+def run(scenarios=SCENARIOS, runs=10, batch_size=100, workers=4, llm_latency=0.05, tokens_per_sec=200.0,
+        image_latency=0.1, load_latency=0.5, verbose=False):
+    ollama, ollama_url = start_mock_ollama(latency=llm_latency, tokens_per_sec=tokens_per_sec)
+    images, image_url = start_stub_image_server(latency=image_latency)
+    cwd = os.getcwd()
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            configure_environment(work_dir, ollama_url, image_url)
+            with open(os.devnull, "w") as devnull, \
+                    (contextlib.nullcontext() if verbose else contextlib.redirect_stdout(devnull)):
+                for name in scenarios:
+                    if name == "single_brief":
+                        results[name] = bench_single_brief(runs)
+                    elif name == "batch":
+                        results[name] = bench_batch(batch_size, workers)
+                    elif name == "rejection_loop":
+                        results[name] = bench_rejection_loop(runs)
+                    elif name == "crew":
+                        results[name] = bench_crew(runs)
+                    elif name == "fallback":
+                        results[name] = bench_fallback(runs)
+                    elif name == "cold_start":
+                        results[name] = bench_cold_start(runs, ollama, load_latency)
+                    else:
+                        raise ValueError(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+            os.chdir(cwd)  # Leave the temp dir before it is deleted
+    finally:
+        os.chdir(cwd)
+        ollama.shutdown()
+        images.shutdown()
+
+    from agents.image_encoding import encoding_stats
+    from agents.review import review_stats
+    from agents.structured import parse_stats
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {"runs": runs, "batch_size": batch_size, "workers": workers, "llm_latency_s": llm_latency,
+                   "tokens_per_sec": tokens_per_sec, "image_latency_s": image_latency,
+                   "load_latency_s": load_latency},
+        "scenarios": results,
+        "json_parse": parse_stats(),
+        "review_tiers": review_stats(),
+        "image_encoding": encoding_stats(),
+    }
+
+
+def compare(current, baseline):
+    """Relative change per metric: positive = improvement, negative = regression."""
+    report = {}
+    for name, metrics in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        report[name] = {}
+        for key, value in metrics.items():
+            old = before.get(key)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            report[name][key] = round(change if key in HIGHER_IS_BETTER else -change, 4)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the BrandSync pipeline against local mock backends.")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per sequential scenario")
+    parser.add_argument("--batch-size", type=int, default=100, help="Briefs in the batch scenario")
+    parser.add_argument("--workers", type=int, default=4, help="Batch worker threads")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Mock Ollama seconds to first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0, help="Mock Ollama decode speed")
+    parser.add_argument("--image-latency", type=float, default=0.1, help="Stub image server seconds per image")
+    parser.add_argument("--load-latency", type=float, default=0.5, help="Mock model load time (cold_start scenario)")
+    parser.add_argument("--output", default=None, help="Also write the JSON report here")
+    parser.add_argument("--compare", default=None, help="Baseline JSON report to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the agents' console output")
+    args = parser.parse_args()
+
+    report = run([s.strip() for s in args.scenarios.split(",") if s.strip()], args.runs, args.batch_size,
+                 args.workers, args.llm_latency, args.tokens_per_sec, args.image_latency, args.load_latency,
+                 args.verbose)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
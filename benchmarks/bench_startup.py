@@ -0,0 +1,109 @@
+# benchmarks/bench_startup.py (Cold-start time of app.py, graph import and first compile)
+#
+# Usage:
+#   python -m benchmarks.bench_startup                  # JSON report
+#   python -m benchmarks.bench_startup --check          # exit 1 if over benchmarks/startup_budget.json
+#
+# Every measurement runs in a fresh interpreter so nothing is already imported. Besides wall time,
+# it records which heavy modules got loaded: the budget forbids e.g. PIL before a node draws an image,
+# which catches regressions that timings on a fast machine would hide.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "startup_budget.json")
+HEAVY_MODULES = ("langgraph", "ollama", "PIL", "numpy", "requests", "httpx", "diffusers", "torch")
+
+# Each probe prints {"seconds": ..., "loaded": [...]} on its last line
+PROBES = {
+    # Import + first script run of the Streamlit page (what a new browser session waits for)
+    "app_first_paint": """
+import time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=60).run()
+seconds = time.perf_counter() - start
+assert not at.exception, at.exception
+""",
+    "import_graph": """
+import time
+start = time.perf_counter()
+import graph
+seconds = time.perf_counter() - start
+""",
+    # Import + compile, i.e. what a worker process pays before its first job
+    "worker_ready": """
+import time
+start = time.perf_counter()
+from graph import get_workflow
+get_workflow(parallel=True, checkpointed=True)
+seconds = time.perf_counter() - start
+""",
+}
+PROBE_FOOTER = """
+import json, sys
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(probe, work_dir):
+    code = PROBES[probe].format(app=os.path.join(REPO_ROOT, "app.py")) + PROBE_FOOTER.format(heavy=HEAVY_MODULES)
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, BRANDSYNC_EMBEDDED_WORKERS="0")
+    result = subprocess.run([sys.executable, "-c", code], cwd=work_dir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{probe} probe failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(repeats=3):
+    report = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for probe in PROBES:
+            samples = [measure(probe, work_dir) for _ in range(repeats)]
+            seconds = [s["seconds"] for s in samples]
+            report[probe] = {
+                "median_s": round(statistics.median(seconds), 3),
+                "min_s": round(min(seconds), 3),
+                "max_s": round(max(seconds), 3),
+                "loaded": samples[-1]["loaded"],
+            }
+    return report
+
+
+def check(report, budget):
+    """Returns a list of human-readable budget violations (empty = pass)."""
+    problems = []
+    for probe, limits in budget.items():
+        result = report.get(probe)
+        if result is None:
+            continue
+        if result["median_s"] > limits["max_s"]:
+            problems.append(f"{probe}: {result['median_s']}s > budget {limits['max_s']}s")
+        leaked = sorted(set(result["loaded"]) & set(limits.get("forbidden", [])))
+        if leaked:
+            problems.append(f"{probe}: imports {', '.join(leaked)} at startup")
+    return problems
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure BrandSync cold-start time.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--check", action="store_true", help=f"Fail if over the budget in {os.path.basename(BUDGET_PATH)}")
+    parser.add_argument("--budget", default=BUDGET_PATH)
+    args = parser.parse_args()
+
+    report = run(args.repeats)
+    print(json.dumps(report, indent=2))
+    if args.check:
+        with open(args.budget, encoding="utf-8") as f:
+            problems = check(report, json.load(f))
+        for problem in problems:
+            print(f"❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ Startup within budget")
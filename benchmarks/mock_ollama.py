@@ -0,0 +1,188 @@
+# benchmarks/mock_ollama.py (Local stand-in for the Ollama HTTP API)
+#
+# Usage:
+#   python -m benchmarks.mock_ollama --port 11500 --latency 0.2 --tokens-per-sec 40 --load-latency 2
+#   OLLAMA_HOSTS=http://127.0.0.1:11500 python graph.py
+#
+# Implements POST /api/generate (streaming NDJSON and non-streaming) plus GET /api/tags and
+# /api/version. Requests with `format` (or prompts that mention JSON) get a JSON object carrying every
+# key the agents' schemas ask for; everything else gets a caption. `latency` is the delay before the
+# first token (prompt evaluation), `tokens_per_sec` the decode speed, so benchmark numbers depend only
+# on these two knobs. With `load_latency`, a request for a model that is not loaded first pays that
+# load and reports it as `load_duration`; models stay loaded for the request's keep_alive (default 5m),
+# and an empty prompt only loads (or, with keep_alive 0, unloads) the model, as in Ollama.
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+JSON_RESPONSE = json.dumps({
+    "tone": "Playful & Direct",
+    "keywords": ["Autonomous AI", "Consistency", "Speed"],
+    "goal": "Drive engagement for the launch",
+    "description": "Young creators collaborating around a glowing dashboard",
+    "style": "cinematic urban ad",
+    "approved": True,
+    "feedback": "Compliant",
+})
+TEXT_RESPONSE = ("🚀 Meet the agency that never sleeps! Autonomous AI keeps every post on-brand, on-time and "
+                 "on-point. Ready to move faster? #BrandSync #AI #Consistency")
+
+
+def tokenize(text):
+    """Splits text into word-ish tokens (keeps the separators so the stream re-joins exactly)."""
+    tokens, current = [], ""
+    for ch in text:
+        current += ch
+        if ch in " ,.!?\n":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+DEFAULT_KEEP_ALIVE_S = 300.0
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def keep_alive_seconds(value):
+    """Seconds a model stays loaded for Ollama's keep_alive (number of seconds or "30m"/"1h30m"); < 0 = forever."""
+    if value is None:
+        return DEFAULT_KEEP_ALIVE_S
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        parts = re.findall(r"(-?[\d.]+)(ms|s|m|h)", value)
+        seconds = sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts) if parts else float(value)
+    return float("inf") if seconds < 0 else seconds
+
+
+def unload_models(server):
+    """Forgets every loaded model, so the next request pays the load again."""
+    with server.model_lock:
+        server.loaded_until.clear()
+
+
+def _ensure_loaded(server, model, keep_alive):
+    """Simulates loading `model` if needed; returns the load time in seconds (0.0 when already warm)."""
+    with server.model_lock:
+        warm = server.loaded_until.get(model, 0.0) > time.monotonic()
+    load_s = 0.0
+    if not warm and server.load_latency:
+        time.sleep(server.load_latency)
+        load_s = server.load_latency
+    with server.model_lock:
+        server.loaded_until[model] = time.monotonic() + keep_alive_seconds(keep_alive)
+    return load_s
+
+
+def response_for(prompt, format=None):
+    return JSON_RESPONSE if format or "json" in prompt.lower() else TEXT_RESPONSE
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    tokens_per_sec = 0.0  # 0 = emit all tokens at once
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, payload):
+        line = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "llama3.1:8b", "model": "llama3.1:8b"}]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-mock"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = body.get("model", "")
+        prompt = body.get("prompt", "")
+        start = time.perf_counter()
+        load_s = _ensure_loaded(self.server, model, body.get("keep_alive"))
+        if not prompt:
+            if keep_alive_seconds(body.get("keep_alive")) == 0:
+                with self.server.model_lock:
+                    self.server.loaded_until.pop(model, None)
+            self._send_json({"model": model, "response": "", "done": True, "load_duration": int(load_s * 1e9)})
+            return
+
+        tokens = tokenize(response_for(prompt, body.get("format")))
+        delay = 1.0 / self.tokens_per_sec if self.tokens_per_sec else 0.0
+        stats = {"prompt_eval_count": len(tokenize(body.get("system") or "")) + len(tokenize(prompt)),
+                 "eval_count": len(tokens), "load_duration": int(load_s * 1e9)}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if not body.get("stream", True):
+            if delay:
+                time.sleep(delay * len(tokens))
+            self._send_json({"model": model, "response": "".join(tokens), "done": True,
+                             "total_duration": int((time.perf_counter() - start) * 1e9), **stats})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for token in tokens:
+            if delay:
+                time.sleep(delay)
+            self._write_chunk({"model": model, "response": token, "done": False})
+        self._write_chunk({"model": model, "response": "", "done": True,
+                           "total_duration": int((time.perf_counter() - start) * 1e9), **stats})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+def start_mock_ollama(host="127.0.0.1", port=0, latency=0.0, tokens_per_sec=0.0, load_latency=0.0):
+    """Starts the server on a daemon thread. Returns (server, base_url); call server.shutdown() to stop.
+
+    server.load_latency can be changed while it runs; unload_models(server) makes the next call cold.
+    """
+    handler = type("ConfiguredMockOllamaHandler", (MockOllamaHandler,),
+                   {"latency": latency, "tokens_per_sec": tokens_per_sec})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.load_latency = load_latency
+    server.loaded_until = {}  # model -> monotonic time it unloads
+    server.model_lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Ollama server for offline runs and benchmarks.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-sec", type=float, default=0.0, help="Decode speed (0 = instant)")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="Seconds to load a model that is not loaded")
+    args = parser.parse_args()
+    server, url = start_mock_ollama(args.host, args.port, args.latency, args.tokens_per_sec, args.load_latency)
+    print(f"🦙 Mock Ollama listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
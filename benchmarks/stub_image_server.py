@@ -0,0 +1,88 @@
+# benchmarks/stub_image_server.py (Local stand-in for image.pollinations.ai)
+#
+# Usage:
+#   python -m benchmarks.stub_image_server --port 8765 --latency 0.5
+#   POLLINATIONS_URL=http://127.0.0.1:8765 streamlit run app.py
+#
+# Serves GET /prompt/<text>?width=&height=&seed= with a deterministic PNG, so the designer,
+# benchmarks and offline boxes exercise the real HTTP path without network access.
+import argparse
+import hashlib
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+
+def render_stub_png(prompt, width, height, seed):
+    """Noisy two-tone PNG derived from (prompt, seed); large enough to pass MIN_IMAGE_BYTES."""
+    digest = hashlib.sha256(f"{prompt}|{seed}".encode("utf-8")).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "big"))
+    top = np.frombuffer(digest[8:11], dtype=np.uint8).astype(np.float32)
+    bottom = np.frombuffer(digest[11:14], dtype=np.uint8).astype(np.float32)
+    ratio = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None, None]
+    pixels = top + (bottom - top) * ratio + rng.normal(0, 12, (height, width, 3))
+    buffer = BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "RGB").save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class StubImageHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    failure_rate = 0.0
+
+    def do_GET(self):
+        parsed = urllib.parse.urlparse(self.path)
+        if not parsed.path.startswith("/prompt/"):
+            self.send_error(404)
+            return
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.send_error(503, "stub failure")
+            return
+
+        query = urllib.parse.parse_qs(parsed.query)
+        width = int(query.get("width", ["1200"])[0])
+        height = int(query.get("height", ["630"])[0])
+        seed = query.get("seed", ["0"])[0]
+        prompt = urllib.parse.unquote(parsed.path[len("/prompt/"):])
+        body = render_stub_png(prompt, width, height, seed)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+
+def start_stub_image_server(host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0):
+    """Starts the server on a daemon thread. Returns (server, base_url); call server.shutdown() to stop."""
+    handler = type("ConfiguredStubImageHandler", (StubImageHandler,), {"latency": latency, "failure_rate": failure_rate})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Pollinations-compatible image server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to sleep per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+    server, url = start_stub_image_server(args.host, args.port, args.latency, args.failure_rate)
+    print(f"🖼️ Stub image server listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
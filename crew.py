@@ -1,20 +1,33 @@
 # crew.py
-import ollama
 import os
 import json
 import time
+import uuid
+
+from agents.artifacts import get_artifact_store
+from agents.gateway import generate
+from agents.structured import DESIGN_SPEC_SCHEMA, REVIEW_SCHEMA, STRATEGY_SCHEMA, generate_json
 
 # === SETUP ===
 os.makedirs("output", exist_ok=True)
 
 # === OLLAMA CALL (LOCAL ONLY) ===
 def ask_ollama(prompt):
-    response = ollama.generate(model="llama3.1:8b", prompt=prompt)
+    response = generate(prompt)
     return response['response'].strip()
 
+def ask_ollama_json(prompt, schema, agent, fallback):
+    """Schema-constrained call; returns the parsed object, or `fallback` if the output is unusable."""
+    try:
+        return generate_json(prompt, schema, agent)[0]
+    except Exception as e:
+        print(f"→ {agent} JSON error ({e}), using fallback")
+        return fallback
+
 # === FULL AGENT WORKFLOW ===
 def run_creative_copilot():
     brief = "Launch eco-friendly sneakers for Indian youth"
+    run_id = f"crew-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
     print("\n" + "="*80)
     print("CREATIVE MEDIA CO-PILOT – 4 AGENTS WORKING")
     print("="*80 + "\n")
@@ -30,11 +43,8 @@ def run_creative_copilot():
     }}
     For: "{brief}"
     """
-    strategy = ask_ollama(strategy_prompt)
-    try:
-        strategy_json = json.loads(strategy.replace("```", "").strip())
-    except:
-        strategy_json = {"tone": "fresh", "keywords": ["eco", "sneakers"], "goal": "launch"}
+    strategy_json = ask_ollama_json(strategy_prompt, STRATEGY_SCHEMA, "crew_strategist",
+                                    {"tone": "fresh", "keywords": ["eco", "sneakers"], "goal": "launch"})
     print(f"→ {strategy_json}")
 
     # AGENT 2: COPYWRITER
@@ -57,15 +67,12 @@ def run_creative_copilot():
       "style": "cinematic urban ad"
     }}
     """
-    design = ask_ollama(design_prompt)
-    try:
-        design_json = json.loads(design.replace("```", "").strip())
-    except:
-        design_json = {"description": "Indian youth in green sneakers", "style": "urban"}
+    design_json = ask_ollama_json(design_prompt, DESIGN_SPEC_SCHEMA, "crew_designer",
+                                  {"description": "Indian youth in green sneakers", "style": "urban"})
     print(f"→ {design_json['description']}")
-    # Save design spec
-    with open("output/design_spec.json", "w") as f:
-        json.dump(design_json, f, indent=2)
+    # Save design spec (per run, written atomically, so concurrent crews do not overwrite each other)
+    spec = get_artifact_store().put_bytes(run_id, "design_spec.json", json.dumps(design_json, indent=2).encode("utf-8"))
+    print(f"→ Saved {spec['path']} ({spec['id'][:12]})")
 
     # AGENT 4: REVIEWER
     print("\nAGENT 4: REVIEWER")
@@ -78,11 +85,8 @@ def run_creative_copilot():
       "feedback": "string"
     }}
     """
-    review = ask_ollama(review_prompt)
-    try:
-        review_json = json.loads(review.replace("```", "").strip())
-    except:
-        review_json = {"approved": True, "feedback": "Compliant"}
+    review_json = ask_ollama_json(review_prompt, REVIEW_SCHEMA, "crew_reviewer",
+                                  {"approved": True, "feedback": "Compliant"})
     print(f"→ Approved: {review_json['approved']}")
 
     print("\n" + "="*80)
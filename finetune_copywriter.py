@@ -1,9 +1,29 @@
 # finetune_copywriter.py
-import torch
-from unsloth import FastLanguageModel
-from datasets import load_dataset
-from trl import SFTTrainer
-from transformers import TrainingArguments
+#
+# Usage:
+#   python finetune_copywriter.py                                   # prepare (cached) + train on GPU
+#   python finetune_copywriter.py --dry-run --tokenizer ./tokenizers/llama-3.1   # CPU only: prep + stream
+#   python finetune_copywriter.py --dry-run --tokenizer bytes       # no transformers needed (pipeline test)
+#
+# Data prep turns local JSONL (caption/tone_label) into instruction text, tokenizes it once, packs the
+# tokens into max_seq_length blocks and writes them as NumPy shards under .cache/finetune_data/<key>/.
+# The key hashes the source file, the tokenizer and max_seq_length, so repeat experiments reuse the
+# shards and nothing touches the network. Training streams the memory-mapped shards.
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+SOURCE_PATH = os.path.join("agents", "data", "brandvoice_sample.jsonl")
+DATA_CACHE_DIR = os.environ.get("BRANDSYNC_FINETUNE_DATA", os.path.join(".cache", "finetune_data"))
+BASE_MODEL = "meta-llama/Llama-3.1-8B"
+MAX_SEQ_LENGTH = 2048
+ROWS_PER_SHARD = 4096
+TOKENIZE_BATCH = 1000
+PROMPT_TEMPLATE_VERSION = 1  # Bump when format_instruction_examples changes
 
 # Define the formatting function for the dataset
 def format_instruction_examples(examples):
@@ -15,19 +35,194 @@ def format_instruction_examples(examples):
         prompts.append(text)
     return {"text": prompts}
 
-# --- 1. Load Model and Tokenizer ---
-def run_finetuning():
-    max_seq_length = 2048 
-    
+# --- 1. Data Prep: Tokenize, Pack, Shard ---
+
+class ByteTokenizer:
+    """UTF-8 byte tokenizer for exercising the pipeline without transformers (not for training)."""
+    name_or_path = "bytes"
+    eos_token_id = 256
+    pad_token_id = 257
+
+    def __call__(self, texts, add_special_tokens=True):
+        return {"input_ids": [list(text.encode("utf-8")) for text in texts]}
+
+
+def load_tokenizer(name):
+    if name == "bytes":
+        return ByteTokenizer()
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(name)
+
+
+def _iter_batches(path, batch_size):
+    """Yields {"tone_label": [...], "caption": [...]} column batches from a JSONL file."""
+    batch = {"tone_label": [], "caption": []}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not row.get("caption") or not row.get("tone_label"):
+                continue
+            batch["tone_label"].append(row["tone_label"])
+            batch["caption"].append(row["caption"])
+            if len(batch["caption"]) >= batch_size:
+                yield batch
+                batch = {"tone_label": [], "caption": []}
+    if batch["caption"]:
+        yield batch
+
+
+def cache_key(source_path, tokenizer, max_seq_length):
+    """Hash of the source bytes, tokenizer identity, max_seq_length and prompt template."""
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    vocab = getattr(tokenizer, "vocab_size", None)
+    digest.update(json.dumps([tokenizer.name_or_path, vocab, tokenizer.eos_token_id, max_seq_length,
+                              PROMPT_TEMPLATE_VERSION]).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _write_shard(out_dir, index, blocks, lengths):
+    np.save(os.path.join(out_dir, f"input_ids_{index:05d}.npy"), np.asarray(blocks, dtype=np.uint32))
+    np.save(os.path.join(out_dir, f"lengths_{index:05d}.npy"), np.asarray(lengths, dtype=np.uint32))
+
+
+def prepare_dataset(source_path=SOURCE_PATH, tokenizer=None, max_seq_length=MAX_SEQ_LENGTH,
+                    cache_dir=DATA_CACHE_DIR, rebuild=False):
+    """Tokenizes and packs source_path into shards (once per cache key). Returns the manifest dict.
+
+    Examples are joined with EOS and cut into max_seq_length blocks (like SFTTrainer's packing=True);
+    the last block is padded and its real length stored, so no tokens are dropped.
+    """
+    tokenizer = tokenizer or load_tokenizer(BASE_MODEL)
+    out_dir = os.path.join(cache_dir, cache_key(source_path, tokenizer, max_seq_length))
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    if not rebuild and os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        print(f"📦 Reusing pre-tokenized dataset {out_dir} ({manifest['blocks']} blocks)")
+        return manifest
+
+    os.makedirs(out_dir, exist_ok=True)
+    pad_id = getattr(tokenizer, "pad_token_id", None)
+    pad_id = tokenizer.eos_token_id if pad_id is None else pad_id
+    start = time.perf_counter()
+    stats = {"examples": 0, "tokens": 0, "blocks": 0, "shards": 0}
+    buffer, blocks, lengths = [], [], []
+
+    def emit(block, length):
+        blocks.append(block)
+        lengths.append(length)
+        stats["blocks"] += 1
+        if len(blocks) >= ROWS_PER_SHARD:
+            _write_shard(out_dir, stats["shards"], blocks, lengths)
+            stats["shards"] += 1
+            blocks.clear()
+            lengths.clear()
+
+    for batch in _iter_batches(source_path, TOKENIZE_BATCH):
+        texts = format_instruction_examples(batch)["text"]
+        for ids in tokenizer(texts, add_special_tokens=True)["input_ids"]:
+            buffer.extend(ids)
+            buffer.append(tokenizer.eos_token_id)
+            stats["examples"] += 1
+            stats["tokens"] += len(ids) + 1
+        while len(buffer) >= max_seq_length:
+            emit(buffer[:max_seq_length], max_seq_length)
+            del buffer[:max_seq_length]
+    if buffer:
+        emit(buffer + [pad_id] * (max_seq_length - len(buffer)), len(buffer))
+    if blocks:
+        _write_shard(out_dir, stats["shards"], blocks, lengths)
+        stats["shards"] += 1
+
+    elapsed = time.perf_counter() - start
+    manifest = {
+        **stats,
+        "dir": out_dir,
+        "source": source_path,
+        "tokenizer": tokenizer.name_or_path,
+        "max_seq_length": max_seq_length,
+        "pad_token_id": pad_id,
+        "prep_s": round(elapsed, 3),
+        "examples_per_s": round(stats["examples"] / elapsed, 1) if elapsed else None,
+        "tokens_per_s": round(stats["tokens"] / elapsed, 1) if elapsed else None,
+        "packing_efficiency": round(stats["tokens"] / (stats["blocks"] * max_seq_length), 4) if stats["blocks"] else 0.0,
+    }
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"📦 Prepared {stats['examples']} examples → {stats['blocks']} blocks of {max_seq_length} tokens "
+          f"in {elapsed:.2f}s ({manifest['tokens_per_s']} tokens/s) → {out_dir}")
+    return manifest
+
+
+# --- 2. Streaming the Shards ---
+
+def iter_blocks(manifest, epochs=1):
+    """Yields {"input_ids", "attention_mask", "labels"} NumPy rows from memory-mapped shards; padding is masked out."""
+    for _ in range(epochs):
+        for shard in range(manifest["shards"]):
+            ids = np.load(os.path.join(manifest["dir"], f"input_ids_{shard:05d}.npy"), mmap_mode="r")
+            lengths = np.load(os.path.join(manifest["dir"], f"lengths_{shard:05d}.npy"))
+            positions = np.arange(manifest["max_seq_length"])
+            for row, length in zip(ids, lengths):
+                input_ids = row.astype(np.int64)
+                mask = (positions < length).astype(np.int64)
+                yield {"input_ids": input_ids, "attention_mask": mask, "labels": np.where(mask == 1, input_ids, -100)}
+
+
+def make_torch_dataset(manifest):
+    """Wraps iter_blocks() as a torch IterableDataset that cycles over the shards (the Trainer stops at max_steps)."""
+    import torch
+    from torch.utils.data import IterableDataset
+
+    class PackedShardDataset(IterableDataset):
+        def __iter__(self):
+            while True:
+                for example in iter_blocks(manifest):
+                    yield {key: torch.from_numpy(value) for key, value in example.items()}
+
+    return PackedShardDataset()
+
+
+def dry_run(source_path=SOURCE_PATH, tokenizer_name=BASE_MODEL, max_seq_length=MAX_SEQ_LENGTH):
+    """CPU only: rebuilds the shards into the cache and streams them once, reporting throughput."""
+    manifest = prepare_dataset(source_path, load_tokenizer(tokenizer_name), max_seq_length, rebuild=True)
+    start = time.perf_counter()
+    streamed = sum(1 for _ in iter_blocks(manifest))
+    elapsed = time.perf_counter() - start
+    report = {
+        "examples": manifest["examples"],
+        "tokens": manifest["tokens"],
+        "blocks": manifest["blocks"],
+        "shards": manifest["shards"],
+        "prep_s": manifest["prep_s"],
+        "examples_per_s": manifest["examples_per_s"],
+        "tokens_per_s": manifest["tokens_per_s"],
+        "packing_efficiency": manifest["packing_efficiency"],
+        "stream_blocks_per_s": round(streamed / elapsed, 1) if elapsed else None,
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+# --- 3. Load Model and Tokenizer ---
+def run_finetuning(source_path=SOURCE_PATH, max_seq_length=MAX_SEQ_LENGTH):
+    import torch
+    from unsloth import FastLanguageModel
+    from transformers import Trainer, TrainingArguments, default_data_collator
+
     # Load Llama 3.1 8B, load_in_4bit=True enables QLoRA
     model, tokenizer = FastLanguageModel.from_pretrained(
-        model_name = "meta-llama/Llama-3.1-8B",
+        model_name = BASE_MODEL,
         max_seq_length = max_seq_length,
-        dtype = None, 
+        dtype = None,
         load_in_4bit = True,
     )
 
-    # --- 2. Configure QLoRA ---
+    # --- 4. Configure QLoRA ---
     model = FastLanguageModel.get_peft_model(
         model,
         r = 16,
@@ -39,25 +234,16 @@ def run_finetuning():
         random_state = 3407,
     )
 
-    # --- 3. Load and Process Dataset ---
-    dataset = load_dataset("declare-lab/BrandVoice", split="train")
-
-    # Apply the instruction formatting
-    dataset = dataset.map(
-        format_instruction_examples, 
-        batched = True, 
-        remove_columns=dataset.column_names
-    )
+    # --- 5. Load the Pre-Tokenized, Packed Dataset (local, cached) ---
+    manifest = prepare_dataset(source_path, tokenizer, max_seq_length)
+    train_dataset = make_torch_dataset(manifest)
 
-    # --- 4. Setup Trainer ---
-    trainer = SFTTrainer(
+    # --- 6. Setup Trainer ---
+    # Tokenization and packing already happened in prepare_dataset(), so a plain Trainer streams the blocks
+    trainer = Trainer(
         model = model,
-        tokenizer = tokenizer,
-        train_dataset = dataset,
-        dataset_text_field = "text",
-        max_seq_length = max_seq_length,
-        dataset_num_workers = 4,
-        packing = True,
+        train_dataset = train_dataset,
+        data_collator = default_data_collator,
         args = TrainingArguments(
             per_device_train_batch_size = 2,
             gradient_accumulation_steps = 4,
@@ -70,10 +256,11 @@ def run_finetuning():
             output_dir = "models/copywriter-finetuned",
             optim = "adamw_8bit",
             seed = 3407,
+            dataloader_num_workers = 0,  # One iterator over the memory-mapped shards
         ),
     )
 
-    # --- 5. Train and Save ---
+    # --- 7. Train and Save ---
     print("Starting Fine-Tuning (100 steps)...")
     trainer.train()
 
@@ -82,4 +269,13 @@ def run_finetuning():
     print("Fine-tuning complete. Model saved to models/copywriter-finetuned.")
 
 if __name__ == "__main__":
-    run_finetuning()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fine-tune the copywriter on local brand-voice data.")
+    parser.add_argument("--source", default=SOURCE_PATH, help="JSONL with caption and tone_label")
+    parser.add_argument("--max-seq-length", type=int, default=MAX_SEQ_LENGTH)
+    parser.add_argument("--dry-run", action="store_true", help="CPU only: prepare + stream the data, report throughput")
+    parser.add_argument("--tokenizer", default=BASE_MODEL, help="Tokenizer for --dry-run (local path, hub id or 'bytes')")
+    args = parser.parse_args()
+    if args.dry_run:
+        dry_run(args.source, args.tokenizer, args.max_seq_length)
+    else:
+        run_finetuning(args.source, args.max_seq_length)
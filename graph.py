@@ -1,14 +1,22 @@
 # graph.py (LangGraph Workflow - FINAL WORKING VERSION)
 
 from langgraph.graph import StateGraph, END
-from typing import TypedDict
+from langgraph.types import Send
+from typing import Annotated, TypedDict
+from functools import lru_cache
+import operator
 import os
 import sys
+import time
 
 # Add the agents directory to the system path for successful import
 sys.path.append(os.path.join(os.path.dirname(__file__), 'agents'))
 
 # --- 1. State Definition (SINGLE SOURCE OF TRUTH) ---
+def merge_outputs(left, right):
+    """Reducer for channel_outputs: each channel_variant branch contributes its own key."""
+    return {**(left or {}), **(right or {})}
+
 class AgentState(TypedDict):
     """
     Represents the state of our graph, defining all data passed between agents.
@@ -16,82 +24,193 @@ class AgentState(TypedDict):
     brief: str
     strategy: str              # Strategist's output: tone, keywords, goals
     copy: str                  # Copywriter's output: caption/text
+    copy_candidates: list      # Best-of-N mode: every candidate caption with its local score, best first
     image_prompt: str          # Designer's input: text-to-image prompt
-    image_path: str            # Designer's output: path to generated image
+    image_path: str            # Designer's output: path to generated image (inside this run's artifact namespace)
+    image_artifact: str        # Content hash of that image; stable ID in the artifact store
+    image_variants: dict       # {"webp"/"jpeg"/"thumb": run path}, encoded in the background (agents/image_encoding.py)
     brand_feedback: str        # Brand Guardian's critique (or "PASS")
     compliance_report: str     # Compliance Officer's report (or "PASS")
-    final_output: dict         # Final structure {copy, image_path, report}
+    final_output: dict         # Final structure {copy, image_path, image_variants, artifacts, report}
     revision_count: int        # Counter for validation loop
     rejection_target: str      # Where to send the revision ("copywriter" or "designer")
+    edit_stalled: bool         # The last targeted edit left the copy unchanged; the next one regenerates it
+    image_variety: bool        # Opt in to fresh random images instead of reproducible, cached ones
+    brand_verdict: dict        # Brand review verdict, including the tier that decided it
+    compliance_verdict: dict   # Compliance review verdict (PASS / FLAG), including its tier
+    brand: str                 # Brand profile key (agents/brand_profiles.py); empty = BRANDSYNC_BRAND
+    run_id: str                # Artifact namespace: the job/checkpoint ID, or generated by the strategist
+    started_at: float          # Wall-clock start (set by the strategist), for the revision time budget
+    llm_tokens: Annotated[int, operator.add]  # Prompt + completion tokens spent so far, summed across nodes
+    channels: list             # Target channels (agents/channels.py); empty = the single default output
+    channel: str               # Set on each channel_variant branch
+    channel_outputs: Annotated[dict, merge_outputs]  # {channel: final output for that channel}
 
 # --- 2. Import Agent Functions ---
 # Import functions using the explicit module path from the 'agents' directory
-from agents.strategist import strategist
-from agents.copywriter import copywriter
-from agents.designer import designer
-from agents.brand_guardian import brand_guardian
-from agents.compliance import compliance_officer
+from agents.strategist import strategist, astrategist
+from agents.copywriter import copywriter, acopywriter, edit_copy, aedit_copy
+from agents.designer import designer, adesigner, revise_visual, arevise_visual
+from agents.brand_guardian import brand_guardian, abrand_guardian
+from agents.compliance import compliance_officer, acompliance_officer
+from agents.channels import channel_variant, achannel_variant
+from agents.tracing import traced_node
 
 # --- 3. Conditional Edge Routing ---
 
+# Revision budget: no new revision starts once any limit is reached (0 = no time/token limit)
+MAX_REVISIONS = int(os.environ.get("BRANDSYNC_MAX_REVISIONS", "2"))
+REVISION_BUDGET_S = float(os.environ.get("BRANDSYNC_REVISION_BUDGET_S", "0"))
+REVISION_BUDGET_TOKENS = int(os.environ.get("BRANDSYNC_REVISION_BUDGET_TOKENS", "0"))
+
+def revision_budget_exhausted(state: AgentState):
+    """Returns why no further revision may run, or None while the budget allows one."""
+    if state.get("revision_count", 0) >= MAX_REVISIONS:
+        return f"{MAX_REVISIONS} revisions"
+    if REVISION_BUDGET_S and state.get("started_at") and time.time() - state["started_at"] >= REVISION_BUDGET_S:
+        return f"{REVISION_BUDGET_S:.0f}s time budget"
+    if REVISION_BUDGET_TOKENS and state.get("llm_tokens", 0) >= REVISION_BUDGET_TOKENS:
+        return f"{REVISION_BUDGET_TOKENS} token budget"
+    return None
+
 def route_to_revision(state: AgentState) -> str:
-    """Decides if we need a revision, and where to route it, or if the content is ready."""
+    """Accepts a passing verdict; otherwise routes to the cheapest fix the guardian planned, within budget.
+
+    rejection_target is "edit" (targeted sentence edits), "copywriter" (regenerate only the copy) or
+    "designer" (regenerate only the visual). An edit that changed nothing last time escalates to "copywriter".
+    """
     print(f"--- Brand Guardian Result: {state['brand_feedback'][:40]}... ---")
-    
-    if state["revision_count"] >= 2:
-        print("--- Max Revisions Reached. FORCING END. ---")
+
+    if "REJECT" not in state["brand_feedback"]:
+        print("--- Brand PASS. Routing to Compliance. ---")
+        return "compliance"
+
+    exhausted = revision_budget_exhausted(state)
+    if exhausted:
+        print(f"--- Revision budget spent ({exhausted}). FORCING END. ---")
         return END
 
-    if "REJECT" in state["brand_feedback"]:
-        target = state.get("rejection_target", "copywriter")
-        print(f"--- Revision needed. Routing to: {target} ---")
-        return target
-    
-    print("--- Brand PASS. Routing to Compliance. ---")
-    return "compliance"
+    target = state.get("rejection_target") or "copywriter"
+    if target == "edit" and state.get("edit_stalled"):
+        target = "copywriter"  # The same edit would fail the same way; spend the revision on a rewrite
+    print(f"--- Revision needed. Routing to: {target} ---")
+    return target
+
+# Fields a channel branch needs; strategy, copy and the master image are shared, not regenerated
+CHANNEL_FIELDS = ("brief", "strategy", "copy", "image_prompt", "image_path", "run_id")
+
+def route_to_channels(state: AgentState):
+    """Fans out one channel_variant branch per requested channel; they run concurrently in one superstep."""
+    channels = state.get("channels") or []
+    if not channels:
+        return END
+    shared = {key: state.get(key) for key in CHANNEL_FIELDS}
+    print(f"--- Fanning out to {len(channels)} channels: {', '.join(channels)} ---")
+    return [Send("channel_variant", {**shared, "channel": channel}) for channel in channels]
 
 # --- 4. Build Graph ---
-def build_workflow():
+def build_workflow(use_async=False, parallel=False, checkpointer=None):
+    """Compiles the agent graph. With use_async=True the nodes are coroutines (use ainvoke/astream).
+
+    parallel=True fans copywriter and designer out after the strategist and joins them at the
+    brand guardian. In both layouts a revision re-runs only the rejected artifact: edit_copy patches
+    flagged sentences, revise_copy regenerates the copy and revise_visual the image.
+    When the state lists channels, compliance fans out to one channel_variant per channel.
+    Every node is wrapped by traced_node(), so passing {"configurable": {"trace": Trace()}} records spans.
+    With a checkpointer (see agents/checkpoints.py) each node's output is persisted under the run's
+    thread_id, so interrupted runs can resume and finished ones can be read back.
+    """
     workflow = StateGraph(AgentState)
+    add_node = lambda name, fn: workflow.add_node(name, traced_node(name, fn))
+
+    if use_async:
+        nodes = (astrategist, acopywriter, adesigner, abrand_guardian, acompliance_officer, achannel_variant)
+        revisions = (aedit_copy, acopywriter, arevise_visual)
+    else:
+        nodes = (strategist, copywriter, designer, brand_guardian, compliance_officer, channel_variant)
+        revisions = (edit_copy, copywriter, revise_visual)
 
-    workflow.add_node("strategist", strategist)
-    workflow.add_node("copywriter", copywriter)
-    workflow.add_node("designer", designer)
-    workflow.add_node("brand_guardian", brand_guardian)
-    workflow.add_node("compliance", compliance_officer)
+    add_node("strategist", nodes[0])
+    add_node("copywriter", nodes[1])
+    add_node("designer", nodes[2])
+    add_node("brand_guardian", nodes[3])
+    add_node("compliance", nodes[4])
+    add_node("channel_variant", nodes[5])
+    add_node("edit_copy", revisions[0])
+    add_node("revise_copy", revisions[1])
+    add_node("revise_visual", revisions[2])
 
     workflow.set_entry_point("strategist")
 
-    workflow.add_edge("strategist", "copywriter")
-    workflow.add_edge("copywriter", "designer")
-    workflow.add_edge("designer", "brand_guardian")
+    if parallel:
+        # The designer only needs brief + strategy, so it runs alongside the copywriter
+        workflow.add_edge("strategist", "copywriter")
+        workflow.add_edge("strategist", "designer")
+        workflow.add_edge(["copywriter", "designer"], "brand_guardian")
+    else:
+        workflow.add_edge("strategist", "copywriter")
+        workflow.add_edge("copywriter", "designer")
+        workflow.add_edge("designer", "brand_guardian")
+    # Revisions go straight back to the guardian instead of through the linear copy -> design chain
+    for revision in ("edit_copy", "revise_copy", "revise_visual"):
+        workflow.add_edge(revision, "brand_guardian")
+    revision_targets = {"edit": "edit_copy", "copywriter": "revise_copy", "designer": "revise_visual"}
     
     workflow.add_conditional_edges(
         "brand_guardian",
         route_to_revision,
         {
-            "copywriter": "copywriter",
-            "designer": "designer",
-            "compliance": "compliance"
+            **revision_targets,
+            "compliance": "compliance",
+            END: END
         }
     )
-    workflow.add_edge("compliance", END)
+    workflow.add_conditional_edges("compliance", route_to_channels, ["channel_variant", END])
+    workflow.add_edge("channel_variant", END)
+
+    return workflow.compile(checkpointer=checkpointer)
 
-    return workflow.compile()
+# --- 5. Shared Compiled Graphs ---
+
+@lru_cache(maxsize=None)
+def get_workflow(use_async=False, parallel=True, checkpointed=False):
+    """Process-wide compiled graph: built on first use and shared by every caller and thread."""
+    checkpointer = None
+    if checkpointed:
+        from agents.checkpoints import open_checkpointer
+        checkpointer = open_checkpointer()
+    return build_workflow(use_async=use_async, parallel=parallel, checkpointer=checkpointer)
+
+# --- 6. Async Entry Points ---
+
+def _get_async_app():
+    return get_workflow(use_async=True, parallel=True)
+
+async def ainvoke(initial_state):
+    """Runs one workflow on the current event loop and returns the final state."""
+    return await _get_async_app().ainvoke(initial_state)
+
+async def astream(initial_state):
+    """Async generator of per-node updates, mirroring app.stream() for event-loop callers."""
+    async for step in _get_async_app().astream(initial_state):
+        yield step
 
 # Example execution (Run with: python graph.py)
 if __name__ == "__main__":
+    from agents.tracing import Trace
+
     app = build_workflow()
-    os.makedirs("output_content", exist_ok=True)
     
     initial_state = {"brief": "Create an engaging social media post for our new autonomous AI agency launch.", "revision_count": 0}
+    trace = Trace()
     
     print("\n\n--- Starting BrandSync Studio Workflow ---")
     
     final_state = {}
-    for s in app.stream(initial_state):
+    for s in app.stream(initial_state, {"configurable": {"trace": trace}}):
         print(s)
-        final_state.update(s)
+        for update in s.values():
+            final_state.update(update)
     
     print("\n\n==========================================")
     print("🚀 FINAL OUTPUT GENERATED 🚀")
@@ -102,4 +221,6 @@ if __name__ == "__main__":
         print(f"Compliance Report: {final_state['final_output']['report']}")
     else:
          print("Workflow ended before final output. Check revision count.")
-    print(f"Total Cycles: {final_state.get('revision_count', 0)}")
\ No newline at end of file
+    print(f"Total Cycles: {final_state.get('revision_count', 0)}")
+    print(f"Trace: {trace.export_chrome(os.path.join('output', 'traces', f'{trace.run_id}.trace.json'))} "
+          f"(open in chrome://tracing) | Totals: {trace.totals()}")
@@ -0,0 +1,168 @@
+# worker.py (Worker processes that drain the job queue; each process holds one compiled workflow)
+#
+# Usage:
+#   python worker.py --processes 4
+#   streamlit run app.py        # BRANDSYNC_EMBEDDED_WORKERS=0 when workers run separately like this
+#
+# Workers claim briefs from agents/job_queue.py, stream the checkpointed workflow and append progress
+# events (node updates, coalesced tokens, first-token times) for the front end to poll. A job whose
+# worker dies is requeued after BRANDSYNC_JOB_STALE_S and resumes from its last checkpoint.
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+
+from agents.job_queue import QUEUE_PATH, STALE_AFTER_S, JobQueue
+
+POLL_INTERVAL_S = 0.5
+TOKEN_FLUSH_S = 0.25   # Tokens are batched into one event per node at most this often
+HEARTBEAT_S = 10.0
+
+
+# --- 1. Running One Job ---
+
+def _cache_delta(gateway, start):
+    now = gateway.cache_stats()
+    if not now or not start:
+        return None
+    return {"hits": now["hits"] - start["hits"], "misses": now["misses"] - start["misses"],
+            "hit_rate": now["hit_rate"]}
+
+
+def run_job(app, queue, job):
+    """Streams one job through the workflow, publishing progress events. Returns the result dict."""
+    from agents.checkpoints import run_config, run_status
+    from agents.gateway import gateway
+    from agents.tracing import Trace
+
+    job_id = job["id"]
+    trace = Trace(job_id)
+    config = run_config(job_id, trace=trace)
+
+    # A retried job continues from its checkpoint instead of re-running finished nodes
+    previous = run_status(app, job_id)
+    if previous is None:
+        stream_input = {"brief": job["brief"], "revision_count": 0, "run_id": job_id,
+                        "image_variety": job["params"].get("image_variety", False),
+                        "channels": job["params"].get("channels", []),
+                        "brand": job["params"].get("brand")}
+    elif previous["status"] == "completed":
+        return {"final_state": previous["values"], "trace": []}
+    else:
+        stream_input = None
+        queue.add_events(job_id, [("resumed", None, {"next": previous["next"]})])
+
+    cache_start = gateway.cache_stats()
+    tokens = {}
+    pending = []
+    last_flush = time.monotonic()
+
+    def flush():
+        nonlocal last_flush
+        pending[:0] = [("token", node, {"text": text}) for node, text in tokens.items()]
+        tokens.clear()
+        if pending:
+            queue.add_events(job_id, pending)
+            pending.clear()
+        last_flush = time.monotonic()
+
+    for mode, chunk in app.stream(stream_input, config, stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            node = chunk.get("node")
+            if chunk.get("type") == "token":
+                tokens[node] = tokens.get(node, "") + chunk["text"]
+            else:
+                pending.append((chunk.get("type"), node, chunk))
+        else:
+            node_name = list(chunk.keys())[0]
+            pending.append(("update", node_name, {"state": chunk[node_name], "llm_cache": _cache_delta(gateway, cache_start)}))
+        if mode == "updates" or time.monotonic() - last_flush >= TOKEN_FLUSH_S:
+            flush()
+    flush()
+
+    trace.export_jsonl(os.path.join("output", "traces", "runs.jsonl"))
+    return {"final_state": run_status(app, job_id)["values"], "trace": trace.records()}
+
+
+# --- 2. Worker Loop ---
+
+def _heartbeat(queue, current, stop):
+    # Long nodes (a 60s image call) emit no events, so liveness is reported separately
+    while not stop.wait(HEARTBEAT_S):
+        job_id = current.get("job")
+        if job_id:
+            queue.heartbeat(job_id)
+
+
+def worker_main(worker_id=0, queue_path=QUEUE_PATH, stop_event=None, max_jobs=None):
+    """Claims and runs jobs until stop_event is set (or max_jobs have been processed)."""
+    from agents.model_lifecycle import warm_up_in_background
+    from graph import get_workflow
+
+    app = get_workflow(parallel=True, checkpointed=True)  # Built once per process, shared by its jobs
+    warm_up_in_background()  # Load the model and prime agent prefixes while the first job is claimed
+    queue = JobQueue(queue_path)
+    stop_event = stop_event or threading.Event()
+    current = {"job": None}
+    beat_stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(queue, current, beat_stop), daemon=True).start()
+    print(f"👷 Worker {worker_id} (pid {os.getpid()}) ready")
+
+    processed = 0
+    try:
+        while not stop_event.is_set() and (max_jobs is None or processed < max_jobs):
+            job = queue.claim(f"worker-{worker_id}:{os.getpid()}")
+            if job is None:
+                stop_event.wait(POLL_INTERVAL_S)
+                continue
+            current["job"] = job["id"]
+            print(f"👷 Worker {worker_id} running job {job['id']} (attempt {job['attempts']})")
+            try:
+                queue.complete(job["id"], run_job(app, queue, job))
+            except Exception as e:
+                print(f"❌ Job {job['id']} failed: {e}")
+                queue.fail(job["id"], e)
+            current["job"] = None
+            processed += 1
+    finally:
+        beat_stop.set()
+    return processed
+
+
+def start_workers(processes=2, queue_path=QUEUE_PATH):
+    """Spawns worker processes and returns (processes, stop_event)."""
+    ctx = multiprocessing.get_context("spawn")  # Fresh interpreters: no forked threads or sockets
+    stop_event = ctx.Event()
+    workers = [ctx.Process(target=worker_main, args=(i, queue_path, stop_event), daemon=True, name=f"brandsync-worker-{i}")
+               for i in range(processes)]
+    for process in workers:
+        process.start()
+    return workers, stop_event
+
+
+# --- 3. CLI ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Run BrandSync workflow workers against the job queue.")
+    parser.add_argument("--processes", type=int, default=2, help="Worker processes (one compiled graph each)")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="Job queue database")
+    args = parser.parse_args()
+
+    workers, stop_event = start_workers(args.processes, args.queue)
+    queue = JobQueue(args.queue)
+    try:
+        while any(w.is_alive() for w in workers):
+            requeued = queue.requeue_stale(STALE_AFTER_S)
+            if requeued:
+                print(f"♻️ Requeued {requeued} job(s) from unresponsive workers")
+            time.sleep(HEARTBEAT_S)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping workers...")
+        stop_event.set()
+        for w in workers:
+            w.join(timeout=30)
+
+
+if __name__ == "__main__":
+    main()